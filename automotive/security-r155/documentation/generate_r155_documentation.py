@@ -4,18 +4,31 @@ R155 Compliance Documentation Generator
 
 This script automatically generates documentation required for UN R155 compliance
 by extracting data from various sources and compiling them into structured documents.
+
+With --batch, documentation for several vehicle types is generated in one
+run from a manifest of vehicles, their metadata and data-source overrides
+(see vehicles.yaml). Each distinct data source is loaded once, and vehicles
+are rendered in parallel worker processes.
+
+Usage:
+    python generate_r155_documentation.py --output-dir output
+    python generate_r155_documentation.py --batch vehicles.yaml --output-dir output
 """
 
 import argparse
-import yaml
+import contextvars
 import json
 import os
+import sys
 import datetime
 import logging
-from jinja2 import Environment, FileSystemLoader
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from r155_common import artifacts, safe_yaml, tracing, validation
+from r155_common.build_manifest import MISSING, BuildManifest, hash_bytes, hash_value
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # R155 document templates
@@ -27,105 +40,677 @@ TEMPLATES = {
     'verification_validation': 'templates/verification_validation.md.j2',
 }
 
+# Seconds before a single pandoc conversion is abandoned
+PANDOC_TIMEOUT = 300
+PANDOC_ARGS = ['--toc', '--variable', 'documentclass=report']
+
+# Template output is written in chunks of this many render events
+RENDER_BUFFER_SIZE = 64
+
+# Records input hashes of generated outputs for incremental builds
+MANIFEST_FILE = '.r155_build_manifest.json'
+
+# Source hashes of precompiled templates, stored alongside the compiled modules
+TEMPLATE_SOURCES_FILE = 'template_sources.json'
+
 # Document metadata
 DOCUMENT_META = {
     'company': 'Automotive Company XYZ',
     'vehicle_type': 'Example EV Platform',
     'document_version': '1.0',
-    'date_generated': datetime.datetime.now().strftime('%Y-%m-%d'),
     'confidentiality': 'Confidential',
     'r155_version': 'UNECE R155 Rev 1',
 }
 
-def load_data_sources(args):
-    """Load data from various security artifact sources"""
+def document_meta(overrides=None):
+    """Document metadata, with overrides applied, stamped with today's date"""
+    return {**DOCUMENT_META, **(overrides or {}), 'date_generated': datetime.datetime.now().strftime('%Y-%m-%d')}
+
+def parse_yaml_file(path):
+    """Parse a YAML file through the shared artifact cache"""
+    return artifacts.load_artifact(path, 'yaml')
+
+def parse_json_file(path):
+    """Parse a JSON file through the shared artifact cache"""
+    return artifacts.load_artifact(path, 'json')
+
+def load_files(category, paths, parse, workers=None):
+    """Parse files on a thread pool, isolating failures per file
+    
+    Returns (path, document) pairs for the files that parsed, in the order of
+    paths, and logs load statistics for the category.
+    """
+    def load(path):
+        try:
+            return path, parse(path), os.path.getsize(path), None
+        except Exception as e:
+            return path, None, 0, e
+    
+    from concurrent.futures import ThreadPoolExecutor
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(load, paths))
+    elapsed = time.perf_counter() - start
+    
+    loaded = []
+    total_bytes = 0
+    errors = 0
+    for path, document, size, error in results:
+        if error is not None:
+            errors += 1
+            logger.error("Error loading %s: %s", path, str(error))
+            continue
+        total_bytes += size
+        loaded.append((path, document))
+    
+    logger.info("Loaded %d %s file(s), %.1f MB in %.2fs (%.1f MB/s), %d error(s)",
+                len(loaded), category, total_bytes / 1e6, elapsed,
+                total_bytes / 1e6 / elapsed if elapsed > 0 else 0, errors)
+    return loaded
+
+class LazyRecords:
+    """Re-iterable sequence of records read from a set of files on demand
+    
+    Every iteration re-reads the files one at a time, so only one file's
+    records are in memory at once. The first read of a file loads and
+    validates it (logging any errors) and remembers how many records it
+    holds; later iterations skip files without records and do not validate
+    again. Truthiness reflects whether there are any records; len() is not
+    supported because it would require a full pass.
+    """
+    
+    def __init__(self, category, paths, parse, extract):
+        """extract(path, document, checked) yields the records contained in one parsed file
+        
+        checked is set once the file has passed extract's checks on an earlier read.
+        """
+        self.category = category
+        self.paths = paths
+        self.parse = parse
+        self.extract = extract
+        # path -> number of records, once the file has been read
+        self.counts = {}
+        # Templates render on several threads; the first read of each file happens once
+        self.lock = threading.Lock()
+    
+    def read(self, path):
+        """The records of one file"""
+        if path not in self.counts:
+            with self.lock:
+                if path not in self.counts:
+                    return self.load(path, checked=False)
+        if not self.counts[path]:
+            return []
+        return self.load(path, checked=True)
+    
+    def load(self, path, checked):
+        try:
+            records = list(self.extract(path, self.parse(path), checked))
+        except Exception as e:
+            logger.error("Error loading %s: %s", path, str(e))
+            records = []
+        self.counts[path] = len(records)
+        return records
+    
+    def __iter__(self):
+        for path in self.paths:
+            yield from self.read(path)
+    
+    def __bool__(self):
+        if any(self.counts.values()):
+            return True
+        return any(self.read(path) for path in self.paths)
+
+def extract_threats(path, threat_model, checked=False):
+    """Yield the threats of a valid threat model file"""
+    if checked:
+        yield from threat_model.get('threats', [])
+        return
+    # Skip inputs that are not threat models (e.g. component files)
+    if validation.detect_schema(threat_model) != 'threat_model':
+        return
+    if validation.validate_document(threat_model, 'threat_model', path):
+        validation.log_issues(validation.validate_file(path, 'threat_model')[1])
+        logger.error("Skipping invalid threat model: %s", path)
+        return
+    yield from threat_model.get('threats', [])
+
+def extract_verification(path, document, checked=False):
+    """Yield a verification result file's document as a single record"""
+    if not checked and not isinstance(document, dict):
+        logger.error("Skipping %s: expected a verification result object, got %s", path, type(document).__name__)
+        return
+    yield document
+
+def list_files(directory, extensions):
+    """Sorted paths of the files in directory with one of the given extensions"""
+    try:
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if name.endswith(extensions)]
+    except OSError as e:
+        logger.error("Error listing %s: %s", directory, str(e))
+        return []
+
+def load_threats(directory, lazy, workers):
+    """Threats from the threat models in directory; returns (threats, source paths)"""
+    logger.info("Loading threat models from %s", directory)
+    paths = list_files(directory, ('.yaml', '.yml'))
+    if lazy:
+        return LazyRecords('threat model', paths, parse_yaml_file, extract_threats), paths
+    threats = []
+    for path, threat_model in load_files('threat model', paths, parse_yaml_file, workers):
+        threats.extend(extract_threats(path, threat_model))
+    return threats, paths
+
+def load_controls(directory, lazy, workers):
+    """Security controls from directory/controls.json; returns (controls, source paths)"""
+    logger.info("Loading security controls from %s", directory)
+    controls_path = os.path.join(directory, 'controls.json')
+    if not os.path.exists(controls_path):
+        return [], []
+    controls = []
+    for _, document in load_files('security controls', [controls_path], parse_json_file, workers):
+        if isinstance(document, list):
+            controls = document
+        else:
+            logger.error("Skipping %s: expected a list of controls, got %s", controls_path, type(document).__name__)
+    return controls, [controls_path]
+
+def load_verification(directory, lazy, workers):
+    """Verification results from the JSON files in directory; returns (results, source paths)"""
+    logger.info("Loading verification results from %s", directory)
+    paths = list_files(directory, ('.json',))
+    if lazy:
+        return LazyRecords('verification', paths, parse_json_file, extract_verification), paths
+    results = []
+    for path, verification in load_files('verification', paths, parse_json_file, workers):
+        results.extend(extract_verification(path, verification))
+    return results, paths
+
+def load_incidents(directory, lazy, workers):
+    """Incident response plan from directory; returns (plan, source paths)"""
+    logger.info("Loading incident response from %s", directory)
+    incident_path = os.path.join(directory, 'incident_response_plan.yaml')
+    if not os.path.exists(incident_path):
+        return [], []
+    incidents = []
+    for _, document in load_files('incident response', [incident_path], parse_yaml_file, workers):
+        incidents = document
+    return incidents, [incident_path]
+
+# Data category -> (source directory argument, loader)
+DATA_SOURCES = {
+    'threats': ('threat_models_dir', load_threats),
+    'controls': ('controls_dir', load_controls),
+    'verification': ('verification_dir', load_verification),
+    'incidents': ('incident_dir', load_incidents),
+}
+
+def load_data_sources(args, meta=None, cache=None):
+    """Load data from various security artifact sources
+    
+    With args.lazy_data, threats and verification results are returned as
+    LazyRecords that are read from disk while templates iterate over them,
+    instead of being loaded into lists up front. meta overrides fields of
+    DOCUMENT_META. Loaded sources are memoized in cache (keyed by category
+    and directory), so callers that build data for several vehicles load
+    each shared source once; the loaded data must then not be modified.
+    """
+    workers = getattr(args, 'load_workers', None)
+    lazy = getattr(args, 'lazy_data', False)
+    cache = {} if cache is None else cache
     data = {
-        'meta': DOCUMENT_META,
-        'threats': [],
-        'controls': [],
-        'verification': [],
-        'incidents': [],
+        'meta': document_meta(meta),
+        # Input files per category, used to decide which outputs need rebuilding
+        'sources': {},
     }
     
-    # Load threat models
-    try:
-        logger.info("Loading threat models from %s", args.threat_models_dir)
-        for filename in os.listdir(args.threat_models_dir):
-            if filename.endswith('.yaml') or filename.endswith('.yml'):
-                with open(os.path.join(args.threat_models_dir, filename), 'r') as f:
-                    threat_model = yaml.safe_load(f)
-                    data['threats'].extend(threat_model.get('threats', []))
-    except Exception as e:
-        logger.error("Error loading threat models: %s", str(e))
+    keys = []
+    for category, (argument, loader) in DATA_SOURCES.items():
+        directory = getattr(args, argument)
+        key = (category, os.path.abspath(directory))
+        if key not in cache:
+            with tracing.stage(f"load:{category}"):
+                cache[key] = loader(directory, lazy, workers)
+        data[category], data['sources'][category] = cache[key]
+        keys.append(key)
     
-    # Load security controls
-    try:
-        logger.info("Loading security controls from %s", args.controls_dir)
-        if os.path.exists(os.path.join(args.controls_dir, 'controls.json')):
-            with open(os.path.join(args.controls_dir, 'controls.json'), 'r') as f:
-                data['controls'] = json.load(f)
-    except Exception as e:
-        logger.error("Error loading security controls: %s", str(e))
+    key = ('evidence_index', *keys)
+    if key not in cache:
+        with tracing.stage('evidence_index'):
+            cache[key] = build_evidence_index(data)
+    data['evidence_index'] = cache[key]
+    logger.info("Artifact cache: %s", artifacts.default_cache().summary())
     
-    # Load verification results
-    try:
-        logger.info("Loading verification results from %s", args.verification_dir)
-        for filename in os.listdir(args.verification_dir):
-            if filename.endswith('.json'):
-                with open(os.path.join(args.verification_dir, filename), 'r') as f:
-                    verification = json.load(f)
-                    data['verification'].append(verification)
-    except Exception as e:
-        logger.error("Error loading verification results: %s", str(e))
+    return data
+
+# Template environments reused across generate_documentation calls
+_ENVIRONMENTS = {}
+_compiled_loader = None
+
+def compiled_loader_class():
+    """Loader class for precompiled templates that are used only while their source is unchanged
+    
+    jinja2 is imported here rather than at module level, like the other
+    template code.
+    """
+    global _compiled_loader
+    if _compiled_loader is not None:
+        return _compiled_loader
     
-    # Load incident response plans
+    from jinja2 import ModuleLoader, TemplateNotFound
+    
+    class CheckedModuleLoader(ModuleLoader):
+        """Precompiled templates; a template whose source differs from the one compiled is not found"""
+        
+        def __init__(self, compiled_dir, templates_dir):
+            super().__init__(compiled_dir)
+            self.compiled_dir = compiled_dir
+            self.templates_dir = templates_dir
+            self.sources = read_template_sources(compiled_dir)
+            self.stale = set()
+        
+        def is_current(self, name):
+            """Whether the compiled module of name was compiled from its current source"""
+            try:
+                with open(os.path.join(self.templates_dir, *name.split('/')), 'rb') as f:
+                    source_hash = hash_bytes(f.read())
+            except OSError:
+                # Deployed without sources: the compiled module is all there is
+                return True
+            return self.sources.get(name) == source_hash
+        
+        def module_path(self, name):
+            """The file holding the compiled module of name"""
+            if self.compiled_dir.endswith('.zip'):
+                return self.compiled_dir
+            return os.path.join(self.compiled_dir, self.get_module_filename(name))
+        
+        def load(self, environment, name, globals=None):
+            if not self.is_current(name):
+                if name not in self.stale:
+                    self.stale.add(name)
+                    logger.warning("Precompiled template %s in %s does not match its source; "
+                                   "rendering from source (re-run --precompile-templates)", name, self.compiled_dir)
+                raise TemplateNotFound(name)
+            return super().load(environment, name, globals)
+    
+    _compiled_loader = CheckedModuleLoader
+    return _compiled_loader
+
+def read_template_sources(compiled_dir):
+    """{template name: source hash} recorded by precompile_templates; empty if there is none"""
     try:
-        logger.info("Loading incident response from %s", args.incident_dir)
-        if os.path.exists(os.path.join(args.incident_dir, 'incident_response_plan.yaml')):
-            with open(os.path.join(args.incident_dir, 'incident_response_plan.yaml'), 'r') as f:
-                data['incidents'] = yaml.safe_load(f)
-    except Exception as e:
-        logger.error("Error loading incident response plan: %s", str(e))
+        if compiled_dir.endswith('.zip'):
+            import zipfile
+            with zipfile.ZipFile(compiled_dir) as archive:
+                return json.loads(archive.read(TEMPLATE_SOURCES_FILE))
+        with open(os.path.join(compiled_dir, TEMPLATE_SOURCES_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning("No template source hashes in %s (%s); its templates are treated as stale",
+                       compiled_dir, str(e))
+        return {}
+
+def get_environment(templates_dir, cache_dir=None, compiled_dir=None):
+    """Return a persistent template environment for templates_dir
     
-    return data
+    Compiled templates are kept in memory for the life of the process and
+    their bytecode is cached on disk in cache_dir (default: the system temp
+    directory), so each template is compiled from source at most once. If
+    compiled_dir holds templates precompiled with precompile_templates, they
+    are loaded from there in preference to the source files, as long as the
+    source they were compiled from is unchanged.
+    """
+    key = (os.path.abspath(templates_dir), cache_dir, compiled_dir)
+    env = _ENVIRONMENTS.get(key)
+    if env is None:
+        from jinja2 import ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader
+        loader = FileSystemLoader(templates_dir)
+        if compiled_dir and os.path.exists(compiled_dir):
+            loader = ChoiceLoader([compiled_loader_class()(compiled_dir, templates_dir), loader])
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        env = Environment(
+            loader=loader,
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+            # Templates do not change during a run, so skip the per-render mtime check
+            auto_reload=False,
+        )
+        _ENVIRONMENTS[key] = env
+    return env
+
+def template_inputs(env, templates_dir, template_name, hash_file):
+    """Input hashes of a template and of every template it includes, imports or extends
+    
+    A template rendered from a precompiled module also depends on the module
+    file. A reference by computed name could be any template, so it makes
+    every template in templates_dir an input.
+    """
+    from jinja2 import FileSystemLoader, TemplateNotFound, TemplateSyntaxError, meta
+    sources = FileSystemLoader(templates_dir)
+    compiled = [loader for loader in getattr(env.loader, 'loaders', []) if hasattr(loader, 'module_path')]
+    inputs = {}
+    pending = [template_name]
+    while pending:
+        name = pending.pop()
+        if f"template:{name}" in inputs:
+            continue
+        inputs[f"template:{name}"] = hash_file(os.path.join(templates_dir, *name.split('/')))
+        for loader in compiled:
+            if loader.is_current(name):
+                inputs[f"compiled:{name}"] = hash_file(loader.module_path(name))
+        try:
+            source, _, _ = sources.get_source(env, name)
+            references = list(meta.find_referenced_templates(env.parse(source)))
+        except (TemplateNotFound, TemplateSyntaxError):
+            # Rendering reports a broken template
+            continue
+        for reference in references:
+            if reference is None:
+                pending.extend(sources.list_templates())
+            else:
+                pending.append(reference)
+    return inputs
 
-def generate_documentation(data, output_dir, templates_dir):
-    """Generate all required documentation using templates"""
+def precompile_templates(templates_dir, target):
+    """Compile every template in templates_dir into Python modules at target (a directory or .zip)
+    
+    The hash of each template's source is recorded with the modules, so a
+    template edited after precompiling is rendered from its source.
+    """
+    from jinja2 import Environment, FileSystemLoader
     env = Environment(loader=FileSystemLoader(templates_dir))
+    zip_mode = 'deflated' if target.endswith('.zip') else None
+    env.compile_templates(target, zip=zip_mode, ignore_errors=False)
+    sources = {}
+    for name in env.list_templates():
+        with open(os.path.join(templates_dir, *name.split('/')), 'rb') as f:
+            sources[name] = hash_bytes(f.read())
+    if zip_mode:
+        import zipfile
+        with zipfile.ZipFile(target, 'a') as archive:
+            archive.writestr(TEMPLATE_SOURCES_FILE, json.dumps(sources, indent=2, sort_keys=True))
+    else:
+        with open(os.path.join(target, TEMPLATE_SOURCES_FILE), 'w') as f:
+            json.dump(sources, f, indent=2, sort_keys=True)
+    logger.info("Precompiled templates from %s into %s", templates_dir, target)
+
+def render_document(env, template_name, data, output_path):
+    """Stream a single template to output_path without building the document in memory"""
+    template = env.get_template(template_name)
+    stream = template.stream(data=data)
+    stream.enable_buffering(RENDER_BUFFER_SIZE)
+    with open(output_path, 'w') as f:
+        stream.dump(f)
+    return output_path
+
+async def convert_to_pdf(markdown_path, pdf_path, semaphore, timeout):
+    """Convert a markdown document to PDF with pandoc; returns True on success"""
+    import asyncio
+    async with semaphore:
+        # Arguments are passed as a list, so paths never go through a shell
+        process = await asyncio.create_subprocess_exec(
+            'pandoc', markdown_path, '-o', pdf_path, *PANDOC_ARGS,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logger.error("pandoc timed out after %ss converting %s", timeout, markdown_path)
+            return False
+    
+    if process.returncode != 0:
+        logger.error("pandoc failed (exit code %d) converting %s: %s",
+                     process.returncode, markdown_path, stderr.decode(errors='replace').strip())
+        return False
+    
+    logger.info("Generated PDF: %s", pdf_path)
+    return True
+
+async def generate_documentation_async(data, output_dir, templates_dir, pdf_workers=None,
+                                       pandoc_timeout=PANDOC_TIMEOUT, env=None, force=False, explain=False):
+    """Render all documents concurrently and convert them to PDF as each one finishes
+    
+    Outputs whose template and data inputs are unchanged since the last run
+    (according to the build manifest in output_dir) are skipped unless force
+    is set. With explain, the reason for every rebuild or skip is logged.
+    Returns True if every document (and PDF, where pandoc is available) was
+    built or already up to date.
+    """
+    import asyncio
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+    env = env or get_environment(templates_dir)
+    loop = asyncio.get_running_loop()
     
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
+    manifest = BuildManifest(os.path.join(output_dir, MANIFEST_FILE))
     
-    # Generate each document type
-    for doc_type, template_path in TEMPLATES.items():
-        try:
-            template = env.get_template(os.path.basename(template_path))
-            output_path = os.path.join(output_dir, f"r155_{doc_type}_document.md")
-            
-            with open(output_path, 'w') as f:
-                f.write(template.render(data=data))
-                
-            logger.info("Generated %s document: %s", doc_type, output_path)
-            
-            # Also generate PDF if pandoc is available
+    pandoc_available = shutil.which('pandoc') is not None
+    if not pandoc_available:
+        logger.warning("pandoc not found on PATH, skipping PDF generation")
+    pdf_semaphore = asyncio.Semaphore(pdf_workers or os.cpu_count() or 1)
+    render_pool = ThreadPoolExecutor()
+    
+    # The generation date alone must not invalidate every document
+    meta_hash = hash_value({k: v for k, v in data['meta'].items() if k != 'date_generated'})
+    source_hashes = {category: manifest.hash_files(paths) for category, paths in data.get('sources', {}).items()}
+    
+    def needs_build(output_path, inputs):
+        reasons = ["--force"] if force else manifest.check(output_path, inputs)
+        if explain:
+            if reasons:
+                logger.info("Rebuilding %s: %s", output_path, "; ".join(reasons))
+            else:
+                logger.info("Skipping %s: up to date", output_path)
+        return bool(reasons)
+    
+    async def build(name, template_name, get_data, output_path, categories, extra_inputs=None, pdf_path=None):
+        inputs = template_inputs(env, templates_dir, template_name, manifest.hash_file)
+        inputs['meta'] = meta_hash
+        inputs.update({f"data:{category}": source_hashes.get(category, MISSING) for category in categories})
+        inputs.update(extra_inputs or {})
+        
+        def render():
+            with tracing.stage(f"render:{template_name}"):
+                return render_document(env, template_name, get_data(), output_path)
+        
+        if needs_build(output_path, inputs):
             try:
-                pdf_output = os.path.join(output_dir, f"r155_{doc_type}_document.pdf")
-                os.system(f"pandoc {output_path} -o {pdf_output} --toc --variable documentclass=report")
-                logger.info("Generated PDF: %s", pdf_output)
+                # Run in a copy of this task's context so the render stage nests under the caller's stage
+                await loop.run_in_executor(render_pool, contextvars.copy_context().run, render)
+                manifest.record(output_path, inputs)
+                logger.info("Generated %s: %s", name, output_path)
             except Exception as e:
-                logger.warning("Could not generate PDF (is pandoc installed?): %s", str(e))
-                
-        except Exception as e:
-            logger.error("Error generating %s document: %s", doc_type, str(e))
+                # The streamed output may be truncated; it must not pass as up to date later
+                manifest.outputs.pop(output_path, None)
+                logger.error("Error generating %s: %s", name, str(e))
+                return False
+        
+        if pdf_path and pandoc_available:
+            pdf_inputs = {'markdown': manifest.hash_file(output_path), 'pandoc_args': hash_value(PANDOC_ARGS)}
+            if not needs_build(pdf_path, pdf_inputs):
+                return True
+            try:
+                with tracing.stage(f"pandoc:{os.path.basename(pdf_path)}"):
+                    converted = await convert_to_pdf(output_path, pdf_path, pdf_semaphore, pandoc_timeout)
+                if converted:
+                    manifest.record(pdf_path, pdf_inputs)
+                return converted
+            except OSError as e:
+                logger.warning("Could not generate PDF for %s: %s", name, str(e))
+                return False
+        return True
+    
+    all_categories = ('threats', 'controls', 'verification', 'incidents')
+    jobs = []
+    for doc_type, template_path in TEMPLATES.items():
+        output_path = os.path.join(output_dir, f"r155_{doc_type}_document.md")
+        pdf_path = os.path.join(output_dir, f"r155_{doc_type}_document.pdf")
+        jobs.append(build(f"{doc_type} document", os.path.basename(template_path), lambda: data,
+                          output_path, all_categories, pdf_path=pdf_path))
+    
+    requirements_path = os.path.join(templates_dir, 'r155_requirements.yaml')
+    jobs.append(build("compliance matrix", 'compliance_matrix.md.j2',
+                      lambda: build_compliance_matrix(data, templates_dir),
+                      os.path.join(output_dir, "r155_compliance_matrix.md"), ('controls', 'verification'),
+                      extra_inputs={'requirements': manifest.hash_file(requirements_path)}))
+    
+    jobs.append(build("executive summary", 'executive_summary.md.j2', lambda: data,
+                      os.path.join(output_dir, "r155_executive_summary.md"), all_categories))
     
-    # Generate compliance matrix
     try:
-        compliance_matrix = {
-            'meta': data['meta'],
-            'compliance_points': [],
-        }
-        
-        # Map R155 requirements to collected evidence
+        return all(await asyncio.gather(*jobs))
+    finally:
+        render_pool.shutdown()
+        manifest.save()
+
+def generate_documentation(data, output_dir, templates_dir, pdf_workers=None, pandoc_timeout=PANDOC_TIMEOUT,
+                           env=None, force=False, explain=False):
+    """Generate all required documentation using templates; returns True if every document was built"""
+    import asyncio
+    return asyncio.run(generate_documentation_async(data, output_dir, templates_dir, pdf_workers, pandoc_timeout,
+                                             env, force, explain))
+
+def load_batch_manifest(path):
+    """Load and validate a batch manifest; returns None if it is invalid"""
+    try:
+        manifest = artifacts.load_artifact(path, 'yaml')
+    except Exception as e:
+        logger.error("Error loading batch manifest %s: %s", path, str(e))
+        return None
+    if validation.validate_document(manifest, 'vehicle_batch', path):
+        validation.log_issues(validation.validate_file(path, 'vehicle_batch')[1])
+        return None
+    return manifest
+
+def batch_jobs(args, manifest, manifest_path, cache):
+    """(vehicle id, data, output dir) for every vehicle in a batch manifest
+    
+    Paths in the manifest are relative to the manifest file. A vehicle's
+    sources override the manifest's, which override the command line; its
+    meta overrides the manifest's, which overrides DOCUMENT_META. Vehicles
+    that use the same source directory share its loaded data through cache.
+    """
+    base_dir = os.path.dirname(manifest_path)
+    
+    def resolve(paths):
+        return {key: os.path.join(base_dir, path) for key, path in (paths or {}).items()}
+    
+    jobs = []
+    for vehicle in manifest['vehicles']:
+        sources = dict(resolve(manifest.get('sources')), **resolve(vehicle.get('sources')))
+        meta = dict(manifest.get('meta') or {}, **(vehicle.get('meta') or {}))
+        data = load_data_sources(argparse.Namespace(**dict(vars(args), **sources)), meta, cache)
+        if 'output_dir' in vehicle:
+            output_dir = os.path.join(base_dir, vehicle['output_dir'])
+        else:
+            output_dir = os.path.join(args.output_dir, vehicle['id'])
+        jobs.append((vehicle['id'], data, output_dir))
+    return jobs
+
+# Batch jobs and render settings; inherited by forked workers, or set by _init_batch_worker
+_batch = None
+
+def _init_batch_worker(batch=None):
+    global _batch
+    logging.getLogger().setLevel(logging.WARNING)
+    if batch is not None:
+        _batch = batch
+
+def _render_vehicle(index):
+    """Render all documents of one batch vehicle; returns (vehicle id, seconds, success)"""
+    jobs, settings = _batch
+    vehicle_id, data, output_dir = jobs[index]
+    start = time.perf_counter()
+    try:
+        with tracing.stage(f"vehicle:{vehicle_id}"):
+            env = get_environment(settings['templates_dir'], settings['template_cache_dir'],
+                                  settings['compiled_templates'])
+            ok = generate_documentation(data, output_dir, settings['templates_dir'], settings['pdf_workers'],
+                                        settings['pandoc_timeout'], env, settings['force'], settings['explain'])
+    except Exception as e:
+        logger.error("Error generating documentation for %s: %s", vehicle_id, str(e))
+        return vehicle_id, time.perf_counter() - start, False
+    return vehicle_id, time.perf_counter() - start, ok
+
+def generate_batch(args, manifest_path, workers=None):
+    """Generate documentation for every vehicle in a batch manifest; returns True if all succeeded
+    
+    Data is loaded once in this process. Where the fork start method is
+    available, worker processes are forked after loading and inherit it
+    without copying or re-reading; elsewhere (spawn, forkserver) it is pickled
+    to each worker once, when the worker starts. Workers render one vehicle at
+    a time and split the pandoc concurrency (--pdf-workers, default CPU
+    count) between them. With a single worker, or while stages are traced
+    (worker processes do not report their stages), vehicles are rendered here.
+    """
+    global _batch
+    manifest = load_batch_manifest(manifest_path)
+    if manifest is None:
+        logger.error("Invalid batch manifest: %s", manifest_path)
+        return False
+    
+    start = time.perf_counter()
+    cache = {}
+    with tracing.stage('load_data'):
+        jobs = batch_jobs(args, manifest, manifest_path, cache)
+    output_dirs = [os.path.abspath(output_dir) for _, _, output_dir in jobs]
+    if len(set(output_dirs)) != len(output_dirs):
+        logger.error("Vehicles in %s must have distinct output directories", manifest_path)
+        return False
+    load_time = time.perf_counter() - start
+    
+    settings = {key: getattr(args, key) for key in ('templates_dir', 'template_cache_dir', 'compiled_templates',
+                                                    'pdf_workers', 'pandoc_timeout', 'force', 'explain')}
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1 and tracing.active():
+        logger.info("Tracing stages: rendering batch vehicles in this process")
+        workers = 1
+    # Each worker runs its own pandoc semaphore; together they keep to the overall limit
+    settings['pdf_workers'] = max((settings['pdf_workers'] or os.cpu_count() or 1) // workers, 1)
+    start = time.perf_counter()
+    if workers > 1:
+        import multiprocessing
+        if 'fork' in multiprocessing.get_all_start_methods():
+            _batch = (jobs, settings)
+            try:
+                with multiprocessing.get_context('fork').Pool(workers, initializer=_init_batch_worker) as pool:
+                    results = list(pool.imap_unordered(_render_vehicle, range(len(jobs))))
+            finally:
+                _batch = None
+        else:
+            with multiprocessing.Pool(workers, initializer=_init_batch_worker,
+                                      initargs=((jobs, settings),)) as pool:
+                results = list(pool.imap_unordered(_render_vehicle, range(len(jobs))))
+    else:
+        _batch = (jobs, settings)
+        try:
+            results = [_render_vehicle(index) for index in range(len(jobs))]
+        finally:
+            _batch = None
+    render_time = time.perf_counter() - start
+    
+    for vehicle_id, elapsed, ok in sorted(results):
+        logger.info("%s: %s in %.2fs", vehicle_id, "generated" if ok else "failed", elapsed)
+    sources = sum(1 for key in cache if key[0] in DATA_SOURCES)
+    logger.info("Batch of %d vehicle(s): %d data source(s) loaded in %.2fs, rendered in %.2fs with %d worker(s)",
+                len(jobs), sources, load_time, render_time, workers)
+    return all(ok for _, _, ok in results)
+
+def build_compliance_matrix(data, templates_dir):
+    """Map R155 requirements to collected evidence"""
+    compliance_matrix = {
+        'meta': data['meta'],
+        'compliance_points': [],
+    }
+    
+    with tracing.stage('compliance_matrix'):
         r155_reqs = load_r155_requirements(os.path.join(templates_dir, 'r155_requirements.yaml'))
         
         for req in r155_reqs:
@@ -135,66 +720,63 @@ def generate_documentation(data, output_dir, templates_dir):
                 'evidence': evidence,
                 'status': 'Compliant' if evidence else 'Non-compliant',
             })
-        
-        # Write compliance matrix
-        matrix_template = env.get_template('compliance_matrix.md.j2')
-        matrix_path = os.path.join(output_dir, "r155_compliance_matrix.md")
-        
-        with open(matrix_path, 'w') as f:
-            f.write(matrix_template.render(data=compliance_matrix))
-            
-        logger.info("Generated compliance matrix: %s", matrix_path)
-        
-    except Exception as e:
-        logger.error("Error generating compliance matrix: %s", str(e))
     
-    # Generate executive summary
-    try:
-        summary_template = env.get_template('executive_summary.md.j2')
-        summary_path = os.path.join(output_dir, "r155_executive_summary.md")
-        
-        with open(summary_path, 'w') as f:
-            f.write(summary_template.render(data=data))
-            
-        logger.info("Generated executive summary: %s", summary_path)
-        
-    except Exception as e:
-        logger.error("Error generating executive summary: %s", str(e))
+    return compliance_matrix
 
 def load_r155_requirements(requirements_path):
-    """Load R155 requirements definition"""
+    """Iterate over the R155 requirements definition, read a requirement at a time"""
     if os.path.exists(requirements_path):
-        with open(requirements_path, 'r') as f:
-            return yaml.safe_load(f)
+        return safe_yaml.iter_items(requirements_path)
     else:
         logger.warning("R155 requirements definition not found: %s", requirements_path)
         return []
 
-def find_evidence_for_requirement(req_id, data):
-    """Find evidence for a specific R155 requirement in collected data"""
-    evidence = []
+def build_evidence_index(data):
+    """Build a requirement_id -> [evidence] index in a single pass over controls and verification results
+    
+    Evidence for each requirement is ordered as the sources were loaded:
+    controls first, then verification results.
+    """
+    index = {}
     
-    # Check controls
-    for control in data['controls']:
-        if req_id in control.get('requirements', []):
-            evidence.append({
+    for control in evidence_records('control', data['controls']):
+        # dict.fromkeys drops duplicate requirement IDs while keeping their order
+        for req_id in dict.fromkeys(control.get('requirements', [])):
+            index.setdefault(req_id, []).append({
                 'type': 'control',
                 'id': control.get('id'),
                 'name': control.get('name'),
                 'description': control.get('description'),
             })
     
-    # Check verification results
-    for verify in data['verification']:
-        if req_id in verify.get('requirements', []):
-            evidence.append({
+    for verify in evidence_records('verification', data['verification']):
+        for req_id in dict.fromkeys(verify.get('requirements', [])):
+            index.setdefault(req_id, []).append({
                 'type': 'verification',
                 'id': verify.get('id'),
                 'name': verify.get('name'),
                 'result': verify.get('result'),
             })
     
-    return evidence
+    return index
+
+def evidence_records(kind, records):
+    """Yield the records with a list of hashable requirement IDs, logging the others"""
+    for record in records:
+        if not isinstance(record, dict):
+            logger.error("Ignoring %s evidence that is not an object (%s)", kind, type(record).__name__)
+            continue
+        requirements = record.get('requirements', [])
+        if not isinstance(requirements, list) or not all(isinstance(r, (str, int)) for r in requirements):
+            logger.error("Ignoring %s %s: requirements must be a list of requirement IDs", kind, record.get('id'))
+            continue
+        yield record
+
+def find_evidence_for_requirement(req_id, data):
+    """Find evidence for a specific R155 requirement in collected data"""
+    if 'evidence_index' not in data:
+        data['evidence_index'] = build_evidence_index(data)
+    return list(data['evidence_index'].get(req_id, []))
 
 def main():
     """Main entry point"""
@@ -212,13 +794,73 @@ def main():
                         help='Directory containing documentation templates')
     parser.add_argument('--output-dir', default='./output',
                         help='Directory to output generated documentation')
+    parser.add_argument('--pdf-workers', type=int, default=None,
+                        help='Maximum concurrent pandoc processes (default: CPU count)')
+    parser.add_argument('--pandoc-timeout', type=float, default=PANDOC_TIMEOUT,
+                        help='Seconds before a pandoc conversion is abandoned')
+    parser.add_argument('--template-cache-dir', default=None,
+                        help='Directory for the template bytecode cache (default: system temp directory)')
+    parser.add_argument('--compiled-templates', default=None,
+                        help='Directory or .zip of precompiled templates to load before the sources')
+    parser.add_argument('--precompile-templates', metavar='TARGET', default=None,
+                        help='Compile the templates directory into TARGET (directory or .zip) and exit')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every output even if its inputs are unchanged')
+    parser.add_argument('--explain', action='store_true',
+                        help='Log why each output is rebuilt or skipped')
+    parser.add_argument('--lazy-data', action='store_true',
+                        help='Read threats and verification results from disk while rendering '
+                             '(flat memory for very large tables)')
+    parser.add_argument('--load-workers', type=int, default=None,
+                        help='Threads used to read data source files (default: Python default)')
+    parser.add_argument('--validate-only', action='store_true',
+                        help='Validate threat models and incident response inputs, then exit')
+    parser.add_argument('--batch', metavar='MANIFEST', default=None,
+                        help='Generate documentation for every vehicle in a batch manifest '
+                             '(into <output-dir>/<vehicle id> unless the manifest sets output_dir)')
+    parser.add_argument('--batch-workers', type=int, default=None,
+                        help='Worker processes rendering batch vehicles (default: CPU count)')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='Trace the duration and memory of each stage (loading, template renders, pandoc, '
+                             'compliance matrix) into FILE: Chrome trace format if it ends in .json, '
+                             'folded stacks for flame graphs otherwise')
     
     args = parser.parse_args()
     
-    logger.info("Starting R155 documentation generation")
-    data = load_data_sources(args)
-    generate_documentation(data, args.output_dir, args.templates_dir)
-    logger.info("Documentation generation complete")
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    if args.validate_only:
+        paths = [p for p in (args.threat_models_dir, args.incident_dir, args.batch) if p and os.path.exists(p)]
+        issues = [issue for _, file_issues in validation.validate_paths(paths).values() for issue in file_issues]
+        validation.log_issues(issues)
+        sys.exit(1 if issues else 0)
+    
+    if args.precompile_templates:
+        precompile_templates(args.templates_dir, args.precompile_templates)
+        return
+    
+    if args.trace:
+        tracing.enable()
+    try:
+        if args.batch:
+            logger.info("Starting R155 batch documentation generation")
+            ok = generate_batch(args, args.batch, args.batch_workers)
+        else:
+            logger.info("Starting R155 documentation generation")
+            env = get_environment(args.templates_dir, args.template_cache_dir, args.compiled_templates)
+            with tracing.stage('load_data'):
+                data = load_data_sources(args)
+            ok = generate_documentation(data, args.output_dir, args.templates_dir, args.pdf_workers,
+                                        args.pandoc_timeout, env, args.force, args.explain)
+            if ok:
+                logger.info("Documentation generation complete")
+            else:
+                logger.error("Documentation generation failed for one or more documents")
+    finally:
+        tracing.finish(args.trace)
+    if not ok:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+"""
+Incident Response Capacity Simulator
+
+This script sizes incident response staffing by simulating incident arrivals
+against the response phases and roles of the incident response playbook.
+
+Each incident works through the phases of its specific playbook (or every
+response phase but those skipped), in order. Within a phase, every role
+responsible for one of its tasks gets one job, whose length is the role's
+share of the phase's task effort, and the phase ends when all of its jobs
+are done. Jobs queue for a free responder of their role, most severe
+incident first. The triage severity_roles join the triage default phase.
+Arrival rates, headcount, effort and SLAs come from a capacity scenario
+file (see capacity_scenario.yaml); arrivals are Poisson streams per incident
+type, or replayed from a JSON Lines history of incidents.
+
+The simulation is event-driven with a binary-heap event queue, so its cost
+grows with the number of jobs rather than with simulated time. Every
+combination of the scenario's sweep values is simulated for several
+replications (with the same random seeds, so scenarios are compared on the
+same incidents), spread over worker processes. The summary reports per
+incident type the SLA breach rate, time to reach the SLA phase, queueing
+delay and resolution time, per role the utilization, and the smallest
+staffing that meets the breach-rate target; it is picked up by the
+compliance checker as 7.2.1.7 evidence.
+
+Example:
+    python capacity_simulator.py --scenario capacity_scenario.yaml --summary capacity_summary.json \
+        --processes 0
+"""
+
+import argparse
+import array
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from r155_common import artifacts, validation
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_ORDER = ["Low", "Medium", "High", "Critical"]
+SEVERITY_RANK = {name: rank for rank, name in enumerate(SEVERITY_ORDER)}
+
+HOURS_PER_DAY = 24.0
+
+DEFAULT_HORIZON_DAYS = 365
+DEFAULT_REPLICATIONS = 4
+DEFAULT_TASK_HOURS = 4.0
+DEFAULT_AUTOMATION_FACTOR = 0.25
+DEFAULT_EFFORT_CV = 0.5
+DEFAULT_SKIP_PHASES = ["PHASE-PREP"]
+DEFAULT_SLA_PHASE = "PHASE-CONTAIN"
+DEFAULT_MAX_BREACH_RATE = 0.05
+
+# Event kinds
+ARRIVAL = 0
+REPLAY = 1
+JOB_DONE = 2
+
+# Incident state fields (incidents are lists, for speed)
+TYPE, RANK, ARRIVED, PLAN, PHASE, PENDING, WAIT, SLA_PHASE, SLA_HOURS = range(9)
+
+
+class CapacityModel:
+    """The playbook's phases and roles combined with a scenario's arrivals and effort
+
+    Every (incident type, severity) is compiled into a plan: per phase, a
+    tuple of (role index, lognormal mu) jobs.
+    """
+
+    def __init__(self, playbook, scenario):
+        self.roles = [role["id"] for role in playbook.get("roles", [])]
+        role_index = {role: i for i, role in enumerate(self.roles)}
+        incident_types = {t["id"]: t for t in playbook.get("incident_types", [])}
+        phases = {phase["id"]: phase for phase in playbook.get("response_phases", [])}
+
+        effort = scenario.get("effort") or {}
+        task_hours = effort.get("task_hours", DEFAULT_TASK_HOURS)
+        phase_task_hours = effort.get("phase_task_hours") or {}
+        severity_factor = effort.get("severity_factor") or {}
+        automation_factor = effort.get("automation_factor", DEFAULT_AUTOMATION_FACTOR)
+        cv = effort.get("cv", DEFAULT_EFFORT_CV)
+        skip_phases = set(effort.get("skip_phases", DEFAULT_SKIP_PHASES))
+        # Job lengths are lognormal with the task effort as mean
+        self.sigma = math.sqrt(math.log(1 + cv * cv))
+
+        triage = playbook.get("triage") or {}
+        triage_phase = triage.get("default_phase", "PHASE-DETECT")
+        severity_roles = triage.get("severity_roles") or {}
+
+        sla = scenario.get("sla") or {}
+        sla_phase = sla.get("phase", DEFAULT_SLA_PHASE)
+        sla_hours = sla.get("hours") or {}
+        if sla_phase not in phases:
+            raise ValueError(f"SLA phase {sla_phase} is not a response phase of the playbook")
+
+        default_order = [phase_id for phase_id in phases if phase_id not in skip_phases]
+        specific_order = {
+            playbook_["incident_type"]: list(dict.fromkeys(step["phase"] for step in playbook_["steps"]
+                                                           if isinstance(step, dict) and "phase" in step))
+            for playbook_ in playbook.get("specific_playbooks", [])
+        }
+
+        self.incident_types = []
+        # Per incident type: (incidents per hour, cumulative severity weights, severity ranks)
+        self.arrivals = []
+        # (incident type index, severity rank) -> (phase plan, SLA phase position, SLA hours)
+        self.plans = {}
+        for type_id, arrival in (scenario.get("arrivals") or {}).items():
+            if type_id not in incident_types:
+                raise ValueError(f"Arrivals reference unknown incident type {type_id}")
+            allowed = [s for s in SEVERITY_ORDER if s in incident_types[type_id].get("severity_levels", SEVERITY_ORDER)]
+            mix = arrival.get("severity_mix") or dict.fromkeys(allowed, 1.0)
+            for severity in mix:
+                if severity not in allowed:
+                    raise ValueError(f"Severity {severity} is not allowed for incident type {type_id}")
+            order = specific_order.get(type_id) or default_order
+            for phase_id in order:
+                if phase_id not in phases:
+                    raise ValueError(f"Playbook for {type_id} references unknown phase {phase_id}")
+            if sla_phase not in order:
+                raise ValueError(f"SLA phase {sla_phase} is not part of the response to {type_id}")
+
+            if arrival["per_day"] < 0:
+                raise ValueError(f"Arrival rate of {type_id} is negative")
+            if any(weight < 0 for weight in mix.values()):
+                raise ValueError(f"Severity mix of {type_id} has a negative weight")
+            severities = [s for s in allowed if mix.get(s, 0) > 0]
+            if not severities:
+                raise ValueError(f"Severity mix of {type_id} has no positive weight")
+
+            type_index = len(self.incident_types)
+            self.incident_types.append(type_id)
+            self.arrivals.append((arrival["per_day"] / HOURS_PER_DAY,
+                                  list(itertools.accumulate(mix[s] for s in severities)),
+                                  [SEVERITY_RANK[s] for s in severities]))
+
+            for severity in allowed:
+                factor = severity_factor.get(severity, 1.0)
+                plan = []
+                for phase_id in order:
+                    hours = phase_task_hours.get(phase_id, task_hours) * factor
+                    work = {}
+                    for task in phases[phase_id].get("tasks", []):
+                        task_effort = hours * (automation_factor if task.get("automation") else 1.0)
+                        for role in task.get("responsible", []):
+                            work[role] = work.get(role, 0.0) + task_effort
+                    if phase_id == triage_phase:
+                        for role in severity_roles.get(severity, []):
+                            work[role] = work.get(role, 0.0) + hours
+                    plan.append(tuple((role_index[role], math.log(mean) - self.sigma ** 2 / 2)
+                                      for role, mean in work.items() if mean > 0))
+                self.plans[(type_index, SEVERITY_RANK[severity])] = (
+                    tuple(plan), order.index(sla_phase), sla_hours.get(severity))
+
+        self.type_index = {type_id: i for i, type_id in enumerate(self.incident_types)}
+        self.used_roles = sorted({role for plan, _, _ in self.plans.values() for jobs in plan for role, _ in jobs})
+
+    def staffing_vector(self, staffing):
+        """Responders per role index; every role with work must have at least one"""
+        for role in staffing:
+            if role not in self.roles:
+                raise ValueError(f"Staffing references unknown role {role}")
+        vector = [int(staffing.get(role, 0)) for role in self.roles]
+        for index in self.used_roles:
+            if vector[index] < 1:
+                raise ValueError(f"Role {self.roles[index]} has work but no staffing")
+        return vector
+
+
+def simulate(model, staffing, horizon_hours, seed, arrival_scale=1.0, history=None):
+    """Run one replication; returns raw per-type and per-role results
+
+    history is a sorted list of (hours, type index, severity rank) arrivals
+    replayed instead of the Poisson streams; arrival_scale compresses it.
+    Arrivals stop at the horizon, and the simulation runs until every
+    incident is resolved.
+    """
+    rng = random.Random(seed)
+    lognormvariate = rng.lognormvariate
+    sigma = model.sigma
+    heap = []
+    push = heapq.heappush
+    pop = heapq.heappop
+    sequence = itertools.count()
+
+    free = list(staffing)
+    queues = [[] for _ in staffing]
+    busy = [0.0] * len(staffing)
+    max_queue = [0] * len(staffing)
+    types = len(model.incident_types)
+    response = [array.array('d') for _ in range(types)]
+    resolution = [array.array('d') for _ in range(types)]
+    waiting = [array.array('d') for _ in range(types)]
+    breaches = [0] * types
+    plans = model.plans
+
+    def enqueue(incident, role, mu, now):
+        if free[role]:
+            free[role] -= 1
+            duration = lognormvariate(mu, sigma)
+            busy[role] += duration
+            push(heap, (now + duration, next(sequence), JOB_DONE, (role, incident)))
+        else:
+            queue = queues[role]
+            push(queue, (-incident[RANK], incident[ARRIVED], next(sequence), mu, incident, now))
+            if len(queue) > max_queue[role]:
+                max_queue[role] = len(queue)
+
+    def advance(incident, now):
+        """Start the incident's next phase with work, recording SLA and resolution times on the way"""
+        plan = incident[PLAN]
+        while True:
+            if incident[PHASE] == incident[SLA_PHASE]:
+                elapsed = now - incident[ARRIVED]
+                response[incident[TYPE]].append(elapsed)
+                if incident[SLA_HOURS] is not None and elapsed > incident[SLA_HOURS]:
+                    breaches[incident[TYPE]] += 1
+            incident[PHASE] += 1
+            if incident[PHASE] == len(plan):
+                resolution[incident[TYPE]].append(now - incident[ARRIVED])
+                waiting[incident[TYPE]].append(incident[WAIT])
+                return
+            jobs = plan[incident[PHASE]]
+            if jobs:
+                incident[PENDING] = len(jobs)
+                for role, mu in jobs:
+                    enqueue(incident, role, mu, now)
+                return
+
+    def raise_incident(type_index, rank, now):
+        plan, sla_phase, sla_hours = plans[(type_index, rank)]
+        # PHASE starts before the first phase; advance() moves it on
+        incident = [type_index, rank, now, plan, -1, 0, 0.0, sla_phase, sla_hours]
+        advance(incident, now)
+
+    if history is None:
+        for type_index, (rate, _, _) in enumerate(model.arrivals):
+            if rate > 0:
+                push(heap, (rng.expovariate(rate * arrival_scale), next(sequence), ARRIVAL, type_index))
+    else:
+        horizon_hours /= arrival_scale
+        history = iter(history)
+        first = next(history, None)
+        if first is not None:
+            push(heap, (first[0] / arrival_scale, next(sequence), REPLAY, first[1:]))
+
+    events = 0
+    now = 0.0
+    while heap:
+        now, _, kind, data = pop(heap)
+        events += 1
+        if kind == JOB_DONE:
+            role, incident = data
+            queue = queues[role]
+            if queue:
+                _, _, _, mu, next_incident, ready = pop(queue)
+                next_incident[WAIT] += now - ready
+                duration = lognormvariate(mu, sigma)
+                busy[role] += duration
+                push(heap, (now + duration, next(sequence), JOB_DONE, (role, next_incident)))
+            else:
+                free[role] += 1
+            incident[PENDING] -= 1
+            if not incident[PENDING]:
+                advance(incident, now)
+        elif kind == ARRIVAL:
+            rate, weights, ranks = model.arrivals[data]
+            rank = ranks[0] if len(ranks) == 1 else rng.choices(ranks, cum_weights=weights)[0]
+            raise_incident(data, rank, now)
+            arrival = now + rng.expovariate(rate * arrival_scale)
+            if arrival < horizon_hours:
+                push(heap, (arrival, next(sequence), ARRIVAL, data))
+        else:
+            raise_incident(data[0], data[1], now)
+            following = next(history, None)
+            if following is not None:
+                push(heap, (following[0] / arrival_scale, next(sequence), REPLAY, following[1:]))
+
+    return {
+        "response": response,
+        "resolution": resolution,
+        "waiting": waiting,
+        "breaches": breaches,
+        "busy": busy,
+        "max_queue": max_queue,
+        "end": max(now, horizon_hours),
+        "events": events,
+    }
+
+
+def load_history(path, model):
+    """Read incidents (timestamp, incident_type, severity) from JSON Lines; returns (arrivals, skipped)
+
+    Timestamps are ISO 8601 strings or epoch seconds. Arrivals are
+    (hours since the first incident, type index, severity rank), sorted.
+    """
+    arrivals = []
+    skipped = 0
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                incident = json.loads(line)
+                timestamp = incident["timestamp"]
+                if isinstance(timestamp, str):
+                    timestamp = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+                key = (model.type_index[incident["incident_type"]], SEVERITY_RANK[incident["severity"]])
+                if key not in model.plans:
+                    raise KeyError(incident["severity"])
+            except (ValueError, KeyError, TypeError, AttributeError):
+                skipped += 1
+                continue
+            arrivals.append((float(timestamp) / 3600, *key))
+    arrivals.sort()
+    if arrivals:
+        start = arrivals[0][0]
+        arrivals = [(hours - start, type_index, rank) for hours, type_index, rank in arrivals]
+    return arrivals, skipped
+
+
+def sweep_scenarios(scenario):
+    """(staffing, arrival scale) for every combination of the scenario's sweep values"""
+    sweep = scenario.get("sweep") or {}
+    roles = list((sweep.get("staffing") or {}).items())
+    scales = sweep.get("arrival_scale") or [1.0]
+    if any(scale <= 0 for scale in scales):
+        raise ValueError("Sweep arrival scales must be greater than 0")
+    scenarios = []
+    for scale in scales:
+        for counts in itertools.product(*(values for _, values in roles)):
+            staffing = dict(scenario["staffing"])
+            staffing.update(zip((role for role, _ in roles), counts))
+            scenarios.append((staffing, scale))
+    return scenarios
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def distribution(values):
+    values = sorted(values)
+    return {
+        "mean": round(sum(values) / len(values), 2) if values else None,
+        "p50": round(percentile(values, 50), 2) if values else None,
+        "p90": round(percentile(values, 90), 2) if values else None,
+        "p95": round(percentile(values, 95), 2) if values else None,
+    }
+
+
+def summarize_scenario(model, staffing, scale, runs, max_breach_rate):
+    """Merge the replications of one scenario into its summary"""
+    types = {}
+    incidents_total = 0
+    breaches_total = 0
+    for type_index, type_id in enumerate(model.incident_types):
+        response = [v for run in runs for v in run["response"][type_index]]
+        breaches = sum(run["breaches"][type_index] for run in runs)
+        incidents_total += len(response)
+        breaches_total += breaches
+        types[type_id] = {
+            "incidents": len(response),
+            "sla_breach_rate": round(breaches / len(response), 4) if response else None,
+            "sla_phase_hours": distribution(response),
+            "queueing_delay_hours": distribution([v for run in runs for v in run["waiting"][type_index]]),
+            "resolution_hours": distribution([v for run in runs for v in run["resolution"][type_index]]),
+        }
+    roles = {}
+    for index, role in enumerate(model.roles):
+        if index not in model.used_roles:
+            continue
+        capacity = sum(run["end"] for run in runs) * staffing[role]
+        roles[role] = {
+            "responders": staffing[role],
+            "utilization": round(sum(run["busy"][index] for run in runs) / capacity, 4),
+            "max_queue": max(run["max_queue"][index] for run in runs),
+        }
+    breach_rate = breaches_total / incidents_total if incidents_total else 0.0
+    return {
+        "staffing": staffing,
+        "responders": sum(staffing[model.roles[index]] for index in model.used_roles),
+        "arrival_scale": scale,
+        "incidents": incidents_total,
+        "sla_breach_rate": round(breach_rate, 4),
+        "meets_target": all(t["sla_breach_rate"] is None or t["sla_breach_rate"] <= max_breach_rate
+                            for t in types.values()),
+        "incident_types": types,
+        "roles": roles,
+    }
+
+
+# Model and run settings used by worker processes, set once per process
+_worker = None
+
+
+def _init_worker(playbook, scenario, settings):
+    global _worker
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker = (CapacityModel(playbook, scenario), settings)
+
+
+def _run_replication(task):
+    scenario_index, replication = task
+    model, settings = _worker
+    staffing, scale = settings["scenarios"][scenario_index]
+    result = simulate(model, model.staffing_vector(staffing), settings["horizon_hours"],
+                      settings["seed"] + replication, scale, settings["history"])
+    return scenario_index, result
+
+
+def run_simulation(playbook, scenario, processes=1, replications=None, history_path=None):
+    """Simulate every sweep scenario; returns the summary dict"""
+    start = time.perf_counter()
+    # Compiled in the parent even in multiprocess mode, so a bad scenario fails before any work starts
+    model = CapacityModel(playbook, scenario)
+    scenarios = sweep_scenarios(scenario)
+    for staffing, _ in scenarios:
+        model.staffing_vector(staffing)
+
+    history = None
+    horizon_hours = scenario.get("horizon_days", DEFAULT_HORIZON_DAYS) * HOURS_PER_DAY
+    if history_path:
+        history, skipped = load_history(history_path, model)
+        if skipped:
+            logger.warning(f"Skipped {skipped} unreadable or unknown incident(s) in {history_path}")
+        horizon_hours = history[-1][0] if history else 0.0
+        logger.info(f"Replaying {len(history)} incidents over {horizon_hours / HOURS_PER_DAY:.1f} days")
+
+    replications = replications or scenario.get("replications", DEFAULT_REPLICATIONS)
+    settings = {"scenarios": scenarios, "horizon_hours": horizon_hours, "seed": scenario.get("seed", 0),
+                "history": history}
+    tasks = [(index, replication) for index in range(len(scenarios)) for replication in range(replications)]
+
+    runs = [[] for _ in scenarios]
+    if processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(processes, len(tasks)), initializer=_init_worker,
+                                  initargs=(playbook, scenario, settings)) as pool:
+            for index, result in pool.imap_unordered(_run_replication, tasks):
+                runs[index].append(result)
+    else:
+        global _worker
+        _worker = (model, settings)
+        try:
+            for index, result in map(_run_replication, tasks):
+                runs[index].append(result)
+        finally:
+            _worker = None
+
+    max_breach_rate = scenario.get("max_breach_rate", DEFAULT_MAX_BREACH_RATE)
+    summaries = [summarize_scenario(model, staffing, scale, scenario_runs, max_breach_rate)
+                 for (staffing, scale), scenario_runs in zip(scenarios, runs)]
+
+    # Per arrival scale, the fewest responders meeting the target (ties: lowest breach rate)
+    recommended = []
+    for scale in dict.fromkeys(scale for _, scale in scenarios):
+        candidates = [(s["responders"], s["sla_breach_rate"], index) for index, s in enumerate(summaries)
+                      if s["arrival_scale"] == scale and s["meets_target"]]
+        if candidates:
+            index = min(candidates)[2]
+            recommended.append({"arrival_scale": scale, "scenario": index, "staffing": summaries[index]["staffing"]})
+        else:
+            recommended.append({"arrival_scale": scale, "scenario": None, "staffing": None})
+
+    events = sum(run["events"] for scenario_runs in runs for run in scenario_runs)
+    elapsed = time.perf_counter() - start
+    return {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "arrivals": "history" if history_path else "poisson",
+        "horizon_days": round(horizon_hours / HOURS_PER_DAY, 2),
+        "replications": replications,
+        "max_breach_rate": max_breach_rate,
+        "sla_phase": (scenario.get("sla") or {}).get("phase", DEFAULT_SLA_PHASE),
+        "events_processed": events,
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(events / elapsed) if elapsed > 0 else None,
+        "baseline": scenario["staffing"],
+        "recommended": recommended,
+        "scenarios": summaries,
+    }
+
+
+def log_summary(summary):
+    """Log one line per scenario, then the recommendations"""
+    logger.info(f"{'#':>3}  {'scale':>5}  {'responders':>10}  {'breach rate':>11}  {'worst type':<24}  staffing")
+    for index, scenario in enumerate(summary["scenarios"]):
+        rated = [(t["sla_breach_rate"], type_id) for type_id, t in scenario["incident_types"].items()
+                 if t["sla_breach_rate"] is not None]
+        worst = max(rated, default=(0.0, "-"))
+        staffing = " ".join(f"{role.replace('ROLE-', '')}={count}" for role, count in scenario["staffing"].items())
+        logger.info(f"{index:>3}  {scenario['arrival_scale']:>5.2f}  {scenario['responders']:>10}  "
+                    f"{scenario['sla_breach_rate']:>11.2%}  {worst[1] + f' {worst[0]:.1%}':<24}  {staffing}")
+    for recommendation in summary["recommended"]:
+        if recommendation["scenario"] is None:
+            logger.warning(f"No simulated staffing meets the {summary['max_breach_rate']:.0%} breach target "
+                           f"at arrival scale {recommendation['arrival_scale']}")
+        else:
+            logger.info(f"Smallest staffing meeting the {summary['max_breach_rate']:.0%} breach target at arrival "
+                        f"scale {recommendation['arrival_scale']}: scenario {recommendation['scenario']}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Simulate incident response capacity against the playbook')
+
+    parser.add_argument('--scenario', default='capacity_scenario.yaml', help='Capacity scenario file')
+    parser.add_argument('--playbook', default=None,
+                        help='Incident response playbook (default: the scenario\'s playbook)')
+    parser.add_argument('--history', default=None,
+                        help='Replay incidents from JSON Lines (timestamp, incident_type, severity) '
+                             'instead of Poisson arrivals')
+    parser.add_argument('--replications', type=int, default=None,
+                        help='Replications per scenario (default: from the scenario file)')
+    parser.add_argument('--processes', type=int, default=1, help='Worker processes (0 = CPU count, default: 1)')
+    parser.add_argument('--summary', help='Write a JSON summary (usable as 7.2.1.7 evidence) to this path')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        scenario = artifacts.load_artifact(args.scenario, 'yaml')
+        if validation.validate_document(scenario, 'capacity_scenario', args.scenario):
+            validation.log_issues(validation.validate_file(args.scenario, 'capacity_scenario')[1])
+            sys.exit(1)
+        playbook_path = args.playbook or os.path.join(os.path.dirname(args.scenario),
+                                                      scenario.get("playbook", "vehicle_security_incident_playbook.yaml"))
+        playbook = artifacts.load_artifact(playbook_path, 'yaml')
+        if validation.validate_document(playbook, 'playbook', playbook_path):
+            validation.log_issues(validation.validate_file(playbook_path, 'playbook')[1])
+            sys.exit(1)
+    except Exception as e:
+        logger.error(f"Error loading scenario or playbook: {str(e)}")
+        sys.exit(1)
+
+    processes = args.processes or os.cpu_count() or 1
+    try:
+        summary = run_simulation(playbook, scenario, processes, args.replications, args.history)
+    except (ValueError, OSError) as e:
+        logger.error(f"Invalid capacity scenario: {str(e)}")
+        sys.exit(1)
+
+    log_summary(summary)
+    logger.info(f"Simulated {len(summary['scenarios'])} scenario(s) x {summary['replications']} replication(s): "
+                f"{summary['events_processed']} events in {summary['elapsed_seconds']}s "
+                f"({summary['events_per_second']} events/s)")
+
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Summary written to {args.summary}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Vehicle Security Event Triage Engine
+
+This script classifies a stream of fleet security events (JSON Lines) into
+incident types, severities and responsible roles using the triage rules,
+incident types and roles defined in the incident response playbook.
+
+The playbook is compiled once into a lookup table keyed on the event type,
+so classifying an event is a dict lookup plus a few set-membership tests.
+Events are processed in batches, optionally spread over worker processes.
+
+Example:
+    python triage_engine.py --playbook vehicle_security_incident_playbook.yaml \
+        --events fleet_events.jsonl --output triaged.jsonl --summary triage_summary.json
+"""
+
+import argparse
+import collections
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from r155_common import artifacts, validation
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_ORDER = ["Low", "Medium", "High", "Critical"]
+SEVERITY_RANK = {name: rank for rank, name in enumerate(SEVERITY_ORDER)}
+
+# Events read per batch; also the unit of work sent to worker processes
+DEFAULT_BATCH_SIZE = 20000
+
+UNCLASSIFIED = "UNCLASSIFIED"
+
+# Rules are indexed on this event field; every rule must constrain it
+INDEX_FIELD = "event_type"
+
+
+class CompiledRule:
+    """A triage rule with its conditions and outcomes precomputed"""
+
+    __slots__ = ("index", "incident_type", "incident_name", "conditions", "default_severity",
+                 "escalations", "allowed", "roles_by_severity", "output_suffix")
+
+    def __init__(self, index, rule, incident_type, roles, severity_roles):
+        self.index = index
+        self.incident_type = incident_type["id"]
+        self.incident_name = incident_type["name"]
+        # Conditions other than the indexed key, as (field, allowed values) pairs
+        self.conditions = tuple((field, compile_values(values)) for field, values in rule["match"].items()
+                                if field != INDEX_FIELD)
+
+        self.allowed = [s for s in SEVERITY_ORDER if s in incident_type.get("severity_levels", SEVERITY_ORDER)]
+        severity = rule.get("severity", {})
+        self.default_severity = self.clamp(severity.get("default", self.allowed[0]))
+        self.escalations = tuple(
+            (tuple((field, compile_values(values)) for field, values in escalation["when"].items()),
+             self.clamp(escalation["severity"]))
+            for escalation in severity.get("escalations", [])
+        )
+
+        # Role lists, and the JSON they serialize to, are resolved per severity up front
+        self.roles_by_severity = {}
+        self.output_suffix = {}
+        for level in self.allowed:
+            combined = list(dict.fromkeys(list(rule.get("roles", roles)) + list(severity_roles.get(level, []))))
+            self.roles_by_severity[level] = combined
+            self.output_suffix[level] = json.dumps({
+                "incident_type": self.incident_type,
+                "incident_name": self.incident_name,
+                "severity": level,
+                "roles": combined,
+            })[1:]
+
+    def clamp(self, severity):
+        """Clamp a severity into the levels allowed for this incident type"""
+        rank = SEVERITY_RANK[severity]
+        for level in self.allowed:
+            if SEVERITY_RANK[level] >= rank:
+                return level
+        return self.allowed[-1]
+
+    # A list or object field value raises TypeError on lookup; it is never one of the allowed values
+
+    def matches(self, event):
+        try:
+            for field, values in self.conditions:
+                if event.get(field) not in values:
+                    return False
+        except TypeError:
+            return False
+        return True
+
+    def severity(self, event):
+        for conditions, severity in self.escalations:
+            try:
+                if all(event.get(field) in values for field, values in conditions):
+                    return severity
+            except TypeError:
+                continue
+        return self.default_severity
+
+
+def encode_value(value):
+    """JSON-encode a scalar, taking the fast path for strings"""
+    if type(value) is str:
+        return encode_string(value)
+    return json.dumps(value)
+
+
+encode_string = json.encoder.encode_basestring_ascii
+
+
+def compile_values(values):
+    """Normalise a condition value or list of values into a frozenset"""
+    if not isinstance(values, list):
+        values = [values]
+    return frozenset(values)
+
+
+class TriageEngine:
+    """Classifies security events according to a compiled playbook"""
+
+    def __init__(self, playbook):
+        """Compile the playbook's triage rules into an event-type index"""
+        incident_types = {t["id"]: t for t in playbook.get("incident_types", [])}
+        role_names = {r["id"]: r["name"] for r in playbook.get("roles", [])}
+        triage = playbook.get("triage", {})
+
+        # Default roles are those responsible for the detection phase
+        default_phase = triage.get("default_phase", "PHASE-DETECT")
+        default_roles = []
+        for phase in playbook.get("response_phases", []):
+            if phase.get("id") == default_phase:
+                for task in phase.get("tasks", []):
+                    default_roles.extend(task.get("responsible", []))
+        default_roles = list(dict.fromkeys(default_roles))
+
+        self.role_names = role_names
+        self.index = collections.defaultdict(list)
+        self.rules = []
+        for i, rule in enumerate(triage.get("rules", [])):
+            if rule["incident_type"] not in incident_types:
+                raise ValueError(f"Triage rule {i} references unknown incident type {rule['incident_type']}")
+            if INDEX_FIELD not in rule.get("match", {}):
+                raise ValueError(f"Triage rule {i} must match on '{INDEX_FIELD}'")
+            compiled = CompiledRule(i, rule, incident_types[rule["incident_type"]],
+                                    default_roles, triage.get("severity_roles", {}))
+            for role in {r for roles in compiled.roles_by_severity.values() for r in roles}:
+                if role not in role_names:
+                    raise ValueError(f"Triage rule {i} references unknown role {role}")
+            self.rules.append(compiled)
+            for key in compile_values(rule["match"][INDEX_FIELD]):
+                self.index[key].append(compiled)
+        self.index = dict(self.index)
+
+        logger.info(f"Compiled {len(self.rules)} triage rules over {len(self.index)} event types")
+
+    def classify(self, event):
+        """Return (rule, severity) for an event, or (None, None) if no rule matches"""
+        for rule in self.index.get(event.get(INDEX_FIELD), ()):
+            if rule.matches(event):
+                return rule, rule.severity(event)
+        return None, None
+
+    def triage_lines(self, lines, emit_unclassified=False):
+        """Classify a batch of JSON lines; returns (output_lines, counts, errors)"""
+        output = []
+        counts = collections.Counter()
+        errors = 0
+        loads = json.loads
+        classify = self.classify
+
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                event = loads(line)
+                rule, severity = classify(event)
+            except (ValueError, AttributeError, TypeError):
+                errors += 1
+                continue
+
+            if rule is None:
+                counts[(UNCLASSIFIED, None)] += 1
+                if not emit_unclassified:
+                    continue
+                suffix = '"incident_type": null}'
+            else:
+                counts[(rule.incident_type, severity)] += 1
+                suffix = rule.output_suffix[severity]
+
+            # Only the per-event fields are encoded here; the rest is precomputed per rule
+            output.append(f'{{"event_id": {encode_value(event.get("event_id"))}, '
+                          f'"vin": {encode_value(event.get("vin"))}, '
+                          f'"event_type": {encode_value(event.get(INDEX_FIELD))}, {suffix}')
+
+        return output, counts, errors
+
+
+# Engine used by worker processes, created once per process
+_worker_engine = None
+_worker_emit_unclassified = False
+
+
+def _init_worker(playbook, emit_unclassified):
+    global _worker_engine, _worker_emit_unclassified
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker_engine = TriageEngine(playbook)
+    _worker_emit_unclassified = emit_unclassified
+
+
+def _triage_batch(lines):
+    return _worker_engine.triage_lines(lines, _worker_emit_unclassified)
+
+
+def read_batches(stream, batch_size):
+    """Yield lists of up to batch_size lines from a text stream"""
+    batch = []
+    for line in stream:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_triage(playbook, events, output, processes=1, batch_size=DEFAULT_BATCH_SIZE, emit_unclassified=False):
+    """Triage every event in the events stream, writing JSON Lines to output; returns a summary dict"""
+    totals = collections.Counter()
+    errors = 0
+    start = time.perf_counter()
+
+    # Compiled in the parent even in multiprocess mode, so a bad playbook fails before any work starts
+    engine = TriageEngine(playbook)
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(playbook, emit_unclassified))
+        results = pool.imap(_triage_batch, read_batches(events, batch_size))
+    else:
+        pool = None
+        results = (engine.triage_lines(batch, emit_unclassified) for batch in read_batches(events, batch_size))
+
+    try:
+        for lines, counts, batch_errors in results:
+            if lines:
+                output.write("\n".join(lines))
+                output.write("\n")
+            totals.update(counts)
+            errors += batch_errors
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    elapsed = time.perf_counter() - start
+    return build_summary(totals, errors, elapsed)
+
+
+def build_summary(totals, errors, elapsed):
+    """Aggregate per-incident-type and per-severity counts"""
+    by_type = collections.defaultdict(dict)
+    for (incident_type, severity), count in sorted(totals.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+        by_type[incident_type][severity or "n/a"] = count
+
+    processed = sum(totals.values())
+    unclassified = sum(count for (incident_type, _), count in totals.items() if incident_type == UNCLASSIFIED)
+    return {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "events_processed": processed,
+        "events_classified": processed - unclassified,
+        "events_unclassified": unclassified,
+        "malformed_events": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(processed / elapsed) if elapsed > 0 else None,
+        "incidents": dict(by_type),
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Classify fleet security events using the incident response playbook')
+
+    parser.add_argument('--playbook', default='vehicle_security_incident_playbook.yaml',
+                        help='Path to the incident response playbook')
+    parser.add_argument('--events', default='-', help='JSON Lines event file (default: stdin)')
+    parser.add_argument('--output', default='-', help='JSON Lines output file (default: stdout)')
+    parser.add_argument('--summary', help='Write a JSON summary (usable as 7.2.1.7/7.2.1.8 evidence) to this path')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Worker processes (0 = CPU count, default: 1)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Events per batch')
+    parser.add_argument('--emit-unclassified', action='store_true',
+                        help='Also output events that match no triage rule')
+
+    args = parser.parse_args()
+
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        playbook = artifacts.load_artifact(args.playbook, 'yaml')
+        issues = validation.validate_document(playbook, 'playbook', args.playbook)
+        if issues:
+            validation.log_issues(validation.validate_file(args.playbook, 'playbook')[1])
+            sys.exit(1)
+    except Exception as e:
+        logger.error(f"Error loading playbook: {str(e)}")
+        sys.exit(1)
+
+    processes = args.processes or os.cpu_count() or 1
+    events = sys.stdin if args.events == '-' else open(args.events, 'r')
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        summary = run_triage(playbook, events, output, processes, args.batch_size, args.emit_unclassified)
+    except ValueError as e:
+        logger.error(f"Invalid triage rules: {str(e)}")
+        sys.exit(1)
+    finally:
+        if events is not sys.stdin:
+            events.close()
+        if output is not sys.stdout:
+            output.close()
+
+    logger.info(f"Triaged {summary['events_processed']} events in {summary['elapsed_seconds']}s "
+                f"({summary['events_per_second']} events/s), {summary['events_unclassified']} unclassified, "
+                f"{summary['malformed_events']} malformed")
+
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Summary written to {args.summary}")
+
+
+if __name__ == '__main__':
+    main()
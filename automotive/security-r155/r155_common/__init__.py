@@ -0,0 +1,8 @@
+"""
+Shared helpers for the R155 tooling
+
+Modules in this package are used by the threat model generator, the
+documentation generator and the compliance checker. The scripts live in
+separate directories, so each of them adds this directory's parent to
+sys.path before importing from here.
+"""
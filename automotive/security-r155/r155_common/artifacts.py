@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+R155 Artifact Cache
+
+Parses YAML, JSON and CSV artifacts once and keeps the parsed form in an
+on-disk cache keyed by the SHA-256 of the file content, so every tool that
+reads the same threat model, configuration or matrix afterwards only pays for
+a hash and an unpickle. The cache is bounded in size and evicts the least
+recently used entries first.
+
+Configuration comes from the environment:
+    R155_ARTIFACT_CACHE_DIR        cache location (default ~/.cache/r155-artifacts)
+    R155_ARTIFACT_CACHE_MAX_BYTES  size limit (default 512 MiB)
+    R155_ARTIFACT_CACHE_DISABLE    set to 1 to always parse from source
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Bump when the parsed representation of an artifact changes, or when parsing
+# starts rejecting inputs that earlier versions cached (2: safe_yaml limits)
+CACHE_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'r155-artifacts')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+ENTRY_SUFFIX = '.pickle'
+
+
+def yaml_loader():
+    """Safe YAML loader, using the libyaml bindings when they are available
+
+    yaml is imported here rather than at module level: a cache hit never
+    needs it, and it is a noticeable part of the tools' startup time.
+    """
+    import yaml
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def yaml_dumper():
+    """YAML dumper, using the libyaml bindings when they are available
+
+    The output is the same as yaml.dump's default Dumper, several times faster.
+    """
+    import yaml
+    return getattr(yaml, 'CDumper', yaml.Dumper)
+
+
+def parse_yaml(content):
+    """Parse YAML bytes within the safe_yaml ingestion limits"""
+    from r155_common import safe_yaml
+    return safe_yaml.load(content)
+
+
+def parse_json(content):
+    """Parse JSON bytes"""
+    return json.loads(content)
+
+
+def parse_csv(content):
+    """Parse CSV bytes with a header row into a list of dicts"""
+    import csv
+    import io
+    return list(csv.DictReader(io.StringIO(content.decode('utf-8'), newline='')))
+
+
+PARSERS = {
+    'yaml': parse_yaml,
+    'json': parse_json,
+    'csv': parse_csv,
+}
+
+EXTENSION_KINDS = {
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.json': 'json',
+    '.csv': 'csv',
+}
+
+
+def artifact_kind(path):
+    """Artifact kind for a file path, based on its extension"""
+    kind = EXTENSION_KINDS.get(os.path.splitext(path)[1].lower())
+    if kind is None:
+        raise ValueError(f"Unsupported artifact type: {path}")
+    return kind
+
+
+class ArtifactCache:
+    """Content-addressed cache of parsed artifacts"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        """Initialize the cache; the directory is created on first store"""
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        # Estimated on-disk size: measured on this process's first store, then kept as a running total
+        self._disk_bytes = None
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def key(self, kind, content):
+        """Cache key for artifact content of the given kind"""
+        sha = hashlib.sha256(f"{CACHE_FORMAT_VERSION}:{kind}:".encode('ascii'))
+        sha.update(content)
+        return sha.hexdigest()
+
+    def entry_path(self, key):
+        """On-disk location of a cache entry"""
+        return os.path.join(self.cache_dir, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Return (True, value) for a cached key, or (False, None)"""
+        if not self.enabled:
+            return False, None
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self._count("misses")
+            return False, None
+        except Exception as e:
+            # A truncated or stale entry is treated as a miss and replaced
+            logger.warning("Discarding unreadable cache entry %s: %s", path, str(e))
+            self._count("errors")
+            return False, None
+
+        # Touch the entry so LRU eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count("hits")
+        return True, value
+
+    def put(self, key, value):
+        """Store a parsed value under key"""
+        if not self.enabled:
+            return
+        import tempfile
+        path = self.entry_path(key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except Exception as e:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            logger.warning("Could not write cache entry %s: %s", path, str(e))
+            self._count("errors")
+            return
+
+        self._count("stores")
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self.usage()[1]
+            else:
+                self._disk_bytes += size
+            should_prune = self._disk_bytes > self.max_bytes
+        if should_prune:
+            # Prune below the limit, so the next few stores do not trigger another full scan
+            self.prune(self.max_bytes * 9 // 10)
+
+    def load(self, path, kind=None):
+        """Load an artifact, parsing it only if its content is not cached"""
+        kind = kind or artifact_kind(path)
+        if kind == 'yaml':
+            from r155_common import safe_yaml
+            safe_yaml.check_size(os.path.getsize(path), safe_yaml.default_limits().max_bytes)
+        with open(path, 'rb') as f:
+            content = f.read()
+        key = self.key(kind, content)
+
+        found, value = self.get(key)
+        if found:
+            return value
+        value = PARSERS[kind](content)
+        self.put(key, value)
+        return value
+
+    def store(self, path, value, kind=None):
+        """Record the parsed form of a file that was just written from value"""
+        kind = kind or artifact_kind(path)
+        with open(path, 'rb') as f:
+            self.put(self.key(kind, f.read()), value)
+
+    def entries(self):
+        """List (path, size, mtime) for every cache entry"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if not name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def prune(self, max_bytes=None):
+        """Evict least recently used entries until the cache fits in max_bytes; returns bytes freed"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total - freed <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            freed += size
+            self._count("evictions")
+        with self._lock:
+            self._disk_bytes = total - freed
+        return freed
+
+    def summary(self):
+        """One-line summary of this process's cache activity"""
+        stats = self.stats
+        return (f"{stats['hits']} hit(s), {stats['misses']} miss(es), {stats['stores']} store(s), "
+                f"{stats['evictions']} eviction(s), {stats['errors']} error(s)")
+
+    def usage(self):
+        """Return (entry_count, total_bytes) of the on-disk cache"""
+        entries = self.entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Process-wide cache configured from the environment"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ArtifactCache(
+            cache_dir=os.environ.get('R155_ARTIFACT_CACHE_DIR', DEFAULT_CACHE_DIR),
+            max_bytes=int(os.environ.get('R155_ARTIFACT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+            enabled=os.environ.get('R155_ARTIFACT_CACHE_DISABLE', '') not in ('1', 'true', 'yes'),
+        )
+    return _default_cache
+
+
+def load_artifact(path, kind=None):
+    """Load a YAML/JSON/CSV artifact through the default cache"""
+    return default_cache().load(path, kind)
+
+
+def store_artifact(path, value, kind=None):
+    """Seed the default cache with the parsed form of a freshly written artifact"""
+    default_cache().store(path, value, kind)
+
+
+def parse_size(text):
+    """Parse a size such as 512M or 2G into bytes"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Inspect and prune the R155 artifact cache')
+    parser.add_argument('--cache-dir', default=None, help='Cache directory (default: from environment)')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Show cache size and entry count')
+    prune_parser = subparsers.add_parser('prune', help='Evict least recently used entries')
+    prune_parser.add_argument('--max-size', default=None, help='Target size, e.g. 256M (default: configured limit)')
+    subparsers.add_parser('clear', help='Remove every cache entry')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    cache = default_cache()
+    if args.cache_dir:
+        cache.cache_dir = args.cache_dir
+
+    if args.command == 'stats':
+        count, total = cache.usage()
+        logger.info("Cache directory: %s", cache.cache_dir)
+        logger.info("Entries: %d", count)
+        logger.info("Size: %.1f MiB of %.1f MiB", total / 1024 / 1024, cache.max_bytes / 1024 / 1024)
+    elif args.command == 'prune':
+        max_bytes = parse_size(args.max_size) if args.max_size else cache.max_bytes
+        freed = cache.prune(max_bytes)
+        logger.info("Evicted %d entries (%.1f MiB)", cache.stats['evictions'], freed / 1024 / 1024)
+    elif args.command == 'clear':
+        freed = cache.prune(0)
+        logger.info("Removed %d entries (%.1f MiB)", cache.stats['evictions'], freed / 1024 / 1024)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Build Manifest for Incremental Builds
+
+Records, for every generated output, the content hashes of the templates and
+data inputs it was built from, so unchanged outputs can be skipped on the
+next run. Used by the documentation generator and the pipeline runner. File
+hashes are cached by (size, mtime) so unchanged inputs are not re-read
+either.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+MISSING = "missing"
+
+
+def hash_bytes(data):
+    """SHA-256 hex digest of a bytes object"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_value(value):
+    """SHA-256 hex digest of a JSON-serializable value"""
+    return hash_bytes(json.dumps(value, sort_keys=True, default=str).encode('utf-8'))
+
+
+class BuildManifest:
+    """Input hashes of previously built outputs"""
+
+    def __init__(self, path):
+        """Load the manifest at path, starting empty if it is missing or unreadable"""
+        self.path = path
+        self.outputs = {}
+        self.files = {}
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                self.outputs = manifest.get('outputs', {})
+                self.files = manifest.get('files', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Ignoring unreadable build manifest %s: %s", path, str(e))
+
+    def hash_file(self, path):
+        """Content hash of a file, reusing the cached hash if size and mtime are unchanged"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return MISSING
+
+        key = os.path.abspath(path)
+        cached = self.files.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        self.files[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def hash_files(self, paths):
+        """Combined hash of a set of files, independent of their order"""
+        return hash_value(sorted((os.path.abspath(p), self.hash_file(p)) for p in paths))
+
+    def check(self, output, inputs, output_files=None):
+        """Return the reasons output must be rebuilt; an empty list means it is up to date
+
+        output_files lists the files that must exist for output to count as
+        built (default: output itself).
+        """
+        previous = self.outputs.get(output)
+        if previous is None:
+            return ["no previous build recorded"]
+        for path in (output_files if output_files is not None else [output]):
+            if not os.path.exists(path):
+                return [f"output file {path} is missing"]
+
+        reasons = []
+        old_inputs = previous.get('inputs', {})
+        for name, digest in inputs.items():
+            if name not in old_inputs:
+                reasons.append(f"new input {name}")
+            elif old_inputs[name] != digest:
+                reasons.append(f"{name} changed")
+        for name in old_inputs:
+            if name not in inputs:
+                reasons.append(f"input {name} removed")
+        return reasons
+
+    def record(self, output, inputs):
+        """Record the inputs a successfully built output was generated from"""
+        self.outputs[output] = {'inputs': inputs}
+
+    def save(self):
+        """Write the manifest atomically next to its final location"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.manifest-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'outputs': self.outputs, 'files': self.files}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
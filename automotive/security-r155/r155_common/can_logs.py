@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+R155 CAN Log Analysis
+
+Parses candump (-l log format) and Vector ASC captures into NumPy structured
+arrays and summarises them as evidence for attack analysis (7.2.1.8). Files
+are memory-mapped and parsed a chunk at a time, so multi-GB captures are
+processed in a single pass with memory bounded by the chunk size and the
+number of distinct (bus, ID) pairs.
+
+Per (bus, ID) the summary reports frame count, frequency and inter-arrival
+jitter; given a list of known IDs (plain list or DBC file) it also reports
+traffic on unknown IDs.
+
+Usage:
+    python -m r155_common.can_logs capture.log [capture.asc ...] --known-ids vehicle.dbc
+
+Requires NumPy.
+"""
+
+import argparse
+import binascii
+import gc
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from r155_common import artifacts
+
+logger = logging.getLogger(__name__)
+
+# Bytes of log text parsed per chunk
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Part of the summary cache key; bumped when the summary's contents change
+SUMMARY_FORMAT_VERSION = 2
+
+# Payload bytes kept per frame; longer CAN FD payloads are truncated
+PAYLOAD_BYTES = 8
+
+FLAG_EXTENDED = 1
+FLAG_FD = 2
+FLAG_REMOTE = 4
+FLAG_ERROR = 8
+
+FRAME_DTYPE = np.dtype([
+    ("timestamp", "f8"),
+    ("bus", "u2"),
+    ("id", "u4"),
+    ("dlc", "u1"),
+    ("flags", "u1"),
+    ("payload", "u1", (PAYLOAD_BYTES,)),
+])
+
+CAN_ID_MASK = 0x1FFFFFFF
+CAN_ERR_FLAG = 0x20000000
+
+# (1436509052.249713) can0 123#DEADBEEF / 12345678#... / 123##1AABB (FD) / 123#R (remote)
+CANDUMP_PATTERN = re.compile(
+    rb'^[ \t]*\((\d+\.\d+)\)[ \t]+(\S+)[ \t]+([0-9A-Fa-f]{1,8})#(#[0-9A-Fa-f])?([0-9A-Fa-f]*|R\d*)[ \t]*\r?$',
+    re.MULTILINE,
+)
+
+# 0.004000 1  123x            Rx   d 8 00 11 22 33 44 55 66 77
+ASC_PATTERN = re.compile(
+    rb'^[ \t]*(\d+\.\d+)[ \t]+(\d+)[ \t]+([0-9A-Fa-f]+)(x?)[ \t]+(?:Rx|Tx)[ \t]+([dDrR])[ \t]+(\d+)((?:[ \t]+[0-9A-Fa-f]{2})*)',
+    re.MULTILINE,
+)
+ASC_ERROR_PATTERN = re.compile(rb'^[ \t]*(\d+\.\d+)[ \t]+(\d+)[ \t]+ErrorFrame', re.MULTILINE)
+ASC_BASE_PATTERN = re.compile(rb'^[ \t]*base[ \t]+(hex|dec)', re.MULTILINE | re.IGNORECASE)
+
+
+def detect_format(path):
+    """Return 'candump' or 'asc' based on the first few KB of a capture"""
+    with open(path, 'rb') as f:
+        head = f.read(8192)
+    if path.lower().endswith('.asc') or re.search(rb'^\s*(date|base|Begin Triggerblock)\b', head, re.MULTILINE):
+        return 'asc'
+    if CANDUMP_PATTERN.search(head):
+        return 'candump'
+    raise ValueError(f"Unrecognised CAN log format: {path}")
+
+
+def decode_payloads(data):
+    """Convert a list of hex payload strings into an (n, PAYLOAD_BYTES) uint8 array"""
+    width = PAYLOAD_BYTES * 2
+    joined = b''.join(d[:width].ljust(width, b'0') for d in data)
+    return np.frombuffer(binascii.unhexlify(joined), dtype=np.uint8).reshape(-1, PAYLOAD_BYTES)
+
+
+class CANLogReader:
+    """Chunked, memory-mapped reader for a single CAN capture"""
+
+    def __init__(self, path, log_format=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        self.path = path
+        self.format = log_format or detect_format(path)
+        self.chunk_bytes = chunk_bytes
+        self.buses = []
+        self._bus_index = {}
+        self._id_base = 16
+
+    def bus_index(self, name):
+        index = self._bus_index.get(name)
+        if index is None:
+            index = self._bus_index[name] = len(self.buses)
+            self.buses.append(name.decode('utf-8', 'replace') if isinstance(name, bytes) else name)
+        return index
+
+    def encode_buses(self, names):
+        """Dictionary-encode bus names into indexes into self.buses"""
+        unique, inverse = np.unique(np.array(names), return_inverse=True)
+        codes = np.array([self.bus_index(name) for name in unique.tolist()], dtype="u2")
+        return codes[inverse]
+
+    def decode_ids(self, ids, base):
+        """Parse an array of ID strings, converting each distinct string once"""
+        unique, inverse = np.unique(ids, return_inverse=True)
+        values = np.array([int(i, base) for i in unique.tolist()], dtype="u4")
+        return values[inverse]
+
+    def chunk_ranges(self):
+        """Yield (start, end) byte ranges of about chunk_bytes that end on line boundaries"""
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if self.format == 'asc':
+                base = ASC_BASE_PATTERN.search(mm[:8192])
+                self._id_base = 10 if base and base.group(1).lower() == b'dec' else 16
+            start = 0
+            while start < size:
+                end = min(start + self.chunk_bytes, size)
+                if end < size:
+                    newline = mm.find(b'\n', end)
+                    end = size if newline == -1 else newline + 1
+                yield start, end
+                start = end
+
+    def parse_range(self, start, end, payload=True):
+        """Parse one byte range of the capture into a FRAME_DTYPE array"""
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[start:end]
+        parse = self.parse_candump if self.format == 'candump' else self.parse_asc
+
+        # The match tuples hold no reference cycles, so collection passes over them are wasted time
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return parse(text, payload)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def chunks(self, payload=True, workers=1):
+        """Yield a FRAME_DTYPE array per chunk, in file order
+
+        payload=False skips payload decoding. With workers > 1 chunks are
+        parsed in worker processes and their bus indexes remapped here.
+        """
+        ranges = self.chunk_ranges()
+        if workers <= 1:
+            for start, end in ranges:
+                frames = self.parse_range(start, end, payload)
+                if len(frames):
+                    yield frames
+            return
+
+        # Consume the generator up front so the ID base is known before workers start
+        ranges = list(ranges)
+        jobs = [(self.path, self.format, self._id_base, start, end, payload) for start, end in ranges]
+        with multiprocessing.Pool(workers) as pool:
+            for frames, buses in pool.imap(_parse_range, jobs):
+                if len(frames):
+                    codes = np.array([self.bus_index(name) for name in buses], dtype="u2")
+                    frames["bus"] = codes[frames["bus"]]
+                    yield frames
+
+    def parse_candump(self, text, payload):
+        matches = CANDUMP_PATTERN.findall(text)
+        frames = np.zeros(len(matches), dtype=FRAME_DTYPE)
+        if not matches:
+            return frames
+        timestamps, buses, ids, fd_flags, data = zip(*matches)
+
+        frames["timestamp"] = np.array(timestamps).astype("f8")
+        frames["bus"] = self.encode_buses(buses)
+        ids = np.array(ids)
+        raw_ids = self.decode_ids(ids, 16)
+        id_lengths = np.char.str_len(ids)
+        data = np.array(data)
+        remote = np.char.startswith(data, b'R')
+        fd = np.array(fd_flags).astype(bool)
+        error = (id_lengths == 8) & (raw_ids & CAN_ERR_FLAG != 0)
+
+        frames["id"] = raw_ids & CAN_ID_MASK
+        frames["dlc"] = np.where(remote, 0, np.char.str_len(data) // 2)
+        frames["flags"] = (np.where((id_lengths > 3) & ~error, FLAG_EXTENDED, 0) | np.where(fd, FLAG_FD, 0)
+                           | np.where(remote, FLAG_REMOTE, 0) | np.where(error, FLAG_ERROR, 0))
+        if payload:
+            frames["payload"] = decode_payloads(np.where(remote, b'', data).tolist())
+        return frames
+
+    def parse_asc(self, text, payload):
+        matches = ASC_PATTERN.findall(text)
+        errors = ASC_ERROR_PATTERN.findall(text)
+        frames = np.zeros(len(matches) + len(errors), dtype=FRAME_DTYPE)
+        if matches:
+            timestamps, channels, ids, extended, kinds, dlcs, data = zip(*matches)
+            n = len(matches)
+            frames["timestamp"][:n] = np.array(timestamps).astype("f8")
+            frames["bus"][:n] = self.encode_buses(channels)
+            frames["id"][:n] = self.decode_ids(np.array(ids), self._id_base) & CAN_ID_MASK
+            frames["dlc"][:n] = np.array(dlcs).astype("u1")
+            remote = np.char.lower(np.array(kinds)) == b'r'
+            frames["flags"][:n] = np.where(np.array(extended) == b'x', FLAG_EXTENDED, 0) | np.where(remote, FLAG_REMOTE, 0)
+            if payload:
+                frames["payload"][:n] = decode_payloads([d.replace(b' ', b'').replace(b'\t', b'') for d in data])
+        if errors:
+            frames["timestamp"][len(matches):] = np.array([e[0] for e in errors]).astype("f8")
+            frames["bus"][len(matches):] = self.encode_buses([e[1] for e in errors])
+            frames["flags"][len(matches):] = FLAG_ERROR
+            # Error frames are interleaved in the log; keep the chunk in time order
+            frames = frames[np.argsort(frames["timestamp"], kind="stable")]
+        return frames
+
+
+def _parse_range(job):
+    path, log_format, id_base, start, end, payload = job
+    reader = CANLogReader(path, log_format)
+    reader._id_base = id_base
+    return reader.parse_range(start, end, payload), reader.buses
+
+
+class CANLogStatistics:
+    """Single-pass per-(bus, ID) frequency and inter-arrival statistics"""
+
+    def __init__(self):
+        self.slots = {}
+        self.frames = 0
+        self.error_frames = 0
+        self.flag_counts = {FLAG_EXTENDED: 0, FLAG_FD: 0, FLAG_REMOTE: 0}
+        self.start = None
+        self.end = None
+        # Per-slot accumulators, grown as new (bus, ID) pairs appear
+        self.count = np.zeros(0, dtype=np.int64)
+        self.first = np.zeros(0)
+        self.last = np.zeros(0)
+        self.gap_count = np.zeros(0, dtype=np.int64)
+        self.gap_sum = np.zeros(0)
+        self.gap_sq = np.zeros(0)
+        self.gap_min = np.zeros(0)
+        self.gap_max = np.zeros(0)
+
+    def _grow(self, n):
+        extra = n - len(self.count)
+        if extra <= 0:
+            return
+        self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+        self.first = np.concatenate([self.first, np.full(extra, np.nan)])
+        self.last = np.concatenate([self.last, np.full(extra, np.nan)])
+        self.gap_count = np.concatenate([self.gap_count, np.zeros(extra, dtype=np.int64)])
+        self.gap_sum = np.concatenate([self.gap_sum, np.zeros(extra)])
+        self.gap_sq = np.concatenate([self.gap_sq, np.zeros(extra)])
+        self.gap_min = np.concatenate([self.gap_min, np.full(extra, np.inf)])
+        self.gap_max = np.concatenate([self.gap_max, np.full(extra, -np.inf)])
+
+    def update(self, frames):
+        """Fold a time-ordered chunk of frames into the statistics"""
+        if not len(frames):
+            return
+        self.frames += len(frames)
+        errors = (frames["flags"] & FLAG_ERROR) != 0
+        self.error_frames += int(errors.sum())
+        for flag in self.flag_counts:
+            self.flag_counts[flag] += int(((frames["flags"] & flag) != 0).sum())
+        timestamps = frames["timestamp"]
+        self.start = float(timestamps.min()) if self.start is None else min(self.start, float(timestamps.min()))
+        self.end = float(timestamps.max()) if self.end is None else max(self.end, float(timestamps.max()))
+
+        frames = frames[~errors]
+        if not len(frames):
+            return
+        keys = (frames["bus"].astype(np.uint64) << np.uint64(32)) | frames["id"].astype(np.uint64)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+
+        # Map this chunk's keys onto global slots
+        slots = np.empty(len(unique_keys), dtype=np.int64)
+        for i, key in enumerate(unique_keys.tolist()):
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self.slots[key] = len(self.slots)
+            slots[i] = slot
+        self._grow(len(self.slots))
+
+        # Group frames by key; a stable sort keeps each group in time order
+        order = np.argsort(inverse, kind="stable")
+        grouped = inverse[order]
+        times = timestamps[~errors][order]
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        ends = np.r_[starts[1:], len(grouped)] - 1
+
+        same = grouped[1:] == grouped[:-1]
+        gaps = np.diff(times)[same]
+        gap_groups = grouped[1:][same]
+
+        # Gap between the last frame of the previous chunk and the first of this one
+        previous = self.last[slots]
+        seen = ~np.isnan(previous)
+        boundary = times[starts][seen] - previous[seen]
+        gaps = np.concatenate([gaps, boundary])
+        gap_groups = np.concatenate([gap_groups, np.flatnonzero(seen)])
+
+        n = len(unique_keys)
+        self.count[slots] += np.bincount(inverse, minlength=n)
+        self.first[slots] = np.where(seen, self.first[slots], times[starts])
+        self.last[slots] = times[ends]
+        self.gap_count[slots] += np.bincount(gap_groups, minlength=n)
+        self.gap_sum[slots] += np.bincount(gap_groups, weights=gaps, minlength=n)
+        self.gap_sq[slots] += np.bincount(gap_groups, weights=gaps * gaps, minlength=n)
+        chunk_min = np.full(n, np.inf)
+        chunk_max = np.full(n, -np.inf)
+        np.minimum.at(chunk_min, gap_groups, gaps)
+        np.maximum.at(chunk_max, gap_groups, gaps)
+        self.gap_min[slots] = np.minimum(self.gap_min[slots], chunk_min)
+        self.gap_max[slots] = np.maximum(self.gap_max[slots], chunk_max)
+
+    def summary(self, buses, known_ids=None, top=20):
+        """Compact summary of plain Python values (JSON- and safe-YAML-serialisable)"""
+        keys = np.array(sorted(self.slots, key=self.slots.get), dtype=np.uint64)
+        ids = (keys & np.uint64(CAN_ID_MASK)).astype(np.int64)
+        bus_of = (keys >> np.uint64(32)).astype(np.int64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.gap_sum / self.gap_count
+            jitter = np.sqrt(np.maximum(self.gap_sq / self.gap_count - mean * mean, 0.0))
+
+        def describe(slot):
+            entry = {
+                "bus": buses[bus_of[slot]],
+                "id": hex(int(ids[slot])),
+                "frames": int(self.count[slot]),
+            }
+            if self.gap_count[slot]:
+                entry.update({
+                    # float(): NumPy scalars would reach YAML reports as python/object tags
+                    "frequency_hz": round(float(1.0 / mean[slot]), 3) if mean[slot] > 0 else None,
+                    "mean_interval_ms": round(float(mean[slot] * 1000), 3),
+                    "jitter_ms": round(float(jitter[slot] * 1000), 3),
+                    "min_interval_ms": round(float(self.gap_min[slot] * 1000), 3),
+                    "max_interval_ms": round(float(self.gap_max[slot] * 1000), 3),
+                })
+            return entry
+
+        by_count = np.argsort(-self.count, kind="stable") if len(keys) else np.zeros(0, dtype=np.int64)
+        frames_per_bus = np.bincount(bus_of, weights=self.count, minlength=len(buses)) if len(keys) else []
+        summary = {
+            "frames": self.frames,
+            "start": self.start,
+            "end": self.end,
+            "duration_seconds": round(self.end - self.start, 6) if self.frames else 0.0,
+            "buses": {name: int(count) for name, count in zip(buses, frames_per_bus)},
+            "distinct_ids": len(keys),
+            "error_frames": self.error_frames,
+            "extended_frames": self.flag_counts[FLAG_EXTENDED],
+            "fd_frames": self.flag_counts[FLAG_FD],
+            "remote_frames": self.flag_counts[FLAG_REMOTE],
+            "top_ids": [describe(slot) for slot in by_count[:top].tolist()],
+        }
+
+        if known_ids is not None:
+            unknown = ~np.isin(ids, np.fromiter(known_ids, dtype=np.int64, count=len(known_ids)))
+            unknown_slots = [slot for slot in by_count.tolist() if unknown[slot]]
+            summary["unknown_ids"] = {
+                "distinct": len(unknown_slots),
+                "frames": int(self.count[unknown].sum()),
+                "top": [describe(slot) for slot in unknown_slots[:top]],
+            }
+        return summary
+
+
+def load_known_ids(path):
+    """Load known CAN IDs from a DBC file or a list of hex IDs (one per line, # comments)"""
+    known = set()
+    with open(path, 'r') as f:
+        if path.lower().endswith('.dbc'):
+            for match in re.finditer(r'^BO_\s+(\d+)\s', f.read(), re.MULTILINE):
+                known.add(int(match.group(1)) & CAN_ID_MASK)
+        else:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    known.add(int(line, 16))
+    return known
+
+
+def summarize_log(path, known_ids=None, top=20, chunk_bytes=DEFAULT_CHUNK_BYTES, workers=1):
+    """Parse a capture in a single pass and return its summary"""
+    start = time.perf_counter()
+    reader = CANLogReader(path, chunk_bytes=chunk_bytes)
+    stats = CANLogStatistics()
+    for frames in reader.chunks(payload=False, workers=workers):
+        stats.update(frames)
+    elapsed = time.perf_counter() - start
+
+    summary = {"file": path, "format": reader.format, "bytes": os.path.getsize(path)}
+    summary.update(stats.summary(reader.buses, known_ids, top))
+    summary["parse_seconds"] = round(elapsed, 3)
+    summary["frames_per_second"] = round(stats.frames / elapsed) if elapsed > 0 else None
+    return summary
+
+
+def cached_summary(path, known_ids=None, top=20, workers=1):
+    """summarize_log through the artifact cache, keyed on the capture's path, size and mtime
+
+    Hashing a multi-GB capture costs about as much as parsing it, so unlike
+    other artifacts the key is taken from the file's metadata.
+    """
+    cache = artifacts.default_cache()
+    stat = os.stat(path)
+    signature = json.dumps([SUMMARY_FORMAT_VERSION, os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+                            sorted(known_ids) if known_ids is not None else None, top])
+    key = cache.key('can-log-summary', signature.encode('utf-8'))
+    found, summary = cache.get(key)
+    if not found:
+        summary = summarize_log(path, known_ids, top, workers=workers)
+        cache.put(key, summary)
+    return summary
+
+
+def main():
+    """Summarise CAN captures"""
+    parser = argparse.ArgumentParser(description='Summarise candump/ASC CAN captures for attack analysis')
+    parser.add_argument('logs', nargs='+', help='Capture files (candump -l or Vector ASC)')
+    parser.add_argument('--known-ids', help='DBC file or list of known CAN IDs, to report unknown-ID traffic')
+    parser.add_argument('--top', type=int, default=20, help='Number of IDs listed per summary')
+    parser.add_argument('--chunk-size', default='64M', help='Bytes of log text parsed per chunk')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes parsing chunks (0 = CPU count)')
+    parser.add_argument('--output', help='Write the JSON summaries to this file instead of stdout')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    known_ids = load_known_ids(args.known_ids) if args.known_ids else None
+    summaries = []
+    for path in args.logs:
+        try:
+            summary = summarize_log(path, known_ids, args.top, artifacts.parse_size(args.chunk_size),
+                                    args.workers or os.cpu_count() or 1)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading {path}: {str(e)}")
+            sys.exit(1)
+        logger.info(f"{path}: {summary['frames']} frames, {summary['distinct_ids']} IDs "
+                    f"in {summary['parse_seconds']}s ({summary['frames_per_second']} frames/s)")
+        summaries.append(summary)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summaries, f, indent=2)
+    else:
+        print(json.dumps(summaries, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+R155 Compliance Rollups
+
+Keeps pre-aggregated assessment counts per vehicle type x requirement x
+status x day, so a dashboard can chart compliance over time by reading a few
+KB instead of re-parsing every report the checker ever wrote. The compliance
+checker adds each assessment as it finishes (compliance_rollup_store in its
+configuration); existing JSON/YAML reports can be backfilled with `build`.
+
+Store layout (one directory):
+    rollup.json                 dictionaries (vehicle types, requirements,
+                                statuses), shard list and latest assessment
+                                date per vehicle type; written last
+    YYYY-MM.npy                 int32 counts, shape (31, vehicle types,
+                                requirements, statuses), axis 0 = day - 1
+    YYYY-MM.assessments.json    assessments counted in the shard
+    latest.npy                  int8 status index (or -1) of the latest
+                                assessment, shape (vehicle types, requirements)
+
+A shard is only rewritten when an assessment falls in its month, so older
+shards may be smaller than the dictionaries; missing cells count zero.
+Files are replaced atomically, and readers open them memory-mapped: a reader
+keeps the version it mapped. Writers take an exclusive lock on the store.
+
+Usage:
+    python -m r155_common.compliance_rollup build compliance-validation/compliance-reports --store rollups
+    python -m r155_common.compliance_rollup query rollups --requirement 7.2.1 --since 2025-04-01
+    python -m r155_common.compliance_rollup latest rollups
+
+Requires NumPy.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from r155_common import artifacts
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes
+STORE_FORMAT_VERSION = 1
+METADATA_FILE = "rollup.json"
+LATEST_FILE = "latest.npy"
+LOCK_FILE = ".lock"
+
+# Statuses get their index in this order; others are appended as they appear
+STATUSES = ["compliant", "partially_compliant", "non_compliant", "not_applicable", "not_assessed"]
+
+DAYS_PER_SHARD = 31
+REPORT_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+
+def assessment_key(results):
+    """Identifies an assessment, so recording the same report twice counts it once"""
+    metadata = results.get("metadata", {})
+    return f"{metadata.get('vehicle_type', 'Unknown')}|{metadata.get('assessment_date', '')}"
+
+
+def requirement_statuses(results):
+    """(requirement id, status) for every requirement and sub-requirement of a report"""
+    for req_id, requirement in results.get("requirements", {}).items():
+        yield req_id, requirement.get("status", "not_assessed")
+        for sub_id, sub in requirement.get("sub_requirements", {}).items():
+            yield sub_id, sub.get("status", "not_assessed")
+
+
+def assessment_day(results):
+    """The assessment date of a report as a datetime.date"""
+    return datetime.date.fromisoformat(str(results["metadata"]["assessment_date"])[:10])
+
+
+def is_report(document):
+    return (isinstance(document, dict) and isinstance(document.get("metadata"), dict)
+            and "assessment_date" in document["metadata"] and isinstance(document.get("requirements"), dict))
+
+
+def read_metadata(store_dir):
+    with open(os.path.join(store_dir, METADATA_FILE), 'r') as f:
+        document = json.load(f)
+    if document.get("format_version") != STORE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported rollup store format in {store_dir}")
+    return document
+
+
+def _replace(store_dir, name, write):
+    """Write a store file through a temporary file and move it into place"""
+    fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        # mkstemp files are private; the dashboard reads the store as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(store_dir, name))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _resize(array, shape, fill=0):
+    """array zero-padded (or fill-padded) to shape"""
+    if array.shape == tuple(shape):
+        return np.array(array)
+    resized = np.full(shape, fill, dtype=array.dtype)
+    resized[tuple(slice(0, n) for n in array.shape)] = array
+    return resized
+
+
+@contextmanager
+def _locked(store_dir):
+    """Exclusive lock on the store (advisory, where fcntl is available)"""
+    with open(os.path.join(store_dir, LOCK_FILE), 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def record_assessments(store_dir, reports):
+    """Add checker results (the report dicts) to the rollups; returns how many were new
+
+    Each touched shard is rewritten once, however many reports fall in it.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    with _locked(store_dir):
+        try:
+            document = read_metadata(store_dir)
+        except FileNotFoundError:
+            document = {"format_version": STORE_FORMAT_VERSION, "vehicle_types": [], "requirements": [],
+                        "statuses": list(STATUSES), "shards": [], "latest": {}, "assessments": 0}
+        lookups = {name: {value: i for i, value in enumerate(document[name])}
+                   for name in ("vehicle_types", "requirements", "statuses")}
+
+        def code(name, value):
+            index = lookups[name].get(value)
+            if index is None:
+                index = lookups[name][value] = len(document[name])
+                document[name].append(value)
+            return index
+
+        # Encode every report into (shard, day, vehicle, [(requirement, status)]) first,
+        # so the dictionaries are final before any array is sized
+        by_shard = {}
+        latest = {}
+        for results in reports:
+            day = assessment_day(results)
+            vehicle_type = results["metadata"].get("vehicle_type", "Unknown")
+            cells = [(code("requirements", req_id), code("statuses", status))
+                     for req_id, status in requirement_statuses(results)]
+            vehicle = code("vehicle_types", vehicle_type)
+            by_shard.setdefault(f"{day:%Y-%m}", []).append((assessment_key(results), day.day - 1, vehicle, cells))
+            date = str(results["metadata"]["assessment_date"])
+            if date >= max(document["latest"].get(vehicle_type, ""), latest.get(vehicle, ("",))[0]):
+                latest[vehicle] = (date, cells)
+
+        shape = (DAYS_PER_SHARD, len(document["vehicle_types"]), len(document["requirements"]),
+                 len(document["statuses"]))
+        added = 0
+        for shard, entries in sorted(by_shard.items()):
+            try:
+                with open(os.path.join(store_dir, f"{shard}.assessments.json"), 'r') as f:
+                    recorded = set(json.load(f))
+            except FileNotFoundError:
+                recorded = set()
+            if shard in document["shards"]:
+                counts = _resize(np.load(os.path.join(store_dir, f"{shard}.npy")), shape)
+            else:
+                counts = np.zeros(shape, dtype=np.int32)
+            new = 0
+            for key, day, vehicle, cells in entries:
+                if key in recorded:
+                    continue
+                recorded.add(key)
+                new += 1
+                for requirement, status in cells:
+                    counts[day, vehicle, requirement, status] += 1
+            if not new:
+                continue
+            _replace(store_dir, f"{shard}.npy", lambda f: np.save(f, counts))
+            _replace(store_dir, f"{shard}.assessments.json",
+                     lambda f: f.write(json.dumps(sorted(recorded)).encode('utf-8')))
+            if shard not in document["shards"]:
+                document["shards"] = sorted(document["shards"] + [shard])
+            added += new
+
+        if latest:
+            try:
+                statuses = _resize(np.load(os.path.join(store_dir, LATEST_FILE)), shape[1:3], fill=-1)
+            except FileNotFoundError:
+                statuses = np.full(shape[1:3], -1, dtype=np.int8)
+            for vehicle, (date, cells) in latest.items():
+                statuses[vehicle] = -1
+                for requirement, status in cells:
+                    statuses[vehicle, requirement] = status
+                document["latest"][document["vehicle_types"][vehicle]] = date
+            _replace(store_dir, LATEST_FILE, lambda f: np.save(f, statuses))
+
+        # The metadata file is written last; it names the dictionaries and shards readers see
+        document["assessments"] += added
+        _replace(store_dir, METADATA_FILE, lambda f: f.write(json.dumps(document, indent=2).encode('utf-8')))
+    return added
+
+
+class ComplianceRollup:
+    """Read-only view of a rollup store; shards are memory-mapped on first use"""
+
+    def __init__(self, store_dir, document):
+        self.store_dir = store_dir
+        self.document = document
+        self.vehicle_types = document["vehicle_types"]
+        self.requirements = document["requirements"]
+        self.statuses = document["statuses"]
+        self._shards = {}
+
+    @classmethod
+    def open(cls, store_dir):
+        return cls(store_dir, read_metadata(store_dir))
+
+    def shard(self, name):
+        counts = self._shards.get(name)
+        if counts is None:
+            counts = self._shards[name] = np.load(os.path.join(self.store_dir, f"{name}.npy"), mmap_mode='r')
+        return counts
+
+    def _index(self, values, wanted, what):
+        if wanted is None:
+            return None
+        try:
+            return values.index(wanted)
+        except ValueError:
+            raise ValueError(f"Unknown {what}: {wanted}") from None
+
+    def counts(self, vehicle_type=None, requirement=None, since=None, until=None, status=None):
+        """Non-zero counts as dicts (date, vehicle_type, requirement, status, count), by date
+
+        since and until are ISO dates (inclusive); None selects everything.
+        """
+        vehicle = self._index(self.vehicle_types, vehicle_type, "vehicle type")
+        req = self._index(self.requirements, requirement, "requirement")
+        state = self._index(self.statuses, status, "status")
+        since = datetime.date.fromisoformat(since) if since else None
+        until = datetime.date.fromisoformat(until) if until else None
+
+        rows = []
+        for name in self.document["shards"]:
+            first = datetime.date.fromisoformat(f"{name}-01")
+            if (until and first > until) or (since and name < f"{since:%Y-%m}"):
+                continue
+            counts = self.shard(name)
+            # Narrow the memory-mapped array before touching it, so only the selected cells are read
+            selection = [slice(None)] * 4
+            for axis, index in ((1, vehicle), (2, req), (3, state)):
+                if index is not None:
+                    if index >= counts.shape[axis]:
+                        break
+                    selection[axis] = slice(index, index + 1)
+            else:
+                cells = np.asarray(counts[tuple(selection)])
+                for day, v, r, s in zip(*np.nonzero(cells)):
+                    date = first + datetime.timedelta(days=int(day))
+                    if (since and date < since) or (until and date > until):
+                        continue
+                    rows.append({
+                        "date": date.isoformat(),
+                        "vehicle_type": self.vehicle_types[int(v) + (vehicle or 0)],
+                        "requirement": self.requirements[int(r) + (req or 0)],
+                        "status": self.statuses[int(s) + (state or 0)],
+                        "count": int(cells[day, v, r, s]),
+                    })
+        return rows
+
+    def latest(self, vehicle_type=None):
+        """Status of every requirement in the latest assessment, per vehicle type"""
+        try:
+            statuses = np.load(os.path.join(self.store_dir, LATEST_FILE), mmap_mode='r')
+        except FileNotFoundError:
+            return {}
+        result = {}
+        for vehicle, name in enumerate(self.vehicle_types):
+            if (vehicle_type is not None and name != vehicle_type) or vehicle >= statuses.shape[0]:
+                continue
+            row = np.asarray(statuses[vehicle])
+            result[name] = {
+                "assessment_date": self.document["latest"].get(name),
+                "requirements": {self.requirements[r]: self.statuses[row[r]] for r in np.flatnonzero(row >= 0)},
+            }
+        return result
+
+
+def collect_reports(paths):
+    """Expand report files and directories into a sorted list of JSON/YAML files"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, filenames in os.walk(path):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                files.extend(os.path.join(root, name) for name in filenames
+                             if name.endswith(REPORT_EXTENSIONS) and not name.endswith('.evidence.json'))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Build and query pre-aggregated R155 compliance rollups')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Add existing JSON/YAML checker reports to a store')
+    build_parser.add_argument('reports', nargs='+', help='Report files or directories')
+    build_parser.add_argument('--store', required=True, help='Store directory')
+
+    query_parser = subparsers.add_parser('query', help='Print assessment counts per day and status')
+    query_parser.add_argument('store', help='Store directory')
+    query_parser.add_argument('--vehicle-type', help='Vehicle type')
+    query_parser.add_argument('--requirement', help='Requirement or sub-requirement ID')
+    query_parser.add_argument('--status', help='Status')
+    query_parser.add_argument('--since', help='First date (YYYY-MM-DD)')
+    query_parser.add_argument('--until', help='Last date (YYYY-MM-DD)')
+
+    latest_parser = subparsers.add_parser('latest', help='Print the latest status of every requirement')
+    latest_parser.add_argument('store', help='Store directory')
+    latest_parser.add_argument('--vehicle-type', help='Vehicle type')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    try:
+        if args.command == 'build':
+            start = time.perf_counter()
+            reports = []
+            for path in collect_reports(args.reports):
+                try:
+                    document = artifacts.load_artifact(path)
+                except Exception as e:
+                    logger.warning(f"Skipping {path}: {str(e)}")
+                    continue
+                if is_report(document):
+                    reports.append(document)
+            added = record_assessments(args.store, reports)
+            logger.info(f"Added {added} of {len(reports)} report(s) to {args.store} "
+                        f"in {time.perf_counter() - start:.2f}s")
+            return 0
+
+        rollup = ComplianceRollup.open(args.store)
+        start = time.perf_counter()
+        if args.command == 'query':
+            result = rollup.counts(args.vehicle_type, args.requirement, args.since, args.until, args.status)
+        else:
+            result = rollup.latest(args.vehicle_type)
+        elapsed = time.perf_counter() - start
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Error: {str(e)}")
+        return 1
+
+    print(json.dumps(result, indent=2))
+    logger.info(f"Query answered in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
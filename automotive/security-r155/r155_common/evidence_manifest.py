@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+R155 Evidence Integrity Manifest
+
+Records the SHA-256 of every evidence file behind a compliance report, so an
+auditor can later prove the evidence has not changed. Directories are expanded
+to the files they contain.
+
+Files are hashed on a thread pool (hashlib releases the GIL while hashing).
+Files larger than the chunk size are split into fixed-size chunks hashed in
+parallel; their digest is the SHA-256 of the concatenated chunk digests and
+is recorded with algorithm "sha256-chunked" and the chunk size, so it can be
+reproduced independently. Hashes from the previous manifest are reused for
+files whose size and mtime are unchanged.
+
+Paths are recorded as the checker saw them, so verification runs from the
+checker's working directory (which is why this file is run as a script
+rather than with -m). Bytecode caches and hidden files are not evidence and
+are left out when directories are expanded. If R155_MANIFEST_SIGNING_KEY is
+set, the manifest carries an HMAC-SHA256 of its canonical JSON form.
+
+Usage:
+    cd compliance-validation
+    python ../r155_common/evidence_manifest.py verify reports/r155_compliance_report.json.evidence.json
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = '.evidence.json'
+
+# Files larger than this are hashed as parallel chunks of this size
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Read size within a chunk
+READ_SIZE = 1024 * 1024
+
+SIGNING_KEY_ENV = 'R155_MANIFEST_SIGNING_KEY'
+
+
+def manifest_path(report_path):
+    """Location of the evidence manifest for a report"""
+    return report_path + MANIFEST_SUFFIX
+
+
+def collect_evidence(results):
+    """Sorted evidence paths referenced anywhere in a checker results dict"""
+    paths = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "evidence" and isinstance(value, list):
+                    paths.update(p for p in value if isinstance(p, str))
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(results)
+    return sorted(paths)
+
+
+def is_ignored(name):
+    """Files and directories below an evidence directory that are not evidence"""
+    return name.startswith('.') or name == '__pycache__' or name.endswith(('.pyc', '.pyo'))
+
+
+def expand_paths(paths):
+    """Expand directories into the files below them; missing paths are kept as-is
+
+    Bytecode caches, which any import rewrites, and hidden files are skipped.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(name for name in dirnames if not is_ignored(name))
+                files.extend(os.path.join(dirpath, name) for name in sorted(filenames) if not is_ignored(name))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+
+def hash_range(path, offset, length):
+    """SHA-256 digest (bytes) of length bytes of a file starting at offset"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(READ_SIZE, remaining))
+            if not block:
+                break
+            sha.update(block)
+            remaining -= len(block)
+    return sha.digest()
+
+
+def load_manifest(path):
+    """Load a previous manifest, returning an empty one if it is missing or unreadable"""
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Ignoring unreadable evidence manifest %s: %s", path, str(e))
+    return {'files': {}}
+
+
+def hash_evidence(paths, previous=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Hash every file in paths; returns ({path: entry}, stats)
+
+    previous is the 'files' mapping of an earlier manifest; its entries are
+    reused where size and mtime match.
+    """
+    previous = previous or {}
+    entries = {}
+    stats = {"files": 0, "reused": 0, "hashed": 0, "missing": 0, "bytes_hashed": 0}
+    pending = []
+
+    for path in paths:
+        stats["files"] += 1
+        try:
+            stat = os.stat(path)
+        except OSError:
+            entries[path] = {"status": "missing"}
+            stats["missing"] += 1
+            continue
+        old = previous.get(path)
+        if (old and old.get("size") == stat.st_size and old.get("mtime_ns") == stat.st_mtime_ns
+                and old.get("chunk_size", chunk_size) == chunk_size):
+            entries[path] = old
+            stats["reused"] += 1
+            continue
+        pending.append((path, stat))
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        # Submit every chunk of every file up front so large and small files share the pool
+        jobs = []
+        for path, stat in pending:
+            offsets = range(0, max(stat.st_size, 1), chunk_size)
+            futures = [executor.submit(hash_range, path, offset, chunk_size) for offset in offsets]
+            jobs.append((path, stat, futures))
+
+        for path, stat, futures in jobs:
+            try:
+                digests = [future.result() for future in futures]
+            except OSError as e:
+                logger.warning(f"Could not hash evidence file {path}: {str(e)}")
+                entries[path] = {"status": "unreadable"}
+                continue
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            if len(digests) == 1:
+                entry.update({"algorithm": "sha256", "digest": digests[0].hex()})
+            else:
+                entry.update({"algorithm": "sha256-chunked", "chunk_size": chunk_size,
+                              "digest": hashlib.sha256(b''.join(digests)).hexdigest()})
+            entries[path] = entry
+            stats["hashed"] += 1
+            stats["bytes_hashed"] += stat.st_size
+
+    return entries, stats
+
+
+def canonical(manifest):
+    """Canonical bytes of a manifest, excluding its signature"""
+    unsigned = {key: value for key, value in manifest.items() if key != 'signature'}
+    return json.dumps(unsigned, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def sign(manifest, key):
+    """HMAC-SHA256 signature of a manifest"""
+    return hmac.new(key.encode('utf-8'), canonical(manifest), hashlib.sha256).hexdigest()
+
+
+def write_manifest(report_path, evidence_paths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Hash the report and its evidence and write the manifest next to the report; returns its path"""
+    path = manifest_path(report_path)
+    previous = load_manifest(path)
+    start = time.perf_counter()
+
+    entries, stats = hash_evidence(expand_paths(evidence_paths), previous.get('files', {}), workers, chunk_size)
+    report_entry = hash_evidence([report_path], None, workers, chunk_size)[0][report_path]
+    elapsed = time.perf_counter() - start
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "report": {"path": report_path, **report_entry},
+        "files": entries,
+    }
+    key = os.environ.get(SIGNING_KEY_ENV)
+    if key:
+        manifest["signature"] = {"algorithm": "hmac-sha256", "value": sign(manifest, key)}
+
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.evidence-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    logger.info(f"Evidence manifest {path}: {len(entries)} files, {stats['reused']} reused, "
+                f"{stats['hashed']} hashed ({stats['bytes_hashed'] / 1024 / 1024:.1f} MiB) "
+                f"in {elapsed:.2f}s, {stats['missing']} missing")
+    return path
+
+
+def verify_manifest(path, workers=None):
+    """Re-hash everything in a manifest; returns a list of problems (empty if intact)"""
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    problems = []
+
+    signature = manifest.get("signature")
+    key = os.environ.get(SIGNING_KEY_ENV)
+    if signature and key:
+        if not hmac.compare_digest(signature.get("value", ""), sign(manifest, key)):
+            problems.append("manifest signature does not match")
+    elif signature:
+        logger.warning(f"Manifest is signed but {SIGNING_KEY_ENV} is not set; signature not checked")
+
+    expected = dict(manifest.get("files", {}))
+    report = dict(manifest.get("report", {}))
+    expected[report.pop("path", "")] = report
+
+    # Nothing is reused: every file is hashed again with the chunk size it was recorded with
+    for chunk_size in sorted({entry.get("chunk_size", DEFAULT_CHUNK_SIZE) for entry in expected.values()}):
+        group = [p for p, entry in expected.items() if entry.get("chunk_size", DEFAULT_CHUNK_SIZE) == chunk_size]
+        actual, _ = hash_evidence(group, None, workers, chunk_size)
+        for file_path in group:
+            if expected[file_path].get("digest") != actual[file_path].get("digest"):
+                problems.append(f"{file_path} changed or is missing")
+    return problems
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Verify an R155 evidence integrity manifest')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    verify_parser = subparsers.add_parser('verify', help='Re-hash the report and evidence in a manifest')
+    verify_parser.add_argument('manifest', help='Evidence manifest file')
+    verify_parser.add_argument('--workers', type=int, default=None, help='Hashing threads (default: CPU count)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    problems = verify_manifest(args.manifest, args.workers)
+    for problem in problems:
+        logger.error(problem)
+    if not problems:
+        logger.info("Evidence is unchanged")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    # Run as a script, as the checker is: the r155_common package is one level up
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    sys.exit(main())
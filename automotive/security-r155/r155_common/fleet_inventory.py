@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+R155 Fleet Software Inventory
+
+Loads fleet inventory exports (one row per VIN x ECU x software version) into
+a columnar form: every string column is dictionary-encoded into an int32 code
+array plus a list of distinct values, so queries such as "which VINs run a
+vulnerable version" or "what fraction of targeted vehicles confirmed an
+update" are a few vectorized NumPy operations over millions of rows.
+
+An inventory can be saved as a directory of .npy code and value arrays and
+reopened memory-mapped, so repeated checks skip the CSV parse entirely.
+
+Export format (CSV with header):
+    vin,ecu,software_version[,campaign,update_status]
+
+Usage:
+    python -m r155_common.fleet_inventory build fleet_export.csv --store fleet_inventory
+    python -m r155_common.fleet_inventory vulnerable fleet_inventory --ecu TCU --versions 1.2.0 1.2.1
+    python -m r155_common.fleet_inventory confirmation fleet_inventory --ecu TCU --target-version 1.3.0
+
+Requires NumPy.
+"""
+
+import argparse
+import csv
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ["vin", "ecu", "software_version"]
+OPTIONAL_COLUMNS = ["campaign", "update_status"]
+
+# Bump when the on-disk layout changes
+STORE_FORMAT_VERSION = 1
+METADATA_FILE = "inventory.json"
+
+# Rows read from a CSV export per encoding pass
+CSV_CHUNK_ROWS = 500_000
+
+CONFIRMED_STATUSES = ("confirmed", "installed", "success", "succeeded")
+
+
+class FleetInventory:
+    """Dictionary-encoded, columnar fleet software inventory
+
+    Each column is an int32 code array plus a sorted array of its distinct
+    UTF-8 values, so codes order like the strings they stand for and values
+    are encoded with a binary search rather than a hash table.
+    """
+
+    def __init__(self, codes, values, source=None):
+        """codes maps column name to an int32 array; values maps it to a sorted bytes array"""
+        self.codes = codes
+        self.values = values
+        self.source = source or {}
+
+    def __len__(self):
+        return len(self.codes["vin"])
+
+    @property
+    def columns(self):
+        return list(self.codes)
+
+    def encode(self, column, values):
+        """Codes for the given strings; strings absent from the inventory are dropped"""
+        dictionary = self.values[column]
+        wanted = np.char.encode(np.array(list(values), dtype=str), 'utf-8')
+        if not len(wanted) or not len(dictionary):
+            return np.zeros(0, dtype=np.int32)
+        positions = np.minimum(np.searchsorted(dictionary, wanted), len(dictionary) - 1)
+        return positions[dictionary[positions] == wanted].astype(np.int32)
+
+    def decode(self, column, codes):
+        """Strings for an array of codes"""
+        return [value.decode('utf-8') for value in self.values[column][np.asarray(codes)].tolist()]
+
+    def member_mask(self, column, codes):
+        """Rows whose value in column is one of codes
+
+        A gather from a per-value lookup table; cheaper than np.isin when the
+        column has few distinct values compared to its length.
+        """
+        table = np.zeros(len(self.values[column]), dtype=bool)
+        table[codes] = True
+        return table[self.codes[column]]
+
+    def vin_flags(self, mask):
+        """Boolean array over VIN codes, True for VINs with at least one row selected by mask"""
+        flags = np.zeros(len(self.values["vin"]), dtype=bool)
+        flags[self.codes["vin"][mask]] = True
+        return flags
+
+    @classmethod
+    def from_csv(cls, path, chunk_rows=CSV_CHUNK_ROWS):
+        """Load a CSV export, encoding it a chunk at a time"""
+        # Row lists and tuples hold no reference cycles, so collection passes over them are wasted time
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return cls._from_csv(path, chunk_rows)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    @classmethod
+    def _from_csv(cls, path, chunk_rows):
+        with open(path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            header = [name.strip().lower() for name in next(reader, [])]
+            missing = [name for name in REQUIRED_COLUMNS if name not in header]
+            if missing:
+                raise ValueError(f"Inventory export {path} is missing column(s): {', '.join(missing)}")
+            columns = REQUIRED_COLUMNS + [name for name in OPTIONAL_COLUMNS if name in header]
+            positions = [header.index(name) for name in columns]
+            width = len(header)
+
+            lookups = {name: {} for name in columns}
+            chunks = {name: [] for name in columns}
+            while True:
+                rows = [row for _, row in zip(range(chunk_rows), reader)]
+                if not rows:
+                    break
+                # Short rows are padded so the chunk transposes into complete columns
+                transposed = list(zip(*(row if len(row) >= width else row + [""] * (width - len(row))
+                                        for row in rows)))
+                for name, position in zip(columns, positions):
+                    chunks[name].append(encode_strings(np.array(transposed[position]), lookups[name]))
+
+        codes = {}
+        values = {}
+        for name in columns:
+            codes[name], values[name] = sort_dictionary(
+                np.concatenate(chunks[name]) if chunks[name] else np.zeros(0, dtype=np.int32), lookups[name])
+        stat = os.stat(path)
+        source = {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return cls(codes, values, source)
+
+    def save(self, store_dir):
+        """Write the inventory as .npy code and value arrays per column plus a metadata file"""
+        os.makedirs(store_dir, exist_ok=True)
+        for name in self.codes:
+            np.save(os.path.join(store_dir, f"{name}.npy"), np.ascontiguousarray(self.codes[name], dtype=np.int32))
+            np.save(os.path.join(store_dir, f"{name}.values.npy"), np.asarray(self.values[name]))
+
+        # The metadata file is written last and atomically; it marks the store as complete
+        document = {
+            "format_version": STORE_FORMAT_VERSION,
+            "rows": len(self),
+            "source": self.source,
+            "columns": list(self.codes),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(document, f, indent=2)
+            os.replace(tmp_path, os.path.join(store_dir, METADATA_FILE))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def open(cls, store_dir):
+        """Open a saved inventory with its code and value arrays memory-mapped"""
+        with open(os.path.join(store_dir, METADATA_FILE), 'r') as f:
+            document = json.load(f)
+        if document.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported inventory store format in {store_dir}")
+        codes = {}
+        values = {}
+        for name in document["columns"]:
+            codes[name] = np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode='r')
+            values[name] = np.load(os.path.join(store_dir, f"{name}.values.npy"), mmap_mode='r')
+        return cls(codes, values, document.get("source"))
+
+    def version_mask(self, ecu, versions):
+        """Rows where the ECU reports one of the given versions"""
+        ecu_codes = self.encode("ecu", [ecu])
+        version_codes = self.encode("software_version", versions)
+        if not len(ecu_codes) or not len(version_codes):
+            return np.zeros(len(self), dtype=bool)
+        return (self.codes["ecu"] == ecu_codes[0]) & self.member_mask("software_version", version_codes)
+
+    def vins_with_versions(self, ecu, versions):
+        """Distinct VINs whose ECU reports one of the given software versions"""
+        return self.decode("vin", np.flatnonzero(self.vin_flags(self.version_mask(ecu, versions))))
+
+    def count_vins_with_versions(self, ecu, versions):
+        """Number of distinct VINs whose ECU reports one of the given software versions"""
+        return int(self.vin_flags(self.version_mask(ecu, versions)).sum())
+
+    def version_adoption(self, ecu, target_version, vins=None):
+        """How many vehicles with the ECU (optionally restricted to vins) report the target version"""
+        ecu_codes = self.encode("ecu", [ecu])
+        if not len(ecu_codes):
+            return adoption(0, 0)
+        mask = self.codes["ecu"] == ecu_codes[0]
+        if vins is not None:
+            mask &= self.member_mask("vin", self.encode("vin", vins))
+        targeted = self.vin_flags(mask)
+        confirmed = self.vin_flags(mask & self.version_mask(ecu, [target_version]))
+        return adoption(targeted.sum(), confirmed.sum())
+
+    def campaign_confirmation(self, campaign):
+        """How many vehicles targeted by a campaign report a confirmed update status"""
+        if "campaign" not in self.codes or "update_status" not in self.codes:
+            return None
+        campaign_codes = self.encode("campaign", [campaign])
+        if not len(campaign_codes):
+            return adoption(0, 0)
+        mask = self.codes["campaign"] == campaign_codes[0]
+        statuses = [s for s in self.decode("update_status", np.arange(len(self.values["update_status"])))
+                    if s.lower() in CONFIRMED_STATUSES]
+        confirmed_mask = mask & self.member_mask("update_status", self.encode("update_status", statuses))
+        return adoption(self.vin_flags(mask).sum(), self.vin_flags(confirmed_mask).sum())
+
+    def describe(self):
+        """Row count and distinct values per column"""
+        return {"rows": len(self), **{f"distinct_{name}": len(values) for name, values in self.values.items()}}
+
+
+def encode_strings(strings, lookup):
+    """Encode a string array against a growing value -> code mapping
+
+    Values are stripped once per distinct string, not once per row.
+    """
+    unique, inverse = np.unique(strings, return_inverse=True)
+    codes = np.empty(len(unique), dtype=np.int32)
+    for i, value in enumerate(unique.tolist()):
+        value = value.strip()
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(lookup)
+        codes[i] = code
+    return codes[inverse.reshape(-1)]
+
+
+def sort_dictionary(codes, lookup):
+    """Renumber codes so they follow the sorted order of their UTF-8 values; returns (codes, values)"""
+    values = np.char.encode(np.array(list(lookup), dtype=str), 'utf-8') if lookup else np.zeros(0, dtype='S1')
+    order = np.argsort(values, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return rank[codes], values[order]
+
+
+def adoption(targeted, confirmed):
+    return {
+        "targeted": int(targeted),
+        "confirmed": int(confirmed),
+        "fraction": round(int(confirmed) / int(targeted), 6) if targeted else None,
+    }
+
+
+def store_is_current(store_dir, export_path):
+    """True if store_dir holds an inventory built from the export's current content"""
+    try:
+        with open(os.path.join(store_dir, METADATA_FILE), 'r') as f:
+            document = json.load(f)
+        stat = os.stat(export_path)
+    except (OSError, ValueError):
+        return False
+    source = document.get("source", {})
+    return (document.get("format_version") == STORE_FORMAT_VERSION
+            and source.get("size") == stat.st_size and source.get("mtime_ns") == stat.st_mtime_ns)
+
+
+def load_inventory(path, store_dir=None):
+    """Load an inventory from a CSV export or a saved store
+
+    With store_dir, the export is encoded once and saved there, and later
+    calls open the store memory-mapped until the export changes.
+    """
+    if os.path.isdir(path):
+        return FleetInventory.open(path)
+    if store_dir and store_is_current(store_dir, path):
+        return FleetInventory.open(store_dir)
+
+    start = time.perf_counter()
+    inventory = FleetInventory.from_csv(path)
+    logger.info(f"Encoded {len(inventory)} inventory rows from {path} in {time.perf_counter() - start:.2f}s")
+    if store_dir:
+        try:
+            inventory.save(store_dir)
+        except OSError as e:
+            logger.warning(f"Could not save inventory store {store_dir}: {str(e)}")
+    return inventory
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Build and query the columnar fleet software inventory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Encode a CSV export into a memory-mappable store')
+    build_parser.add_argument('export', help='Inventory CSV export')
+    build_parser.add_argument('--store', required=True, help='Store directory')
+
+    vulnerable_parser = subparsers.add_parser('vulnerable', help='List VINs running given ECU software versions')
+    vulnerable_parser.add_argument('inventory', help='Inventory CSV export or store directory')
+    vulnerable_parser.add_argument('--ecu', required=True, help='ECU name')
+    vulnerable_parser.add_argument('--versions', nargs='+', required=True, help='Vulnerable software versions')
+    vulnerable_parser.add_argument('--count', action='store_true', help='Only print the number of VINs')
+
+    confirmation_parser = subparsers.add_parser('confirmation', help='Report the confirmed fraction of an update')
+    confirmation_parser.add_argument('inventory', help='Inventory CSV export or store directory')
+    confirmation_parser.add_argument('--ecu', help='ECU name (with --target-version)')
+    confirmation_parser.add_argument('--target-version', help='Software version the update installs')
+    confirmation_parser.add_argument('--campaign', help='Campaign ID (uses the update_status column)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    try:
+        if args.command == 'build':
+            inventory = FleetInventory.from_csv(args.export)
+            inventory.save(args.store)
+            logger.info(json.dumps(inventory.describe()))
+            return 0
+
+        inventory = load_inventory(args.inventory)
+        start = time.perf_counter()
+        if args.command == 'vulnerable':
+            if args.count:
+                result = inventory.count_vins_with_versions(args.ecu, args.versions)
+            else:
+                result = inventory.vins_with_versions(args.ecu, args.versions)
+        elif args.campaign:
+            result = inventory.campaign_confirmation(args.campaign)
+            if result is None:
+                logger.error("Inventory has no campaign/update_status columns")
+                return 1
+        elif args.ecu and args.target_version:
+            result = inventory.version_adoption(args.ecu, args.target_version)
+        else:
+            parser.error("confirmation needs --campaign or both --ecu and --target-version")
+        elapsed = time.perf_counter() - start
+    except (OSError, ValueError) as e:
+        logger.error(f"Error: {str(e)}")
+        return 1
+
+    print(json.dumps(result, indent=2))
+    logger.info(f"Query answered in {elapsed * 1000:.1f} ms over {len(inventory)} rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Bounded YAML Ingestion
+
+Loads YAML from files that may come from outside the team (supplier
+component lists, shared threat libraries, fleet exports) within limits on
+document size, nesting depth, node count and alias expansion. A few hundred
+bytes of nested anchors and aliases ("billion laughs") otherwise expand into
+billions of nodes for every consumer that walks the document, and a deeply
+nested document exhausts the recursion limit of the constructor.
+
+Nodes are composed from the libyaml parser's events (falling back to the
+pure-Python parser), with every node and alias counted as it is composed, so
+a document is rejected before it is constructed. Composing in Python costs no
+more than the libyaml composer: construction dominates either way.
+
+iter_items() streams the items of a large list document (the threats: of a
+threat library, a top-level list of requirements) one at a time, so peak
+memory is proportional to one item rather than to the file.
+
+Limits come from the environment:
+    R155_YAML_MAX_BYTES         largest document load() accepts (default 64 MiB)
+    R155_YAML_MAX_STREAM_BYTES  largest file iter_items() accepts (default 4 GiB)
+    R155_YAML_MAX_DEPTH         deepest nesting of collections (default 64)
+    R155_YAML_MAX_NODES         nodes per document, or per item when streaming (default 5,000,000)
+    R155_YAML_MAX_EXPANDED      nodes with every alias expanded, per document or item (default 20,000,000)
+
+Usage:
+    python -m r155_common.safe_yaml threat-models/threat_library.yaml
+    python -m r155_common.safe_yaml threat_library.yaml --items threats
+"""
+
+import argparse
+import logging
+import os
+import sys
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+Limits = namedtuple('Limits', 'max_bytes max_stream_bytes max_depth max_nodes max_expanded')
+
+DEFAULT_LIMITS = Limits(
+    max_bytes=64 * 1024 * 1024,
+    max_stream_bytes=4 * 1024 * 1024 * 1024,
+    max_depth=64,
+    max_nodes=5_000_000,
+    max_expanded=20_000_000,
+)
+
+_ENVIRONMENT = {
+    'max_bytes': 'R155_YAML_MAX_BYTES',
+    'max_stream_bytes': 'R155_YAML_MAX_STREAM_BYTES',
+    'max_depth': 'R155_YAML_MAX_DEPTH',
+    'max_nodes': 'R155_YAML_MAX_NODES',
+    'max_expanded': 'R155_YAML_MAX_EXPANDED',
+}
+
+_limits = None
+_loader = None
+
+
+class YAMLLimitError(ValueError):
+    """A YAML input exceeds one of the ingestion limits"""
+
+    def __init__(self, message, line=0, column=0):
+        super().__init__(f"{message} (line {line}, column {column})" if line else message)
+        self.problem = message
+        self.line = line
+        self.column = column
+
+
+def default_limits():
+    """Process-wide limits configured from the environment"""
+    global _limits
+    if _limits is None:
+        _limits = DEFAULT_LIMITS._replace(**{
+            field: int(os.environ[name]) for field, name in _ENVIRONMENT.items() if os.environ.get(name)
+        })
+    return _limits
+
+
+def check_size(size, limit, what='document'):
+    if size > limit:
+        raise YAMLLimitError(f"YAML {what} is {size} bytes; the limit is {limit} bytes")
+
+
+def loader_class():
+    """Safe loader class counting nodes, depth and alias expansion as it composes
+
+    yaml is imported here rather than at module level, as in
+    artifacts.yaml_loader().
+    """
+    global _loader
+    if _loader is not None:
+        return _loader
+
+    import yaml
+    from yaml.composer import Composer
+    from yaml.constructor import SafeConstructor
+    from yaml.resolver import Resolver
+
+    try:
+        from yaml._yaml import CParser
+
+        def init_parser(loader, stream):
+            CParser.__init__(loader, stream)
+
+        parsers = (CParser,)
+    except ImportError:
+        from yaml.parser import Parser
+        from yaml.reader import Reader
+        from yaml.scanner import Scanner
+
+        def init_parser(loader, stream):
+            Reader.__init__(loader, stream)
+            Scanner.__init__(loader)
+            Parser.__init__(loader)
+
+        parsers = (Reader, Scanner, Parser)
+
+    class LimitedComposer(Composer):
+        """Composer rejecting documents beyond the limits before they are constructed
+
+        expanded counts the nodes of the document as if every alias were
+        replaced by a copy of its anchor; alias_sizes holds that count for
+        each anchored node.
+        """
+
+        def reset_counts(self):
+            self.depth = 0
+            self.nodes = 0
+            self.expanded = 0
+
+        def limit_error(self, message):
+            mark = self.peek_event().start_mark
+            return YAMLLimitError(message, mark.line + 1, mark.column + 1)
+
+        def compose_document(self):
+            self.reset_counts()
+            self.alias_sizes = {}
+            return super().compose_document()
+
+        def compose_node(self, parent, index):
+            limits = self.limits
+            event = self.peek_event()
+            if isinstance(event, yaml.AliasEvent):
+                self.expanded += self.alias_sizes.get(event.anchor, 1)
+                if self.expanded > limits.max_expanded:
+                    raise self.limit_error(f"aliases expand the document to more than {limits.max_expanded} nodes")
+                return super().compose_node(parent, index)
+
+            self.nodes += 1
+            if self.nodes > limits.max_nodes:
+                raise self.limit_error(f"more than {limits.max_nodes} nodes")
+            if isinstance(event, yaml.ScalarEvent):
+                self.expanded += 1
+                node = super().compose_node(parent, index)
+                if event.anchor is not None:
+                    self.alias_sizes[event.anchor] = 1
+                return node
+
+            self.depth += 1
+            if self.depth > limits.max_depth:
+                raise self.limit_error(f"nesting deeper than {limits.max_depth} levels")
+            start = self.expanded
+            self.expanded += 1
+            node = super().compose_node(parent, index)
+            self.depth -= 1
+            if event.anchor is not None:
+                self.alias_sizes[event.anchor] = self.expanded - start
+            return node
+
+    class LimitedLoader(LimitedComposer, SafeConstructor, Resolver, *parsers):
+        def __init__(self, stream, limits=None):
+            init_parser(self, stream)
+            SafeConstructor.__init__(self)
+            Resolver.__init__(self)
+            Composer.__init__(self)
+            self.limits = limits or default_limits()
+            self.alias_sizes = {}
+            self.reset_counts()
+
+    _loader = LimitedLoader
+    return _loader
+
+
+def load(content, limits=None):
+    """Parse one YAML document (bytes or str) within the limits"""
+    limits = limits or default_limits()
+    check_size(len(content), limits.max_bytes)
+    loader = loader_class()(content, limits)
+    try:
+        return loader.get_single_data()
+    finally:
+        loader.dispose()
+
+
+def load_file(path, limits=None):
+    """Parse a YAML file within the limits; its size is checked before it is read"""
+    limits = limits or default_limits()
+    check_size(os.path.getsize(path), limits.max_bytes)
+    with open(path, 'rb') as f:
+        return load(f.read(), limits)
+
+
+def iter_items(path, key=None, limits=None):
+    """Yield the items of a list document one at a time
+
+    With key, the list is the value of that key in a top-level mapping
+    (other keys are parsed and discarded); without, the document itself is
+    a list. The node and depth limits apply to each item.
+    """
+    import yaml
+
+    limits = limits or default_limits()
+    check_size(os.path.getsize(path), limits.max_stream_bytes, 'file')
+    with open(path, 'rb') as f:
+        loader = loader_class()(f, limits)
+        try:
+            loader.get_event()  # StreamStartEvent
+            if loader.check_event(yaml.StreamEndEvent):
+                return
+            loader.get_event()  # DocumentStartEvent
+            if key is None:
+                yield from _iter_sequence(loader, yaml, path)
+            else:
+                if not loader.check_event(yaml.MappingStartEvent):
+                    raise ValueError(f"{path}: expected a mapping with a '{key}' list")
+                loader.get_event()
+                while not loader.check_event(yaml.MappingEndEvent):
+                    loader.reset_counts()
+                    key_node = loader.compose_node(None, None)
+                    if getattr(key_node, 'value', None) == key:
+                        yield from _iter_sequence(loader, yaml, path)
+                    else:
+                        loader.reset_counts()
+                        loader.compose_node(None, None)
+        finally:
+            loader.dispose()
+
+
+def _iter_sequence(loader, yaml, path):
+    if loader.check_event(yaml.ScalarEvent) and loader.peek_event().value in ('', '~', 'null'):
+        loader.get_event()
+        return
+    if not loader.check_event(yaml.SequenceStartEvent):
+        raise ValueError(f"{path}: expected a list")
+    loader.get_event()
+    while not loader.check_event(yaml.SequenceEndEvent):
+        loader.reset_counts()
+        node = loader.compose_node(None, None)
+        yield loader.construct_document(node)
+    loader.get_event()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check YAML files against the ingestion limits')
+    parser.add_argument('files', nargs='+', help='YAML files to check')
+    parser.add_argument('--items', metavar='KEY', default=None,
+                        help="Stream the items of this top-level list key ('-' for a top-level list)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    failed = 0
+    for path in args.files:
+        try:
+            if args.items:
+                count = sum(1 for _ in iter_items(path, None if args.items == '-' else args.items))
+                logger.info(f"{path}: {count} items")
+            else:
+                load_file(path)
+                logger.info(f"{path}: OK")
+        except (YAMLLimitError, ValueError) as e:
+            logger.error(f"{path}: {e}")
+            failed += 1
+        except Exception as e:
+            logger.error(f"{path}: could not be parsed: {e}")
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
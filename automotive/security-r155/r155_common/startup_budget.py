@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+R155 CLI Startup Budget
+
+Checks that the command-line entry points start quickly. Each entry point is
+run with `python -X importtime <script> --help`; modules the interpreter
+imports on its own (measured with `python -X importtime -c pass`) are
+subtracted, and the cumulative import time of what remains is compared with
+the entry point's budget. Modules that only some code paths need (HTTP,
+templating, asyncio, YAML, NumPy) must not be imported on the --help path at
+all.
+
+Exits non-zero if any entry point is over budget or imports a forbidden module,
+so it can run in CI and pre-commit hooks.
+
+Usage:
+    python -m r155_common.startup_budget
+    python -m r155_common.startup_budget --runs 5 --budget-ms 80
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Entry point -> import time budget in milliseconds (excluding interpreter startup)
+ENTRY_POINTS = {
+    'compliance-validation/r155_compliance_checker.py': 60,
+    'documentation/generate_r155_documentation.py': 60,
+    'threat-models/generate_threat_model.py': 60,
+}
+
+# Top-level packages that must stay off the --help path
+FORBIDDEN_MODULES = ('requests', 'jinja2', 'asyncio', 'yaml', 'numpy')
+
+
+def import_times(args):
+    """Run python -X importtime with args; returns {module: (self_us, cumulative_us, depth)}"""
+    process = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    modules = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def measure(script, baseline):
+    """Import time (ms) of a script's --help path beyond the baseline, and the modules it imported"""
+    modules = {name: times for name, times in import_times([script, '--help']).items()
+               if name not in baseline}
+    # Top-level imports already include their dependencies in the cumulative time
+    top_level = min((depth for _, _, depth in modules.values()), default=0)
+    elapsed_us = sum(cumulative for _, cumulative, depth in modules.values() if depth == top_level)
+    return elapsed_us / 1000, set(modules)
+
+
+def check(runs=3, budget_ms=None):
+    """Measure every entry point; returns a list of problems (empty if within budget)"""
+    baseline = set(import_times(['-c', 'pass']))
+    problems = []
+    for script, budget in ENTRY_POINTS.items():
+        budget = budget_ms or budget
+        # Best of several runs, so a busy machine does not cause spurious failures
+        samples = [measure(script, baseline) for _ in range(runs)]
+        elapsed = min(ms for ms, _ in samples)
+        imported = set().union(*(modules for _, modules in samples))
+        forbidden = sorted({name.split('.')[0] for name in imported} & set(FORBIDDEN_MODULES))
+
+        logger.info(f"{script}: {elapsed:.1f} ms (budget {budget} ms), {len(imported)} modules")
+        if elapsed > budget:
+            problems.append(f"{script} takes {elapsed:.1f} ms to import, budget is {budget} ms")
+        if forbidden:
+            problems.append(f"{script} imports {', '.join(forbidden)} on startup")
+    return problems
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Check the startup time of the R155 command-line tools')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per entry point; the fastest is used')
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='Budget for every entry point, overriding the per-script budgets')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    problems = check(args.runs, args.budget_ms)
+    for problem in problems:
+        logger.error(problem)
+    if not problems:
+        logger.info("All entry points are within their startup budget")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+R155 Threat Model Index
+
+Answers analyst questions over one or many threat models ("which threats
+affect TCU", "which controls mitigate T-812", "which attack vectors reach a
+safety-critical component") without scanning the models. Threats, security
+controls and attack vectors are ingested into inverted indexes that map each
+(field, value) pair - component, threat type, attack vector, control, risk
+level and so on - to the positions of the records carrying it. Positions are
+assigned in ingestion order, so every posting list is sorted; on the first
+query the lists are frozen into NumPy arrays and a query with several
+criteria intersects them with a vectorized binary search, starting from the
+shortest list. Selective queries take well under a millisecond over millions
+of threats; building the result dicts costs about a microsecond per result.
+
+A threat's components are its own affected_components plus the components
+reached by its attack vectors, so hand-written TARAs that only list attack
+vectors per threat are indexed like generated models. An attack vector's
+criticality is the highest criticality among the components it reaches.
+Ids are only unique within a model, so results carry their model's source.
+
+The index can also be persisted to SQLite with --db. The database is updated
+incrementally (only models whose size or mtime changed are re-ingested) and
+is queried in place, without loading the models.
+
+Usage:
+    python -m r155_common.threat_index threats threat-models --component TCU
+    python -m r155_common.threat_index controls threat-models --threat T-812
+    python -m r155_common.threat_index vectors threat-models --criticality high critical
+    python -m r155_common.threat_index build threat-models --db threat-index.sqlite
+    python -m r155_common.threat_index threats --db threat-index.sqlite --risk-level high
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from r155_common import artifacts, validation
+
+logger = logging.getLogger(__name__)
+
+# Queryable fields per record kind
+KIND_FIELDS = {
+    'threat': ('model', 'id', 'component', 'threat_type', 'attack_vector', 'control', 'risk_level'),
+    'control': ('model', 'id', 'name', 'threat', 'status'),
+    'vector': ('model', 'id', 'component', 'criticality'),
+}
+
+# Fields whose values are matched case-insensitively
+CASE_INSENSITIVE = {'threat_type', 'risk_level', 'status', 'criticality'}
+
+# Fields in the order they usually narrow a query, most selective first;
+# the SQLite index drives a query from the first field present
+SELECTIVITY = ('id', 'name', 'threat', 'control', 'attack_vector', 'component',
+               'threat_type', 'status', 'criticality', 'risk_level', 'model')
+
+# Component criticality levels, lowest first
+CRITICALITY = ('low', 'medium', 'high', 'critical')
+SAFETY_CRITICAL = ('high', 'critical')
+
+
+def normalize(field, value):
+    """Index key for a field value"""
+    value = str(value)
+    return value.lower() if field in CASE_INSENSITIVE else value
+
+
+def index_entries(model, source):
+    """Records of a threat model with their index keys
+
+    Yields (kind, record, keys) for every threat, security control and attack
+    vector, where keys is a list of distinct (field, value) pairs.
+    """
+    def entry(kind, record, pairs):
+        keys = [(field, normalize(field, value)) for field, value in pairs if value is not None]
+        return kind, record, list(dict.fromkeys(keys))
+
+    def items(name):
+        return [item for item in model.get(name) or [] if isinstance(item, dict)]
+
+    criticality = {component.get('id'): normalize('criticality', component.get('criticality', 'low'))
+                   for component in items('components')}
+    vectors = items('attack_vectors')
+    reaches = {vector.get('id'): vector.get('affected_components') or [] for vector in vectors}
+
+    # Controls list the threats they mitigate; threats are indexed by control id and name
+    mitigations = {}
+    for control in items('security_controls'):
+        threat_ids = control.get('mitigated_threats') or control.get('mitigates_threats') or []
+        for threat_id in threat_ids:
+            mitigations.setdefault(threat_id, []).extend((control.get('id'), control.get('name')))
+        yield entry('control', control, [('model', source), ('id', control.get('id')),
+                                         ('name', control.get('name')),
+                                         ('status', control.get('implementation_status'))]
+                    + [('threat', threat_id) for threat_id in threat_ids])
+
+    for vector in vectors:
+        components = reaches[vector.get('id')]
+        levels = [criticality.get(component_id, 'low') for component_id in components]
+        level = max(levels, key=lambda l: CRITICALITY.index(l) if l in CRITICALITY else -1, default=None)
+        yield entry('vector', vector, [('model', source), ('id', vector.get('id')), ('criticality', level)]
+                    + [('component', component_id) for component_id in components])
+
+    for threat in items('threats'):
+        vector_ids = threat.get('attack_vectors') or []
+        components = list(threat.get('affected_components') or [])
+        for vector_id in vector_ids:
+            components.extend(reaches.get(vector_id, []))
+        yield entry('threat', threat, [('model', source), ('id', threat.get('id')),
+                                       ('threat_type', threat.get('threat_type')),
+                                       ('risk_level', threat.get('risk_level'))]
+                    + [('component', component_id) for component_id in components]
+                    + [('attack_vector', vector_id) for vector_id in vector_ids]
+                    + [('control', control) for control in mitigations.get(threat.get('id'), [])])
+
+
+def query_keys(kind, criteria):
+    """Validate query criteria; returns a list of (field, [values]) with values normalized
+
+    A criterion value may be a single value or a list of alternatives.
+    """
+    fields = KIND_FIELDS[kind]
+    keys = []
+    for field, values in criteria.items():
+        if values is None:
+            continue
+        if field not in fields:
+            raise ValueError(f"Unknown {kind} field '{field}', expected one of: {', '.join(fields)}")
+        if isinstance(values, (str, int, float)):
+            values = [values]
+        keys.append((field, [normalize(field, value) for value in values]))
+    return keys
+
+
+def intersect(postings):
+    """Intersection of sorted position arrays, by binary search from the shortest"""
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for other in postings[1:]:
+        if not len(result) or not len(other):
+            return result[:0]
+        found = np.searchsorted(other, result)
+        result = result[other[np.minimum(found, len(other) - 1)] == result]
+    return result
+
+
+class ThreatQueries:
+    """Query methods shared by the in-memory index and the SQLite database
+
+    Subclasses implement find(kind, keys, limit), returning result dicts.
+    """
+
+    def threats(self, limit=None, **criteria):
+        """Threats matching every criterion (see KIND_FIELDS['threat'])"""
+        return self.find('threat', query_keys('threat', criteria), limit)
+
+    def controls(self, limit=None, **criteria):
+        """Security controls matching every criterion; threat= selects the controls mitigating a threat"""
+        return self.find('control', query_keys('control', criteria), limit)
+
+    def vectors(self, limit=None, **criteria):
+        """Attack vectors matching every criterion; criticality= selects by the components they reach"""
+        return self.find('vector', query_keys('vector', criteria), limit)
+
+
+class ThreatIndex(ThreatQueries):
+    """In-memory inverted index over threat models"""
+
+    def __init__(self):
+        self.sources = []
+        # kind -> record list, model position per record, (field, value) -> sorted positions
+        self.records = {kind: [] for kind in KIND_FIELDS}
+        self.record_models = {kind: [] for kind in KIND_FIELDS}
+        self.postings = {kind: {} for kind in KIND_FIELDS}
+        # Kinds whose posting lists are Python lists rather than frozen arrays
+        self.unfrozen = set(KIND_FIELDS)
+
+    def add_model(self, model, source):
+        """Index one threat model under source (normally its file path)"""
+        model_position = len(self.sources)
+        self.sources.append(source)
+        self.thaw()
+        gc_was_enabled = gc.isenabled()
+        # Indexing allocates many small lists and tuples; pause the collector
+        gc.disable()
+        try:
+            for kind, record, keys in index_entries(model, source):
+                records = self.records[kind]
+                postings = self.postings[kind]
+                position = len(records)
+                records.append(record)
+                self.record_models[kind].append(model_position)
+                for key in keys:
+                    posting = postings.get(key)
+                    if posting is None:
+                        postings[key] = [position]
+                    else:
+                        posting.append(position)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def freeze(self, kind):
+        """Convert a kind's posting lists to int32 arrays (compact, and intersected without Python loops)"""
+        if kind in self.unfrozen:
+            postings = self.postings[kind]
+            for key, posting in postings.items():
+                postings[key] = np.array(posting, dtype=np.int32)
+            self.unfrozen.discard(kind)
+
+    def thaw(self):
+        """Turn frozen posting arrays back into lists so more models can be appended"""
+        for kind, postings in self.postings.items():
+            if kind not in self.unfrozen:
+                for key, posting in postings.items():
+                    postings[key] = posting.tolist()
+                self.unfrozen.add(kind)
+
+    def positions(self, kind, keys):
+        """Sorted positions of the records of a kind matching every (field, values) key"""
+        self.freeze(kind)
+        postings = self.postings[kind]
+        empty = np.empty(0, dtype=np.int32)
+        arrays = []
+        for field, values in keys:
+            matches = [postings.get((field, value), empty) for value in values]
+            arrays.append(matches[0] if len(matches) == 1 else np.unique(np.concatenate(matches)))
+        if not arrays:
+            return np.arange(len(self.records[kind]), dtype=np.int32)
+        return intersect(arrays)
+
+    def find(self, kind, keys, limit=None):
+        positions = self.positions(kind, keys)
+        if limit is not None:
+            positions = positions[:limit]
+        records = self.records[kind]
+        models = self.record_models[kind]
+        return [dict(records[position], model=self.sources[models[position]]) for position in positions.tolist()]
+
+    def count(self, kind):
+        """Number of indexed records of a kind"""
+        return len(self.records[kind])
+
+
+class ThreatDatabase(ThreatQueries):
+    """Persistent index over threat models in an SQLite database"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS models (
+            id INTEGER PRIMARY KEY, source TEXT UNIQUE NOT NULL, size INTEGER, mtime_ns INTEGER);
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY, kind TEXT NOT NULL, model INTEGER NOT NULL, record TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS records_model ON records (model);
+        CREATE TABLE IF NOT EXISTS postings (
+            kind TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, record INTEGER NOT NULL,
+            PRIMARY KEY (kind, field, value, record)) WITHOUT ROWID;
+    """
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def remove_model(self, source):
+        """Drop a model's records from the database"""
+        db = self.connection
+        row = db.execute("SELECT id FROM models WHERE source = ?", (source,)).fetchone()
+        if row is None:
+            return
+        db.execute("DELETE FROM postings WHERE record IN (SELECT id FROM records WHERE model = ?)", row)
+        db.execute("DELETE FROM records WHERE model = ?", row)
+        db.execute("DELETE FROM models WHERE id = ?", row)
+
+    def add_model(self, model, source, size=None, mtime_ns=None):
+        """Index one threat model under source, replacing any earlier version"""
+        db = self.connection
+        self.remove_model(source)
+        model_id = db.execute("INSERT INTO models (source, size, mtime_ns) VALUES (?, ?, ?)",
+                              (source, size, mtime_ns)).lastrowid
+        record_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+        records = []
+        postings = []
+        for kind, record, keys in index_entries(model, source):
+            record_id += 1
+            records.append((record_id, kind, model_id, json.dumps(record, default=str)))
+            # The model is a column of records, so it needs no postings
+            postings.extend((kind, field, value, record_id) for field, value in keys if field != 'model')
+        db.executemany("INSERT INTO records VALUES (?, ?, ?, ?)", records)
+        # Inserting in key order keeps the postings b-tree appends sequential
+        postings.sort()
+        db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+
+    def update(self, paths):
+        """Re-index the threat models under paths whose size or mtime changed
+
+        Models whose source file no longer exists, or no longer loads as a
+        threat model, are dropped. Returns (indexed, unchanged, removed)
+        counts.
+        """
+        db = self.connection
+        known = {source: (size, mtime_ns) for source, size, mtime_ns
+                 in db.execute("SELECT source, size, mtime_ns FROM models")}
+        indexed = unchanged = removed = 0
+        with db:
+            for source in known:
+                if not os.path.exists(source):
+                    self.remove_model(source)
+                    removed += 1
+            for path in validation.collect_files(paths):
+                stat = os.stat(path)
+                if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                    unchanged += 1
+                    continue
+                model = load_model(path)
+                if model is None:
+                    # Keep no stale records for a model that was edited into something else
+                    if path in known:
+                        self.remove_model(path)
+                        removed += 1
+                    continue
+                self.add_model(model, path, stat.st_size, stat.st_mtime_ns)
+                indexed += 1
+        return indexed, unchanged, removed
+
+    def find(self, kind, keys, limit=None):
+        # Drive the query from the most selective posting and probe the others by primary key
+        keys = sorted(keys, key=lambda key: SELECTIVITY.index(key[0]))
+        models = [values for field, values in keys if field == 'model']
+        keys = [key for key in keys if key[0] != 'model']
+
+        def placeholders(values):
+            return ', '.join('?' * len(values))
+
+        params = []
+        if keys:
+            field, values = keys[0]
+            sql = [f"SELECT models.source, records.record FROM (SELECT DISTINCT record FROM postings"
+                   f" WHERE kind = ? AND field = ? AND value IN ({placeholders(values)})) AS driver"
+                   f" JOIN records ON records.id = driver.record JOIN models ON models.id = records.model"
+                   f" WHERE 1"]
+            params.extend([kind, field, *values])
+        else:
+            sql = ["SELECT models.source, records.record FROM records JOIN models ON models.id = records.model"
+                   " WHERE records.kind = ?"]
+            params.append(kind)
+        for values in models:
+            sql.append(f" AND models.source IN ({placeholders(values)})")
+            params.extend(values)
+        for field, values in keys[1:]:
+            sql.append(f" AND EXISTS (SELECT 1 FROM postings WHERE kind = ? AND field = ?"
+                       f" AND value IN ({placeholders(values)}) AND record = records.id)")
+            params.extend([kind, field, *values])
+        sql.append(" ORDER BY records.id")
+        if limit is not None:
+            sql.append(" LIMIT ?")
+            params.append(limit)
+        return [dict(json.loads(record), model=source)
+                for source, record in self.connection.execute(''.join(sql), params)]
+
+    def count(self, kind):
+        """Number of indexed records of a kind"""
+        return self.connection.execute("SELECT COUNT(*) FROM records WHERE kind = ?", (kind,)).fetchone()[0]
+
+
+def load_model(path):
+    """Load a threat model through the artifact cache; None if the file is not a threat model"""
+    try:
+        document = artifacts.load_artifact(path)
+    except Exception as e:
+        logger.warning(f"Skipping {path}: {str(e)}")
+        return None
+    if not isinstance(document, dict) or validation.detect_schema(document) != 'threat_model':
+        return None
+    return document
+
+
+def build_index(paths):
+    """In-memory index over every threat model in the given files and directories"""
+    index = ThreatIndex()
+    for path in validation.collect_files(paths):
+        model = load_model(path)
+        if model is not None:
+            index.add_model(model, path)
+    return index
+
+
+def format_table(kind, results):
+    """One line per result: model, id, name and the fields most relevant to the kind"""
+    columns = {
+        'threat': ('threat_type', 'risk_level'),
+        'control': ('implementation_status',),
+        'vector': ('entry_point',),
+    }[kind]
+    lines = []
+    for result in results:
+        extra = ' '.join(str(result.get(column, '-')) for column in columns)
+        lines.append(f"{result['model']}  {result.get('id')}  {result.get('name')}  {extra}")
+    return '\n'.join(lines)
+
+
+def main():
+    """Main entry point"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('sources', nargs='*', help='Threat model files or directories to index')
+    common.add_argument('--db', help='SQLite index to update from the sources and query')
+    common.add_argument('--model', nargs='+', help='Only records from these model sources')
+    common.add_argument('--id', nargs='+', help='Only records with these ids')
+    common.add_argument('--limit', type=int, default=None, help='Maximum number of results')
+    common.add_argument('--format', choices=['table', 'json'], default='table', help='Output format')
+
+    parser = argparse.ArgumentParser(description='Query R155 threat models through an index')
+    subparsers = parser.add_subparsers(dest='kind', required=True)
+    subparsers.add_parser('build', parents=[common], help='Update the SQLite index given by --db and exit')
+
+    threats_parser = subparsers.add_parser('threats', parents=[common], help='Find threats')
+    threats_parser.add_argument('--component', nargs='+', help='Threats affecting any of these components')
+    threats_parser.add_argument('--threat-type', nargs='+', help='Threats of any of these types')
+    threats_parser.add_argument('--attack-vector', nargs='+', help='Threats using any of these attack vectors')
+    threats_parser.add_argument('--control', nargs='+', help='Threats mitigated by any of these controls (id or name)')
+    threats_parser.add_argument('--risk-level', nargs='+', help='Threats with any of these risk levels')
+
+    controls_parser = subparsers.add_parser('controls', parents=[common], help='Find security controls')
+    controls_parser.add_argument('--threat', nargs='+', help='Controls mitigating any of these threats')
+    controls_parser.add_argument('--name', nargs='+', help='Controls with any of these names')
+    controls_parser.add_argument('--status', nargs='+', help='Controls with any of these implementation statuses')
+
+    vectors_parser = subparsers.add_parser('vectors', parents=[common], help='Find attack vectors')
+    vectors_parser.add_argument('--component', nargs='+', help='Vectors reaching any of these components')
+    vectors_parser.add_argument('--criticality', nargs='+',
+                                help='Vectors whose most critical reached component has one of these '
+                                     f'criticalities (e.g. {" ".join(SAFETY_CRITICAL)})')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.kind == 'build' and not args.db:
+        parser.error("build requires --db")
+    if not args.db and not args.sources:
+        parser.error("give threat model sources, --db, or both")
+
+    start = time.perf_counter()
+    if args.db:
+        index = ThreatDatabase(args.db)
+        if args.sources:
+            indexed, unchanged, removed = index.update(args.sources)
+            logger.info(f"{args.db}: {indexed} model(s) indexed, {unchanged} unchanged, {removed} removed")
+    else:
+        index = build_index(args.sources)
+    logger.info(f"Index ready in {time.perf_counter() - start:.2f}s: "
+                f"{index.count('threat')} threats, {index.count('control')} controls, "
+                f"{index.count('vector')} attack vectors")
+    if args.kind == 'build':
+        return 0
+
+    kind = args.kind[:-1]
+    criteria = {field: getattr(args, field, None) for field in KIND_FIELDS[kind]}
+    start = time.perf_counter()
+    results = getattr(index, args.kind)(limit=args.limit, **criteria)
+    elapsed = time.perf_counter() - start
+    logger.info(f"{len(results)} {args.kind} in {elapsed * 1000:.3f} ms")
+
+    if args.format == 'json':
+        print(json.dumps(results, indent=2, default=str))
+    elif results:
+        print(format_table(kind, results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
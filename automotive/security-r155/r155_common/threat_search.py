@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+R155 Threat Library Search
+
+Full-text and faceted search over the threat library, for finding threat
+templates by what they describe rather than by exact component_types or
+threat_type equality.
+
+Names, descriptions, component types, threat types and attack vectors are
+tokenized (lower case, stop words dropped, simple suffix stemming) into an
+inverted index with field-weighted term frequencies, and free-text queries
+are ranked with BM25. Threat type, component type, risk level, likelihood
+and impact ratings are indexed as facets that filter the results; impact
+filters match the given rating or higher.
+
+The index is a set of sorted NumPy arrays: a term dictionary searched with
+a binary search, and postings in compressed sparse row form. It can be saved
+as a directory of .npy files and reopened memory-mapped, so queries do not
+parse the library again; load_search_index() rebuilds a saved index when the
+library changes.
+
+Usage:
+    python -m r155_common.threat_search build threat-models/threat_library.yaml --store threat-search
+    python -m r155_common.threat_search query threat-search "spoofed CAN messages" --limit 5
+    python -m r155_common.threat_search query threat-models/threat_library.yaml firmware \\
+        --component-type software --impact safety=high
+
+Requires NumPy.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from r155_common import safe_yaml, validation
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout or tokenization changes
+STORE_FORMAT_VERSION = 1
+METADATA_FILE = "search.json"
+
+# Weight of one term occurrence per field (BM25F-style field weighting)
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "component_types": 2.0,
+    "threat_type": 2.0,
+    "attack_vectors": 1.5,
+    "description": 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their through "
+    "to via with".split())
+# Stripped (longest first) from tokens that keep at least three characters
+SUFFIXES = ("ing", "ed", "s")
+
+IMPACT_DIMENSIONS = ("safety", "privacy", "operational", "financial")
+RATING_ORDER = ("very low", "low", "medium", "high", "very high", "critical")
+
+# Columns kept for displaying results
+DISPLAY_COLUMNS = ("name", "threat_type", "component_types", "risk_level")
+
+
+@functools.lru_cache(maxsize=65536)
+def term(token):
+    """Search term for a lower-case token, or None for a stop word"""
+    if token in STOPWORDS:
+        return None
+    if token.endswith("ss"):
+        return token
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    """Search terms of a text, in order (repeats kept)"""
+    return [t for t in map(term, TOKEN_PATTERN.findall(str(text).lower())) if t]
+
+
+def facet_value(value):
+    # Library values need not be hashable (a mapping where a string belongs)
+    return _facet_text(str(value))
+
+
+@functools.lru_cache(maxsize=4096)
+def _facet_text(text):
+    return " ".join(text.lower().split())
+
+
+def as_list(value):
+    """A threat field as a list: None is empty, a single value a one-item list"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def column_text(value):
+    """A threat field as result-column text; lists are comma-separated"""
+    return ", ".join(str(v) for v in as_list(value))
+
+
+def threat_terms(threat):
+    """{term: field-weighted frequency} of one library threat"""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = threat.get(field)
+        if value is None:
+            continue
+        for text in as_list(value):
+            for t in tokenize(text):
+                weights[t] = weights.get(t, 0.0) + weight
+    return weights
+
+
+def threat_facets(threat):
+    """Facet terms (facet=value) of one library threat"""
+    facets = set()
+    if threat.get("threat_type"):
+        facets.add(f"threat_type={facet_value(threat['threat_type'])}")
+    for component_type in as_list(threat.get("component_types")):
+        facets.add(f"component_type={facet_value(component_type)}")
+    for field in ("risk_level", "likelihood"):
+        if threat.get(field):
+            facets.add(f"{field}={facet_value(threat[field])}")
+    impact = threat.get("impact")
+    for dimension, rating in (impact.items() if isinstance(impact, dict) else []):
+        facets.add(f"impact.{dimension}={facet_value(rating)}")
+    return facets
+
+
+def encode_terms(terms):
+    """Sorted UTF-8 term array"""
+    if not terms:
+        return np.zeros(0, dtype='S1')
+    return np.array(sorted(term.encode('utf-8') for term in terms))
+
+
+class PostingsBuilder:
+    """Collects (term, document, weight) postings in document order"""
+
+    def __init__(self):
+        self.term_ids = {}
+        self.terms = []
+        self.docs = []
+        self.weights = []
+
+    def add(self, doc, postings):
+        """Add a document's {term: weight} postings; documents must be added in increasing order"""
+        for t, weight in postings.items():
+            term_id = self.term_ids.get(t)
+            if term_id is None:
+                term_id = self.term_ids[t] = len(self.term_ids)
+            self.terms.append(term_id)
+            self.docs.append(doc)
+            self.weights.append(weight)
+
+    def build(self):
+        """CSR postings; returns (sorted terms, offsets, docs, weights)"""
+        terms = encode_terms(self.term_ids)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[np.array([self.term_ids[t.decode('utf-8')] for t in terms.tolist()], dtype=np.int64)] = \
+            np.arange(len(terms))
+        term_ranks = rank[np.array(self.terms, dtype=np.int64)]
+        # Stable, so each term's documents stay in increasing order
+        order = np.argsort(term_ranks, kind='stable')
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ranks, minlength=len(terms)), out=offsets[1:])
+        docs = np.array(self.docs, dtype=np.int32)[order]
+        weights = np.array(self.weights, dtype=np.float32)[order]
+        return terms, offsets, docs, weights
+
+
+class ThreatSearchIndex:
+    """BM25-ranked inverted index over the threats of a threat library
+
+    Text and facet postings are each a sorted term array, an int64 offsets
+    array and int32 document (library position) arrays; text postings carry
+    the field-weighted term frequency.
+    """
+
+    def __init__(self, arrays, columns, source=None):
+        self.terms = arrays["terms"]
+        self.offsets = arrays["offsets"]
+        self.docs = arrays["docs"]
+        self.weights = arrays["weights"]
+        self.lengths = arrays["lengths"]
+        self.facet_terms = arrays["facet_terms"]
+        self.facet_offsets = arrays["facet_offsets"]
+        self.facet_docs = arrays["facet_docs"]
+        self.columns = columns
+        self.source = source or {}
+        average = float(self.lengths.mean()) if len(self.lengths) else 1.0
+        # Per-document part of the BM25 denominator, shared by every query
+        self.length_norm = (BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / (average or 1.0))).astype(np.float32)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    @classmethod
+    def from_threats(cls, threats, source=None):
+        """Index threat library entries; threats may be any iterable, it is read once"""
+        text = PostingsBuilder()
+        facets = PostingsBuilder()
+        lengths = []
+        columns = {"name": [], "threat_type": [], "component_types": [], "risk_level": []}
+        for doc, threat in enumerate(threats):
+            weights = threat_terms(threat)
+            text.add(doc, weights)
+            lengths.append(sum(weights.values()))
+            facets.add(doc, dict.fromkeys(threat_facets(threat), 1.0))
+            for name, values in columns.items():
+                values.append(column_text(threat.get(name)))
+        arrays = {"lengths": np.array(lengths, dtype=np.float32)}
+        arrays["terms"], arrays["offsets"], arrays["docs"], arrays["weights"] = text.build()
+        arrays["facet_terms"], arrays["facet_offsets"], arrays["facet_docs"], _ = facets.build()
+        columns = {name: np.array([value.encode('utf-8') for value in values] or [b""])[:len(lengths)]
+                   for name, values in columns.items()}
+        return cls(arrays, columns, source)
+
+    @classmethod
+    def from_library(cls, path):
+        """Index the threats of a threat library file
+
+        The library is read a threat at a time (safe_yaml.iter_items), so
+        memory use does not grow with the size of the file.
+        """
+        stat = os.stat(path)
+        source = {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        validate = validation.get_item_validator("threat_library", "threats")
+        errors = []
+
+        def threats():
+            for i, threat in enumerate(safe_yaml.iter_items(path, "threats")):
+                validate(threat, ("threats", i), errors)
+                yield threat if isinstance(threat, dict) else {}
+
+        index = cls.from_threats(threats(), source)
+        if errors:
+            validation.log_issues([validation.ValidationIssue(path, 0, 0, validation.format_path(p), message)
+                                   for p, message in errors])
+            raise ValueError(f"Invalid threat library {path}")
+        return index
+
+    def save(self, store_dir):
+        """Write the index arrays as .npy files plus a metadata file"""
+        os.makedirs(store_dir, exist_ok=True)
+        arrays = {
+            "terms": self.terms, "offsets": self.offsets, "docs": self.docs, "weights": self.weights,
+            "lengths": self.lengths, "facet_terms": self.facet_terms, "facet_offsets": self.facet_offsets,
+            "facet_docs": self.facet_docs,
+        }
+        arrays.update({f"column.{name}": values for name, values in self.columns.items()})
+        for name, values in arrays.items():
+            np.save(os.path.join(store_dir, f"{name}.npy"), np.ascontiguousarray(values))
+
+        # The metadata file is written last and atomically; it marks the store as complete
+        document = {
+            "format_version": STORE_FORMAT_VERSION,
+            "indexed_threats": len(self),
+            "indexed_terms": len(self.terms),
+            "source": self.source,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(document, f, indent=2)
+            os.replace(tmp_path, os.path.join(store_dir, METADATA_FILE))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def open(cls, store_dir):
+        """Open a saved index with its arrays memory-mapped"""
+        with open(os.path.join(store_dir, METADATA_FILE), 'r') as f:
+            document = json.load(f)
+        if document.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported threat search store format in {store_dir}")
+
+        def load(name):
+            return np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode='r')
+
+        arrays = {name: load(name) for name in ("terms", "offsets", "docs", "weights", "lengths",
+                                                 "facet_terms", "facet_offsets", "facet_docs")}
+        columns = {name: load(f"column.{name}") for name in DISPLAY_COLUMNS}
+        return cls(arrays, columns, document.get("source"))
+
+    @staticmethod
+    def _postings(terms, offsets, term):
+        """(start, end) of a term's postings, or None if it is not indexed"""
+        key = term.encode('utf-8')
+        i = int(np.searchsorted(terms, key))
+        if i == len(terms) or terms[i] != key:
+            return None
+        return int(offsets[i]), int(offsets[i + 1])
+
+    def filter_mask(self, filters):
+        """Documents matching every facet filter ({facet: [values]}; any value within a facet)"""
+        mask = np.ones(len(self), dtype=bool)
+        for facet, values in filters.items():
+            facet_mask = np.zeros(len(self), dtype=bool)
+            for value in values:
+                span = self._postings(self.facet_terms, self.facet_offsets, f"{facet}={facet_value(value)}")
+                if span:
+                    facet_mask[self.facet_docs[span[0]:span[1]]] = True
+            mask &= facet_mask
+        return mask
+
+    def scores(self, query):
+        """BM25 score of every document for a free-text query"""
+        scores = np.zeros(len(self), dtype=np.float32)
+        terms, counts = np.unique(tokenize(query), return_counts=True) if query else ([], [])
+        for term, count in zip(terms, counts):
+            span = self._postings(self.terms, self.offsets, str(term))
+            if span is None:
+                continue
+            docs = self.docs[span[0]:span[1]]
+            frequencies = self.weights[span[0]:span[1]]
+            idf = math.log(1 + (len(self) - len(docs) + 0.5) / (len(docs) + 0.5))
+            # Each document appears once per term, so fancy-index addition is safe
+            scores[docs] += count * idf * frequencies * (BM25_K1 + 1) / (frequencies + self.length_norm[docs])
+        return scores
+
+    def search(self, query="", limit=10, filters=None):
+        """Best matches for a free-text query and facet filters
+
+        Returns dicts with the library position ('index'), BM25 'score' and
+        the display columns. Without query terms, every document passing the
+        filters matches with score 0, in library order.
+        """
+        mask = self.filter_mask(filters or {})
+        scores = self.scores(query)
+        if tokenize(query):
+            mask &= scores > 0
+        candidates = np.flatnonzero(mask)
+        if limit and len(candidates) > limit:
+            # Partial selection first, so only the top results are sorted
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            threshold = scores[candidates[top]].min()
+            candidates = candidates[scores[candidates] >= threshold]
+        order = np.lexsort((candidates, -scores[candidates]))
+        candidates = candidates[order][:limit or None]
+        return [{
+            "index": int(doc),
+            "score": round(float(scores[doc]), 4),
+            **{name: values[doc].decode('utf-8') for name, values in self.columns.items()},
+        } for doc in candidates]
+
+    def facet_values(self, facet):
+        """Indexed values of a facet"""
+        prefix = f"{facet}=".encode('utf-8')
+        return [term[len(prefix):].decode('utf-8') for term in self.facet_terms.tolist() if term.startswith(prefix)]
+
+
+def impact_filters(impacts):
+    """Facet filters for 'dimension=rating' strings, each matching that rating or higher"""
+    filters = {}
+    for impact in impacts:
+        dimension, _, rating = impact.partition('=')
+        dimension, rating = dimension.strip().lower(), facet_value(rating)
+        if dimension not in IMPACT_DIMENSIONS or rating not in RATING_ORDER:
+            raise ValueError(f"Invalid impact filter '{impact}': use dimension=rating with dimension one of "
+                             f"{', '.join(IMPACT_DIMENSIONS)} and rating one of {', '.join(RATING_ORDER)}")
+        filters[f"impact.{dimension}"] = RATING_ORDER[RATING_ORDER.index(rating):]
+    return filters
+
+
+def component_query(component):
+    """Free-text query describing a component, for suggesting threats"""
+    return " ".join(str(component.get(field, "")) for field in ("name", "type", "description"))
+
+
+def store_is_current(store_dir, library_path):
+    """True if store_dir holds an index built from the library's current content"""
+    try:
+        with open(os.path.join(store_dir, METADATA_FILE), 'r') as f:
+            document = json.load(f)
+        stat = os.stat(library_path)
+    except (OSError, ValueError):
+        return False
+    source = document.get("source", {})
+    return (document.get("format_version") == STORE_FORMAT_VERSION
+            and source.get("size") == stat.st_size and source.get("mtime_ns") == stat.st_mtime_ns)
+
+
+def load_search_index(path, store_dir=None):
+    """Load a search index from a threat library file or a saved store
+
+    With store_dir, the library is indexed once and saved there, and later
+    calls open the store memory-mapped until the library changes.
+    """
+    if os.path.isdir(path):
+        return ThreatSearchIndex.open(path)
+    if store_dir and store_is_current(store_dir, path):
+        return ThreatSearchIndex.open(store_dir)
+
+    start = time.perf_counter()
+    index = ThreatSearchIndex.from_library(path)
+    logger.info(f"Indexed {len(index)} threats ({len(index.terms)} terms) from {path} "
+                f"in {time.perf_counter() - start:.2f}s")
+    if store_dir:
+        try:
+            index.save(store_dir)
+        except OSError as e:
+            logger.warning(f"Could not save threat search store {store_dir}: {str(e)}")
+    return index
+
+
+def format_results(results):
+    """Plain-text table of search results"""
+    lines = [f"{'score':>8}  {'#':>6}  {'threat_type':<22} {'risk':<9} name [component types]"]
+    for result in results:
+        lines.append(f"{result['score']:>8.3f}  {result['index']:>6}  {result['threat_type']:<22.22} "
+                     f"{result['risk_level']:<9.9} {result['name']} [{result['component_types']}]")
+    return "\n".join(lines)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Build and query the threat library search index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Index a threat library into a memory-mappable store')
+    build_parser.add_argument('library', help='Threat library YAML file')
+    build_parser.add_argument('--store', required=True, help='Store directory')
+
+    query_parser = subparsers.add_parser('query', help='Search the threat library')
+    query_parser.add_argument('index', help='Threat library YAML file or store directory')
+    query_parser.add_argument('text', help="Free-text query ('' lists the threats matching the filters)")
+    query_parser.add_argument('--threat-type', nargs='+', help='Only these threat types')
+    query_parser.add_argument('--component-type', nargs='+', help='Only threats for these component types')
+    query_parser.add_argument('--risk-level', nargs='+', help='Only these risk levels')
+    query_parser.add_argument('--impact', nargs='+', default=[], metavar='DIMENSION=RATING',
+                              help='Only threats with at least this impact, e.g. safety=high')
+    query_parser.add_argument('--limit', type=int, default=10, help='Maximum results (0: all)')
+    query_parser.add_argument('--store', default=None,
+                              help='Store directory to reuse (and refresh) when querying a library file')
+    query_parser.add_argument('--format', choices=['table', 'json'], default='table', help='Output format')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    try:
+        if args.command == 'build':
+            index = ThreatSearchIndex.from_library(args.library)
+            index.save(args.store)
+            logger.info(f"Indexed {len(index)} threats ({len(index.terms)} terms) into {args.store}")
+            return 0
+
+        filters = impact_filters(args.impact)
+        for facet in ('threat_type', 'component_type', 'risk_level'):
+            if getattr(args, facet):
+                filters[facet] = getattr(args, facet)
+        index = load_search_index(args.index, args.store)
+        start = time.perf_counter()
+        results = index.search(args.text, args.limit, filters)
+        elapsed = time.perf_counter() - start
+    except (OSError, ValueError) as e:
+        logger.error(f"Error: {str(e)}")
+        return 1
+
+    if args.format == 'json':
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_results(results))
+    logger.info(f"{len(results)} result(s) in {elapsed * 1000:.1f} ms over {len(index)} threats")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
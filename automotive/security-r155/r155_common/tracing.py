@@ -0,0 +1,206 @@
+"""
+Opt-in Stage Tracing
+
+Records the duration, memory peak and object count of each pipeline stage
+of the R155 tools. Code marks its stages with
+
+    with tracing.stage('map_threats_to_components'):
+        ...
+
+which does nothing unless tracing was enabled (the tools' --trace option).
+When it is, every stage records:
+
+- duration (wall clock) and self time (duration minus child stages)
+- peak_kib: highest tracemalloc-traced memory during the stage, relative to
+  the traced memory when it started
+- objects: net change in the number of GC-tracked objects
+
+Stages nest through a context variable, so asyncio tasks keep their parent
+stage; code that hands work to a thread pool should run it in a copy of the
+current context (contextvars.copy_context().run) to keep the nesting. The
+memory peak is process-wide, so stages running concurrently see the same
+peak. Counting objects walks the GC heap, so tracing slows large runs down.
+
+finish() writes the trace and logs a summary table per stage path. Trace
+files ending in .json use the Chrome trace event format (chrome://tracing,
+Perfetto, speedscope); any other name gets folded stacks with self time in
+microseconds, the input format of flamegraph.pl and speedscope.
+"""
+
+import contextvars
+import gc
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Names of the enclosing stages in the current thread or task
+_stack = contextvars.ContextVar('r155_trace_stack', default=())
+
+_tracer = None
+
+
+class StageRecord:
+    """Measurements of one stage execution"""
+
+    def __init__(self, path, start, memory, objects):
+        self.path = path
+        self.start = start
+        self.start_memory = memory
+        self.start_objects = objects
+        self.thread = threading.get_ident()
+        self.duration = 0.0
+        self.child_time = 0.0
+        self.peak = memory
+        self.objects = 0
+
+    @property
+    def self_time(self):
+        # Children running concurrently in other threads can overlap their parent
+        return max(self.duration - self.child_time, 0.0)
+
+    @property
+    def peak_kib(self):
+        return (self.peak - self.start_memory) / 1024
+
+
+class Tracer:
+    """Collects StageRecords for the stages run while it is active"""
+
+    def __init__(self):
+        self.records = []
+        self.open = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.started_tracemalloc = not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start()
+
+    def _fold_peak(self):
+        """Credit the traced peak so far to every open stage"""
+        _, peak = tracemalloc.get_traced_memory()
+        for record in self.open:
+            record.peak = max(record.peak, peak)
+
+    @staticmethod
+    def _count_objects():
+        """Number of GC-tracked objects; the peak is reset afterwards so the temporary list is not counted"""
+        count = len(gc.get_objects())
+        tracemalloc.reset_peak()
+        return count
+
+    @contextmanager
+    def stage(self, name):
+        path = _stack.get() + (name,)
+        token = _stack.set(path)
+        with self.lock:
+            self._fold_peak()
+            objects = self._count_objects()
+            record = StageRecord(path, time.perf_counter(), tracemalloc.get_traced_memory()[0], objects)
+            self.open.append(record)
+        try:
+            yield record
+        finally:
+            with self.lock:
+                record.duration = time.perf_counter() - record.start
+                self._fold_peak()
+                record.objects = self._count_objects() - record.start_objects
+                self.open.remove(record)
+                self.records.append(record)
+                # The innermost open stage of the same context is the parent
+                for parent in reversed(self.open):
+                    if parent.path == path[:-1]:
+                        parent.child_time += record.duration
+                        break
+            _stack.reset(token)
+
+    def stop(self):
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+    def summary(self):
+        """Per stage path: (path, calls, total seconds, self seconds, max peak KiB, objects), in first-run order"""
+        rows = {}
+        for record in sorted(self.records, key=lambda r: r.start):
+            row = rows.setdefault(record.path, [record.path, 0, 0.0, 0.0, 0.0, 0])
+            row[1] += 1
+            row[2] += record.duration
+            row[3] += record.self_time
+            row[4] = max(row[4], record.peak_kib)
+            row[5] += record.objects
+        return [tuple(row) for row in rows.values()]
+
+    def write_folded(self, path):
+        """Folded stacks (stage;child self_microseconds), one line per stage path"""
+        totals = {}
+        for record in self.records:
+            totals[record.path] = totals.get(record.path, 0) + record.self_time
+        with open(path, 'w') as f:
+            for stack, seconds in totals.items():
+                f.write(f"{';'.join(stack)} {max(int(seconds * 1e6), 1)}\n")
+
+    def write_chrome(self, path):
+        """Chrome trace events, one complete ("X") event per stage execution"""
+        pid = os.getpid()
+        events = [{
+            "name": record.path[-1],
+            "cat": "stage",
+            "ph": "X",
+            "ts": (record.start - self.origin) * 1e6,
+            "dur": record.duration * 1e6,
+            "pid": pid,
+            "tid": record.thread,
+            "args": {"path": ';'.join(record.path), "peak_kib": round(record.peak_kib, 1),
+                     "objects": record.objects},
+        } for record in sorted(self.records, key=lambda r: r.start)]
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def log_summary(self):
+        logger.info("Stage trace summary:")
+        logger.info(f"  {'stage':<48} {'calls':>5} {'total ms':>10} {'self ms':>10} {'peak KiB':>10} {'objects':>9}")
+        for path, calls, total, self_time, peak, objects in self.summary():
+            name = '  ' * (len(path) - 1) + path[-1]
+            logger.info(f"  {name:<48.48} {calls:>5} {total * 1000:>10.1f} {self_time * 1000:>10.1f} "
+                        f"{peak:>10.1f} {objects:>9}")
+
+
+def enable():
+    """Start tracing stages; returns the active Tracer"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def active():
+    """Whether stages are being traced"""
+    return _tracer is not None
+
+
+def stage(name):
+    """Context manager tracing a stage; a no-op unless tracing is enabled"""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.stage(name)
+
+
+def finish(trace_path=None):
+    """Stop tracing, write the trace file (if a path is given) and log the summary table"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return
+    tracer.stop()
+    if trace_path:
+        if trace_path.endswith('.json'):
+            tracer.write_chrome(trace_path)
+        else:
+            tracer.write_folded(trace_path)
+        logger.info(f"Stage trace written to {trace_path}")
+    tracer.log_summary()
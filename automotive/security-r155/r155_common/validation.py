@@ -0,0 +1,883 @@
+#!/usr/bin/env python3
+"""
+R155 Input Validation
+
+This module validates the YAML/JSON inputs consumed by the R155 tools
+(component files, vehicle variant overlays, threat libraries, threat
+models/TARAs, incident response playbooks and capacity scenarios,
+documentation batch manifests and compliance checker configurations)
+against declarative schemas.
+
+Schemas are compiled once into nested validator functions, so validating a
+document is a single walk over the loaded data. Line and column numbers are
+only computed (by composing the YAML node tree) for documents that fail.
+"""
+
+import argparse
+import collections
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+from r155_common import safe_yaml
+from r155_common.artifacts import yaml_loader
+
+logger = logging.getLogger(__name__)
+
+# Below this many files the process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+INPUT_EXTENSIONS = ('.yaml', '.yml', '.json')
+
+ValidationIssue = collections.namedtuple('ValidationIssue', ['file', 'line', 'column', 'path', 'message'])
+
+RATING = {"type": "string", "enum": ["Very Low", "Low", "Medium", "High", "Very High", "Critical", "Unknown"]}
+STRING_LIST = {"type": "array", "items": {"type": "string"}}
+COUNT = {"type": "integer", "minimum": 0}
+NON_NEGATIVE_NUMBER = {"type": "number", "minimum": 0}
+POSITIVE_NUMBER = {"type": "number", "exclusiveMinimum": 0}
+IMPACT = {
+    "type": "object",
+    "properties": {
+        "safety": RATING,
+        "privacy": RATING,
+        "operational": RATING,
+        "financial": RATING,
+    }
+}
+
+COMPONENT_PROPERTIES = {
+    "id": {"type": "string"},
+    "name": {"type": "string"},
+    "type": {"type": "string"},
+    "description": {"type": "string"},
+    "criticality": RATING,
+}
+CONNECTION_PROPERTIES = {
+    "source": {"type": "string"},
+    "target": {"type": "string"},
+    "name": {"type": "string"},
+    "type": {"type": "string"},
+    "protocol": {"type": "string"},
+    "description": {"type": "string"},
+}
+
+DATA_SOURCE_DIRECTORIES = {
+    "type": "object",
+    "properties": {
+        "threat_models_dir": {"type": "string"},
+        "controls_dir": {"type": "string"},
+        "verification_dir": {"type": "string"},
+        "incident_dir": {"type": "string"},
+    }
+}
+DOCUMENT_META_FIELDS = {
+    "type": "object",
+    "properties": {
+        "company": {"type": "string"},
+        "vehicle_type": {"type": "string"},
+        "document_version": {"type": ["string", "number"]},
+        "confidentiality": {"type": "string"},
+        "r155_version": {"type": "string"},
+    }
+}
+
+# Schemas use a small JSON-Schema subset: type, enum, pattern, minimum,
+# exclusiveMinimum, required, properties, additionalProperties, items and
+# minItems.
+SCHEMAS = {
+    "components": {
+        "type": "object",
+        "required": ["components"],
+        "properties": {
+            "components": {
+                "type": "array",
+                "items": {"type": "object", "required": ["id", "name", "type"], "properties": COMPONENT_PROPERTIES}
+            },
+            "connections": {
+                "type": "array",
+                "items": {"type": "object", "required": ["source", "target"], "properties": CONNECTION_PROPERTIES}
+            },
+            "external_connections": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["component"],
+                    "properties": {
+                        "component": {"type": "string"},
+                        "endpoint": {"type": "string"},
+                        "direction": {"type": "string"},
+                        "protocol": {"type": "string"},
+                    }
+                }
+            },
+            "trust_boundaries": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["name"],
+                    "properties": {
+                        "name": {"type": "string"},
+                        "description": {"type": "string"},
+                        "components_inside": STRING_LIST,
+                        "components_outside": STRING_LIST,
+                    }
+                }
+            },
+        }
+    },
+    "variants": {
+        "type": "object",
+        "required": ["base", "variants"],
+        "properties": {
+            "base": {"type": "string"},
+            "variants": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id"],
+                    "properties": {
+                        "id": {"type": "string"},
+                        "system_name": {"type": "string"},
+                        "description": {"type": "string"},
+                        "remove_components": STRING_LIST,
+                        "override_components": {
+                            "type": "array",
+                            "items": {"type": "object", "required": ["id"], "properties": COMPONENT_PROPERTIES}
+                        },
+                        "add_components": {
+                            "type": "array",
+                            "items": {"type": "object", "required": ["id", "name", "type"],
+                                      "properties": COMPONENT_PROPERTIES}
+                        },
+                        "remove_connections": {
+                            "type": "array",
+                            "items": {"type": "object", "required": ["source", "target"],
+                                      "properties": CONNECTION_PROPERTIES}
+                        },
+                        "override_connections": {
+                            "type": "array",
+                            "items": {"type": "object", "required": ["source", "target"],
+                                      "properties": CONNECTION_PROPERTIES}
+                        },
+                        "add_connections": {
+                            "type": "array",
+                            "items": {"type": "object", "required": ["source", "target"],
+                                      "properties": CONNECTION_PROPERTIES}
+                        },
+                    }
+                }
+            },
+        }
+    },
+    "vehicle_batch": {
+        "type": "object",
+        "required": ["vehicles"],
+        "properties": {
+            "meta": DOCUMENT_META_FIELDS,
+            "sources": DATA_SOURCE_DIRECTORIES,
+            "vehicles": {
+                "type": "array",
+                "minItems": 1,
+                "items": {
+                    "type": "object",
+                    "required": ["id"],
+                    "properties": {
+                        "id": {"type": "string", "pattern": r"^[A-Za-z0-9][A-Za-z0-9_.-]*$"},
+                        "output_dir": {"type": "string"},
+                        "meta": DOCUMENT_META_FIELDS,
+                        "sources": DATA_SOURCE_DIRECTORIES,
+                    }
+                }
+            },
+        }
+    },
+    "threat_library": {
+        "type": "object",
+        "required": ["threats"],
+        "properties": {
+            "threats": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["name", "description"],
+                    "properties": {
+                        "name": {"type": "string"},
+                        "description": {"type": "string"},
+                        "threat_type": {"type": "string"},
+                        "component_types": STRING_LIST,
+                        "attack_vectors": STRING_LIST,
+                        "impact": IMPACT,
+                        "likelihood": RATING,
+                        "risk_level": RATING,
+                    }
+                }
+            },
+            "controls": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["name"],
+                    "properties": {
+                        "name": {"type": "string"},
+                        "description": {"type": "string"},
+                        "threat_types": STRING_LIST,
+                        "component_types": STRING_LIST,
+                    }
+                }
+            },
+        }
+    },
+    "threat_model": {
+        "type": "object",
+        "required": ["system", "threats"],
+        "properties": {
+            "system": {
+                "type": "object",
+                "required": ["name"],
+                "properties": {
+                    "name": {"type": "string"},
+                    "version": {"type": ["string", "number"]},
+                    "description": {"type": "string"},
+                }
+            },
+            "components": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name"],
+                    "properties": {
+                        "id": {"type": "string"},
+                        "name": {"type": "string"},
+                        "type": {"type": "string"},
+                    }
+                }
+            },
+            "attack_vectors": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name"],
+                    "properties": {
+                        "id": {"type": "string"},
+                        "name": {"type": "string"},
+                        "affected_components": STRING_LIST,
+                    }
+                }
+            },
+            "threats": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name"],
+                    "properties": {
+                        "id": {"type": "string"},
+                        "name": {"type": "string"},
+                        "description": {"type": "string"},
+                        "attack_vectors": STRING_LIST,
+                        "affected_components": STRING_LIST,
+                        "impact": IMPACT,
+                        "likelihood": RATING,
+                        "feasibility": RATING,
+                        "risk_level": RATING,
+                    }
+                }
+            },
+            "security_controls": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name"],
+                    "properties": {
+                        "id": {"type": "string"},
+                        "name": {"type": "string"},
+                        "mitigates_threats": STRING_LIST,
+                        "mitigated_threats": STRING_LIST,
+                    }
+                }
+            },
+        }
+    },
+    "playbook": {
+        "type": "object",
+        "required": ["incident_types", "roles"],
+        "properties": {
+            "metadata": {"type": "object"},
+            "incident_types": {
+                "type": "array",
+                "minItems": 1,
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name", "severity_levels"],
+                    "properties": {
+                        "id": {"type": "string", "pattern": r"^INC-[A-Z0-9_-]+$"},
+                        "name": {"type": "string"},
+                        "description": {"type": "string"},
+                        "severity_levels": {
+                            "type": "array",
+                            "minItems": 1,
+                            "items": {"type": "string", "enum": ["Low", "Medium", "High", "Critical"]}
+                        },
+                    }
+                }
+            },
+            "roles": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name"],
+                    "properties": {
+                        "id": {"type": "string", "pattern": r"^ROLE-[A-Z0-9_-]+$"},
+                        "name": {"type": "string"},
+                        "responsibilities": STRING_LIST,
+                    }
+                }
+            },
+            "response_phases": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name"],
+                    "properties": {
+                        "id": {"type": "string"},
+                        "name": {"type": "string"},
+                        "tasks": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "required": ["description"],
+                                "properties": {
+                                    "description": {"type": "string"},
+                                    "responsible": STRING_LIST,
+                                }
+                            }
+                        },
+                    }
+                }
+            },
+            "triage": {
+                "type": "object",
+                "properties": {
+                    "default_phase": {"type": "string"},
+                    "severity_roles": {"type": "object"},
+                    "rules": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "required": ["incident_type", "match"],
+                            "properties": {
+                                "incident_type": {"type": "string"},
+                                "match": {"type": "object", "required": ["event_type"]},
+                                "roles": STRING_LIST,
+                                "severity": {
+                                    "type": "object",
+                                    "properties": {
+                                        "default": {"type": "string", "enum": ["Low", "Medium", "High", "Critical"]},
+                                        "escalations": {
+                                            "type": "array",
+                                            "items": {
+                                                "type": "object",
+                                                "required": ["when", "severity"],
+                                                "properties": {
+                                                    "when": {"type": "object"},
+                                                    "severity": {"type": "string",
+                                                                 "enum": ["Low", "Medium", "High", "Critical"]},
+                                                }
+                                            }
+                                        },
+                                    }
+                                },
+                            }
+                        }
+                    },
+                }
+            },
+            "specific_playbooks": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["incident_type", "steps"],
+                    "properties": {
+                        "incident_type": {"type": "string"},
+                        "steps": {"type": "array"},
+                    }
+                }
+            },
+        }
+    },
+    "capacity_scenario": {
+        "type": "object",
+        "required": ["staffing", "arrivals"],
+        "properties": {
+            "playbook": {"type": "string"},
+            "horizon_days": POSITIVE_NUMBER,
+            "replications": {"type": "integer", "minimum": 1},
+            "seed": {"type": "integer"},
+            # Role ID -> number of responders
+            "staffing": {"type": "object", "additionalProperties": COUNT},
+            # Incident type ID -> arrival rate and severity mix
+            "arrivals": {
+                "type": "object",
+                "additionalProperties": {
+                    "type": "object",
+                    "required": ["per_day"],
+                    "properties": {
+                        "per_day": NON_NEGATIVE_NUMBER,
+                        "severity_mix": {"type": "object", "additionalProperties": NON_NEGATIVE_NUMBER},
+                    }
+                }
+            },
+            "effort": {
+                "type": "object",
+                "properties": {
+                    "task_hours": NON_NEGATIVE_NUMBER,
+                    "phase_task_hours": {"type": "object", "additionalProperties": NON_NEGATIVE_NUMBER},
+                    "severity_factor": {"type": "object", "additionalProperties": NON_NEGATIVE_NUMBER},
+                    "automation_factor": NON_NEGATIVE_NUMBER,
+                    "cv": NON_NEGATIVE_NUMBER,
+                    "skip_phases": STRING_LIST,
+                }
+            },
+            "sla": {
+                "type": "object",
+                "required": ["phase", "hours"],
+                "properties": {
+                    "phase": {"type": "string"},
+                    "hours": {"type": "object", "additionalProperties": NON_NEGATIVE_NUMBER},
+                }
+            },
+            "max_breach_rate": NON_NEGATIVE_NUMBER,
+            "sweep": {
+                "type": "object",
+                "properties": {
+                    "staffing": {
+                        "type": "object",
+                        "additionalProperties": {"type": "array", "minItems": 1, "items": COUNT}
+                    },
+                    "arrival_scale": {"type": "array", "minItems": 1, "items": POSITIVE_NUMBER},
+                }
+            },
+        }
+    },
+    "checker_config": {
+        "type": "object",
+        "required": ["vehicle_type"],
+        "properties": {
+            "assessor": {"type": "string"},
+            "vehicle_type": {"type": "string"},
+            "r155_version": {"type": "string"},
+            "evidence_directory": {"type": "string"},
+            "threat_models_directory": {"type": "string"},
+            "csms_documentation": {"type": "string"},
+            "ota_documentation": {"type": "string"},
+            "ota_system_path": {"type": "string"},
+            "compliance_matrix": {"type": "string"},
+            "incident_response_plan": {"type": "string"},
+            "triage_summary": {"type": "string"},
+            "capacity_summary": {"type": "string"},
+            "security_controls_evidence": {"type": "string"},
+            "firewall_replay_summary": {"type": "string"},
+            "can_log_captures": {"type": "string"},
+            "can_known_ids": {"type": "string"},
+            "fleet_inventory": {"type": "string"},
+            "fleet_inventory_store": {"type": "string"},
+            "compliance_rollup_store": {"type": "string"},
+            "update_campaigns": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id", "ecu", "target_version"],
+                    "properties": {
+                        "id": {"type": "string"},
+                        "ecu": {"type": "string"},
+                        "vulnerable_versions": STRING_LIST,
+                        "target_version": {"type": "string"},
+                    }
+                }
+            },
+            "min_update_confirmation": {"type": "number"},
+            "not_applicable_requirements": STRING_LIST,
+            "external_systems": {"type": "object"},
+            "report": {"type": "object"},
+        }
+    },
+}
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+# Compiled validators, built on first use in each process
+_COMPILED = {}
+
+
+def compile_schema(schema):
+    """Compile a schema dict into a validator function(value, path, errors)"""
+    checks = []
+
+    types = schema.get("type")
+    if types:
+        if isinstance(types, str):
+            types = [types]
+        type_checks = [_TYPE_CHECKS[t] for t in types]
+        expected = " or ".join(types)
+
+        def check_type(value, path, errors):
+            if not any(check(value) for check in type_checks):
+                errors.append((path, f"expected {expected}, got {type(value).__name__}"))
+                return False
+            return True
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = frozenset(schema["enum"])
+        allowed_text = ", ".join(schema["enum"])
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append((path, f"{value!r} is not one of: {allowed_text}"))
+            return True
+        checks.append(check_enum)
+
+    if "pattern" in schema:
+        regex = re.compile(schema["pattern"])
+
+        def check_pattern(value, path, errors):
+            if isinstance(value, str) and not regex.search(value):
+                errors.append((path, f"{value!r} does not match {regex.pattern}"))
+            return True
+        checks.append(check_pattern)
+
+    if "minimum" in schema or "exclusiveMinimum" in schema:
+        minimum = schema.get("minimum")
+        exclusive = schema.get("exclusiveMinimum")
+
+        def check_minimum(value, path, errors):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return True
+            if minimum is not None and value < minimum:
+                errors.append((path, f"{value!r} is less than {minimum}"))
+            if exclusive is not None and value <= exclusive:
+                errors.append((path, f"{value!r} must be greater than {exclusive}"))
+            return True
+        checks.append(check_minimum)
+
+    required = schema.get("required", [])
+    properties = {key: compile_schema(sub) for key, sub in schema.get("properties", {}).items()}
+    # Schema for the values of keys not listed in properties (maps keyed by IDs)
+    additional = compile_schema(schema["additionalProperties"]) if "additionalProperties" in schema else None
+    if required or properties or additional:
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return True
+            for key in required:
+                if key not in value:
+                    errors.append((path, f"missing required key '{key}'"))
+            for key, validator in properties.items():
+                if key in value:
+                    validator(value[key], path + (key,), errors)
+            if additional:
+                for key, item in value.items():
+                    if key not in properties:
+                        additional(item, path + (key,), errors)
+            return True
+        checks.append(check_object)
+
+    min_items = schema.get("minItems")
+    items = compile_schema(schema["items"]) if "items" in schema else None
+    if items or min_items:
+        def check_array(value, path, errors):
+            if not isinstance(value, list):
+                return True
+            if min_items and len(value) < min_items:
+                errors.append((path, f"expected at least {min_items} item(s), got {len(value)}"))
+            if items:
+                for index, item in enumerate(value):
+                    items(item, path + (index,), errors)
+            return True
+        checks.append(check_array)
+
+    def validate(value, path, errors):
+        for check in checks:
+            # A failed type check makes the structural checks meaningless
+            if not check(value, path, errors):
+                return
+    return validate
+
+
+def get_validator(schema_name):
+    """Return the compiled validator for a named schema"""
+    validator = _COMPILED.get(schema_name)
+    if validator is None:
+        if schema_name not in SCHEMAS:
+            raise ValueError(f"Unknown schema: {schema_name}")
+        validator = _COMPILED[schema_name] = compile_schema(SCHEMAS[schema_name])
+    return validator
+
+
+def get_item_validator(schema_name, key):
+    """Return the compiled validator for the items of a top-level list of a named schema
+
+    For documents read an item at a time (safe_yaml.iter_items).
+    """
+    name = f"{schema_name}.{key}[]"
+    validator = _COMPILED.get(name)
+    if validator is None:
+        if schema_name not in SCHEMAS:
+            raise ValueError(f"Unknown schema: {schema_name}")
+        validator = _COMPILED[name] = compile_schema(SCHEMAS[schema_name]["properties"][key]["items"])
+    return validator
+
+
+def check_component_references(document, errors):
+    """Check that connections only reference defined components"""
+    component_ids = {c.get("id") for c in document.get("components", []) if isinstance(c, dict)}
+    for index, connection in enumerate(document.get("connections", []) or []):
+        if not isinstance(connection, dict):
+            continue
+        for key in ("source", "target"):
+            ref = connection.get(key)
+            if isinstance(ref, str) and ref not in component_ids:
+                errors.append((("connections", index, key), f"unknown component '{ref}'"))
+
+
+def check_playbook_references(document, errors):
+    """Check that playbook tasks, steps and triage rules reference defined roles and incident types"""
+    role_ids = {r.get("id") for r in document.get("roles", []) if isinstance(r, dict)}
+    for p_index, phase in enumerate(document.get("response_phases", []) or []):
+        for t_index, task in enumerate(phase.get("tasks", []) if isinstance(phase, dict) else []):
+            if not isinstance(task, dict):
+                continue
+            for r_index, role in enumerate(task.get("responsible", []) or []):
+                if role not in role_ids:
+                    path = ("response_phases", p_index, "tasks", t_index, "responsible", r_index)
+                    errors.append((path, f"unknown role '{role}'"))
+
+    incident_ids = {i.get("id") for i in document.get("incident_types", []) if isinstance(i, dict)}
+    for index, playbook in enumerate(document.get("specific_playbooks", []) or []):
+        if isinstance(playbook, dict) and playbook.get("incident_type") not in incident_ids:
+            errors.append((("specific_playbooks", index, "incident_type"),
+                           f"unknown incident type '{playbook.get('incident_type')}'"))
+
+    triage = document.get("triage") or {}
+    for index, rule in enumerate(triage.get("rules", []) or []):
+        if rule.get("incident_type") not in incident_ids:
+            errors.append((("triage", "rules", index, "incident_type"),
+                           f"unknown incident type '{rule.get('incident_type')}'"))
+        for r_index, role in enumerate(rule.get("roles", []) or []):
+            if role not in role_ids:
+                errors.append((("triage", "rules", index, "roles", r_index), f"unknown role '{role}'"))
+    for severity, roles in (triage.get("severity_roles") or {}).items():
+        for r_index, role in enumerate(roles or []):
+            if role not in role_ids:
+                errors.append((("triage", "severity_roles", severity, r_index), f"unknown role '{role}'"))
+
+
+# Cross-reference checks run after the schema validator has passed
+REFERENCE_CHECKS = {
+    "components": check_component_references,
+    "playbook": check_playbook_references,
+}
+
+
+def detect_schema(document):
+    """Guess the schema of a loaded document from its top-level keys"""
+    if not isinstance(document, dict):
+        return None
+    if "incident_types" in document:
+        return "playbook"
+    if "system" in document and "threats" in document:
+        return "threat_model"
+    if "base" in document and "variants" in document:
+        return "variants"
+    if "vehicles" in document:
+        return "vehicle_batch"
+    if "staffing" in document and "arrivals" in document:
+        return "capacity_scenario"
+    if "components" in document:
+        return "components"
+    if "threats" in document:
+        return "threat_library"
+    if "vehicle_type" in document and ("evidence_directory" in document or "threat_models_directory" in document):
+        return "checker_config"
+    return None
+
+
+def compose(text):
+    """The YAML node tree of text, or None if it cannot be composed"""
+    import yaml
+    try:
+        return yaml.compose(text, Loader=yaml_loader())
+    except yaml.YAMLError:
+        return None
+
+
+def locate(root, path):
+    """Return the (line, column) of the node at path under root, or its nearest ancestor"""
+    import yaml
+    if root is None:
+        return 0, 0
+
+    node = root
+    for key in path:
+        child = None
+        if isinstance(node, yaml.MappingNode):
+            for key_node, value_node in node.value:
+                if key_node.value == key:
+                    child = value_node
+                    break
+        elif isinstance(node, yaml.SequenceNode) and isinstance(key, int) and key < len(node.value):
+            child = node.value[key]
+        if child is None:
+            break
+        node = child
+
+    return node.start_mark.line + 1, node.start_mark.column + 1
+
+
+def format_path(path):
+    """Render a path tuple as a dotted/indexed string"""
+    text = ""
+    for key in path:
+        text += f"[{key}]" if isinstance(key, int) else (f".{key}" if text else str(key))
+    return text or "<root>"
+
+
+def validate_document(document, schema_name, filename="<document>", text=None):
+    """Validate a loaded document and return a list of ValidationIssues
+
+    text is the original file content; when given, issues carry line and
+    column numbers.
+    """
+    errors = []
+    get_validator(schema_name)(document, (), errors)
+    if not errors and schema_name in REFERENCE_CHECKS:
+        REFERENCE_CHECKS[schema_name](document, errors)
+
+    # One node tree serves every issue: composing costs as much as loading
+    root = compose(text) if errors and text is not None else None
+    issues = []
+    for path, message in errors:
+        line, column = locate(root, path)
+        issues.append(ValidationIssue(filename, line, column, format_path(path), message))
+    return issues
+
+
+def validate_file(path, schema_name=None):
+    """Load and validate one file; returns (schema_name, issues)
+
+    YAML files are loaded within the safe_yaml limits.
+    """
+    import yaml
+    try:
+        if not path.endswith('.json'):
+            safe_yaml.check_size(os.path.getsize(path), safe_yaml.default_limits().max_bytes)
+        with open(path, 'r') as f:
+            text = f.read()
+        if path.endswith('.json'):
+            document = json.loads(text)
+        else:
+            document = safe_yaml.load(text)
+    except safe_yaml.YAMLLimitError as e:
+        return schema_name, [ValidationIssue(path, e.line, e.column, "<root>", e.problem)]
+    except yaml.MarkedYAMLError as e:
+        mark = e.problem_mark or e.context_mark
+        line, column = (mark.line + 1, mark.column + 1) if mark else (0, 0)
+        return schema_name, [ValidationIssue(path, line, column, "<root>", f"YAML syntax error: {e.problem}")]
+    except json.JSONDecodeError as e:
+        return schema_name, [ValidationIssue(path, e.lineno, e.colno, "<root>", f"JSON syntax error: {e.msg}")]
+    except Exception as e:
+        return schema_name, [ValidationIssue(path, 0, 0, "<root>", f"Could not read file: {str(e)}")]
+
+    if schema_name is None:
+        schema_name = detect_schema(document)
+        if schema_name is None:
+            return None, []
+
+    return schema_name, validate_document(document, schema_name, path, text)
+
+
+def _validate_file_args(args):
+    """ProcessPoolExecutor adapter for validate_file"""
+    return validate_file(*args)
+
+
+def collect_files(paths):
+    """Expand files and directories into a sorted list of input files"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, filenames in os.walk(path):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                files.extend(os.path.join(root, name) for name in filenames
+                             if name.endswith(INPUT_EXTENSIONS))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def validate_paths(paths, schema_name=None, workers=None):
+    """Validate files and directories, in parallel for large inputs
+
+    Returns a dict mapping each file to (schema_name, issues). Files whose
+    schema cannot be detected map to (None, []).
+    """
+    files = collect_files(paths)
+    if len(files) < PARALLEL_THRESHOLD or workers == 1:
+        return {path: validate_file(path, schema_name) for path in files}
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(files) // ((workers or os.cpu_count() or 1) * 4))
+        results = executor.map(_validate_file_args, [(path, schema_name) for path in files], chunksize=chunksize)
+        return dict(zip(files, results))
+
+
+def log_issues(issues):
+    """Log validation issues in file:line:column format"""
+    for issue in issues:
+        logger.error("%s:%d:%d: %s: %s", issue.file, issue.line, issue.column, issue.path, issue.message)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Validate R155 tool inputs against their schemas')
+
+    parser.add_argument('paths', nargs='+', help='Files or directories to validate')
+    parser.add_argument('--schema', choices=sorted(SCHEMAS), help='Schema to apply (default: detect per file)')
+    parser.add_argument('--workers', type=int, help='Worker processes for large inputs (default: CPU count)')
+    parser.add_argument('--quiet', action='store_true', help='Only print errors')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format='%(message)s')
+
+    start = time.perf_counter()
+    results = validate_paths(args.paths, args.schema, args.workers)
+
+    checked = 0
+    failed = 0
+    for path, (schema_name, issues) in results.items():
+        if schema_name is None and not issues:
+            continue
+        checked += 1
+        if issues:
+            failed += 1
+            log_issues(issues)
+
+    elapsed = time.perf_counter() - start
+    logger.info("Validated %d file(s) (%d skipped) in %.3fs: %d invalid",
+                checked, len(results) - checked, elapsed, failed)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
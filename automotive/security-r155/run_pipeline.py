@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+R155 Pipeline Runner
+
+This script runs the R155 tooling (threat model generation, documentation
+generation and compliance checking) as a DAG of local commands described in a
+YAML pipeline file. Independent nodes run in parallel, nodes whose inputs and
+command are unchanged since their last successful run are skipped, and the
+critical path of the run is reported at the end.
+
+Pipeline file format:
+
+    nodes:
+      - id: threat-model-{stem}
+        foreach: threat-models/components_*.yaml   # optional, one node per match
+        cwd: threat-models
+        command: ["{python}", generate_threat_model.py, --components, "{file}"]
+        inputs: ["{path}", threat-models/threat_library.yaml]
+        outputs: [threat-models/generated/{stem}.yaml]
+        depends_on: []                             # optional, added to inferred deps
+
+Paths are relative to the pipeline file. Dependencies are inferred from
+inputs that match another node's outputs. Placeholders: {python} is the
+running interpreter; with foreach, {path} is the matched file, {file} its
+name and {stem} its name without extension.
+"""
+
+import argparse
+import fnmatch
+import glob
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from r155_common import safe_yaml
+from r155_common.build_manifest import BuildManifest, hash_value
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = '.r155_pipeline_state.json'
+
+
+class PipelineNode:
+    """A single command in the pipeline"""
+
+    def __init__(self, node_id, command, cwd, inputs, outputs, depends_on):
+        self.id = node_id
+        self.command = command
+        self.cwd = cwd
+        self.inputs = inputs
+        self.outputs = outputs
+        self.depends_on = set(depends_on)
+        self.status = "pending"
+        self.duration = 0.0
+        self.reasons = []
+
+
+def expand(value, variables):
+    """Substitute placeholders in a string or list of strings"""
+    if isinstance(value, list):
+        return [expand(item, variables) for item in value]
+    return str(value).format(**variables)
+
+
+def load_pipeline(pipeline_file):
+    """Load the pipeline definition and expand foreach nodes"""
+    root = os.path.dirname(os.path.abspath(pipeline_file))
+    definition = safe_yaml.load_file(pipeline_file)
+
+    nodes = {}
+    for spec in definition.get('nodes', []):
+        variable_sets = [{}]
+        if spec.get('foreach'):
+            matches = sorted(glob.glob(os.path.join(root, spec['foreach'])))
+            variable_sets = [{
+                'path': os.path.relpath(match, root),
+                'file': os.path.basename(match),
+                'stem': os.path.splitext(os.path.basename(match))[0],
+            } for match in matches]
+            if not matches:
+                logger.warning(f"No files match {spec['foreach']} for node {spec['id']}")
+
+        for variables in variable_sets:
+            variables['python'] = sys.executable
+            node_id = expand(spec['id'], variables)
+            if node_id in nodes:
+                raise ValueError(f"Duplicate pipeline node: {node_id}")
+            nodes[node_id] = PipelineNode(
+                node_id,
+                expand(spec['command'], variables),
+                os.path.join(root, expand(spec.get('cwd', '.'), variables)),
+                [os.path.normpath(os.path.join(root, p)) for p in expand(spec.get('inputs', []), variables)],
+                [os.path.normpath(os.path.join(root, p)) for p in expand(spec.get('outputs', []), variables)],
+                expand(spec.get('depends_on', []), variables),
+            )
+
+    infer_dependencies(nodes)
+    return root, nodes
+
+
+def infer_dependencies(nodes):
+    """Add an edge A -> B wherever one of B's inputs matches one of A's outputs"""
+    for node in nodes.values():
+        for other in nodes.values():
+            if other is node:
+                continue
+            for pattern in node.inputs:
+                if any(output == pattern or fnmatch.fnmatch(output, pattern)
+                       or output.startswith(pattern.rstrip(os.sep) + os.sep)
+                       for output in other.outputs):
+                    node.depends_on.add(other.id)
+                    break
+
+    for node in nodes.values():
+        unknown = node.depends_on - set(nodes)
+        if unknown:
+            raise ValueError(f"Node {node.id} depends on unknown node(s): {', '.join(sorted(unknown))}")
+    topological_order(nodes)
+
+
+def topological_order(nodes):
+    """Return node IDs in dependency order, raising on cycles"""
+    order = []
+    state = {}
+
+    def visit(node_id, trail):
+        if state.get(node_id) == "done":
+            return
+        if state.get(node_id) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(trail + [node_id])}")
+        state[node_id] = "visiting"
+        for dep in sorted(nodes[node_id].depends_on):
+            visit(dep, trail + [node_id])
+        state[node_id] = "done"
+        order.append(node_id)
+
+    for node_id in sorted(nodes):
+        visit(node_id, [])
+    return order
+
+
+def input_files(node):
+    """Expand a node's input patterns and directories into files"""
+    files = []
+    for pattern in node.inputs:
+        for match in sorted(glob.glob(pattern)) or [pattern]:
+            if os.path.isdir(match):
+                for dirpath, _, filenames in os.walk(match):
+                    files.extend(os.path.join(dirpath, name) for name in sorted(filenames))
+            else:
+                files.append(match)
+    return files
+
+
+def node_inputs(node, state):
+    """Hashes of everything a node's result depends on"""
+    inputs = {'command': hash_value([node.command, node.cwd])}
+    for path in input_files(node):
+        inputs[path] = state.hash_file(path)
+    return inputs
+
+
+def run_node(node):
+    """Run a node's command; returns (returncode, output)"""
+    for output in node.outputs:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    process = subprocess.run(node.command, cwd=node.cwd, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, text=True)
+    return process.returncode, process.stdout
+
+
+def run_pipeline(nodes, state, jobs=None, force=False, explain=False):
+    """Run all nodes, parallelising independent ones; returns True if every node succeeded"""
+    remaining = dict(nodes)
+    running = {}
+
+    def ready(node):
+        return all(nodes[dep].status in ("done", "skipped") for dep in node.depends_on)
+
+    def blocked(node):
+        return any(nodes[dep].status in ("failed", "blocked") for dep in node.depends_on)
+
+    def start_node(node):
+        inputs = node_inputs(node, state)
+        node.reasons = ["--force"] if force else state.check(node.id, inputs, node.outputs)
+        if not node.reasons:
+            node.status = "skipped"
+            if explain:
+                logger.info(f"Skipping {node.id}: up to date")
+            return
+        if explain:
+            logger.info(f"Running {node.id}: {'; '.join(node.reasons[:5])}")
+        else:
+            logger.info(f"Running {node.id}")
+        node.status = "running"
+        running[executor.submit(run_node, node)] = (node, inputs, time.perf_counter())
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        while remaining or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for node_id in sorted(remaining):
+                    node = remaining[node_id]
+                    if blocked(node):
+                        node.status = "blocked"
+                        logger.error(f"Not running {node.id}: a dependency failed")
+                    elif ready(node):
+                        start_node(node)
+                    else:
+                        continue
+                    del remaining[node_id]
+                    progressed = True
+
+            if not running:
+                # Only reachable when the remaining nodes can never become ready
+                for node in remaining.values():
+                    node.status = "blocked"
+                remaining.clear()
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node, inputs, started = running.pop(future)
+                node.duration = time.perf_counter() - started
+                try:
+                    returncode, output = future.result()
+                except OSError as e:
+                    returncode, output = -1, str(e)
+                if returncode == 0:
+                    node.status = "done"
+                    # Inputs were hashed in start_node, before the command ran (and after the
+                    # dependencies that produce them finished); an input edited while the node
+                    # ran therefore still differs from the record and reruns the node next time
+                    state.record(node.id, inputs)
+                    logger.info(f"Finished {node.id} in {node.duration:.2f}s")
+                else:
+                    node.status = "failed"
+                    logger.error(f"{node.id} failed with exit code {returncode} after {node.duration:.2f}s")
+                    for line in output.strip().splitlines()[-20:]:
+                        logger.error(f"  {line}")
+
+    state.save()
+    return all(node.status in ("done", "skipped") for node in nodes.values())
+
+
+def critical_path(nodes):
+    """Longest chain of dependent nodes by duration; returns (total_seconds, [node_ids])"""
+    finish = {}
+    previous = {}
+    for node_id in topological_order(nodes):
+        node = nodes[node_id]
+        best = max(node.depends_on, key=lambda dep: finish[dep], default=None)
+        finish[node_id] = node.duration + (finish[best] if best else 0.0)
+        previous[node_id] = best
+
+    if not finish:
+        return 0.0, []
+    end = max(finish, key=finish.get)
+    path = []
+    while end:
+        path.append(end)
+        end = previous[end]
+    return finish[path[0]], list(reversed(path))
+
+
+def report(nodes, wall_time):
+    """Log per-node results and the critical path"""
+    logger.info("Pipeline summary:")
+    for node_id in topological_order(nodes):
+        node = nodes[node_id]
+        logger.info(f"  {node.id:<40} {node.status:<8} {node.duration:8.2f}s")
+
+    total, path = critical_path(nodes)
+    busy = sum(node.duration for node in nodes.values())
+    logger.info(f"Wall time {wall_time:.2f}s, total node time {busy:.2f}s")
+    if path:
+        logger.info(f"Critical path ({total:.2f}s): {' -> '.join(path)}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Run the R155 tooling as a parallel DAG')
+
+    parser.add_argument('--pipeline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline.yaml'),
+                        help='Pipeline definition file')
+    parser.add_argument('--jobs', type=int, default=None, help='Maximum nodes run in parallel (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Run every node even if its inputs are unchanged')
+    parser.add_argument('--explain', action='store_true', help='Log why each node runs or is skipped')
+    parser.add_argument('--list', action='store_true', help='List nodes and dependencies in run order, then exit')
+    parser.add_argument('--only', nargs='+', help='Run only these nodes and their dependencies')
+
+    args = parser.parse_args()
+
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        root, nodes = load_pipeline(args.pipeline)
+    except Exception as e:
+        logger.error(f"Error loading pipeline: {str(e)}")
+        sys.exit(1)
+
+    if args.only:
+        selected = set()
+        pending = list(args.only)
+        while pending:
+            node_id = pending.pop()
+            if node_id not in nodes:
+                logger.error(f"Unknown node: {node_id}")
+                sys.exit(1)
+            if node_id not in selected:
+                selected.add(node_id)
+                pending.extend(nodes[node_id].depends_on)
+        nodes = {node_id: node for node_id, node in nodes.items() if node_id in selected}
+
+    if args.list:
+        for node_id in topological_order(nodes):
+            deps = ', '.join(sorted(nodes[node_id].depends_on)) or '-'
+            print(f"{node_id}  (after: {deps})")
+        return
+
+    state = BuildManifest(os.path.join(root, STATE_FILE))
+    start = time.perf_counter()
+    success = run_pipeline(nodes, state, args.jobs, args.force, args.explain)
+    report(nodes, time.perf_counter() - start)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
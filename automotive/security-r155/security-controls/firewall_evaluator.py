@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Vehicle Firewall Rule Evaluator
+
+This script compiles the segment and firewall rule resources in
+vehicle_firewall_rules.tf into a compact lookup structure and replays captured
+in-vehicle traffic against it, to show that the rules block what they should.
+
+The compiled policy is a (source segment x target segment x protocol) table
+of ALLOW-all / DENY-all flags plus one sorted array of permitted message IDs
+keyed by table cell, so a whole capture is evaluated with a handful of
+vectorized NumPy operations.
+
+Captures are CSV files with the columns
+    timestamp,source_segment,target_segment,protocol,message_id
+(message IDs in hex, with or without a 0x prefix), or .npy files holding an
+already-encoded structured array of FRAME_DTYPE:
+    timestamp (f8), source (i4), target (i4), protocol (i4), message_id (u4)
+where source and target index the segments in the order their resources
+appear in the .tf file, protocol indexes BASE_PROTOCOLS followed by the other
+protocols in the order rules first name them (see --show-policy), and -1
+marks an unknown segment or protocol.
+
+Frames naming a segment or protocol the rules file does not define cannot be
+evaluated; they are counted separately and are not violations.
+
+Requires NumPy.
+"""
+
+import argparse
+import collections
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_RESOURCE = "vehicle_security_segment"
+RULE_RESOURCE = "vehicle_security_firewall_rule"
+
+# Protocols always present in the compiled table, in addition to those named by rules
+BASE_PROTOCOLS = ["CAN", "CAN-FD", "ETH"]
+
+# Rows of a CSV capture converted per chunk
+CSV_CHUNK_ROWS = 1_000_000
+
+# Frame layout produced by the capture loaders
+FRAME_DTYPE = np.dtype([
+    ("timestamp", "f8"),
+    ("source", "i4"),
+    ("target", "i4"),
+    ("protocol", "i4"),
+    ("message_id", "u4"),
+])
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<skip>\s+|\#[^\n]*|//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\])*")
+  | (?P<number>-?\d+(?:\.\d+)?\b)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_\-]*(?:\.[A-Za-z0-9_\-\*]+)*)
+  | (?P<symbol>[{}\[\]=,():])
+''', re.VERBOSE | re.DOTALL)
+
+
+def tokenize_hcl(text):
+    """Split HCL text into (kind, value) tokens"""
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match:
+            line = text.count("\n", 0, position) + 1
+            raise ValueError(f"Unexpected character {text[position]!r} on line {line}")
+        kind = match.lastgroup
+        if kind != "skip":
+            tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class HCLParser:
+    """Recursive-descent parser for the subset of HCL used by the vehicle security resources
+
+    Attributes become dict entries; nested blocks become lists of dicts under
+    their block type, and top-level blocks are returned as
+    (block_type, labels, body) tuples. References such as
+    vehicle_security_segment.body_domain.id are kept as strings.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize_hcl(text)
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token[0] is None or (expected is not None and token[1] != expected):
+            raise ValueError(f"Expected {expected or 'a token'}, got {token[1]!r}")
+        self.position += 1
+        return token
+
+    def parse_file(self):
+        blocks = []
+        while self.peek()[0] is not None:
+            block_type = self.take()[1]
+            labels = []
+            while self.peek()[0] == "string":
+                labels.append(json.loads(self.take()[1]))
+            self.take("{")
+            blocks.append((block_type, labels, self.parse_body("}")))
+        return blocks
+
+    def parse_body(self, closing):
+        body = {}
+        while self.peek()[1] != closing:
+            key = self.take()[1]
+            if key.startswith('"'):
+                key = json.loads(key)
+            if self.peek()[1] in ("=", ":"):
+                self.take()
+                body[key] = self.parse_value()
+            else:
+                # Nested block, possibly labelled
+                while self.peek()[0] == "string":
+                    self.take()
+                self.take("{")
+                body.setdefault(key, []).append(self.parse_body("}"))
+            if self.peek()[1] == ",":
+                self.take()
+        self.take(closing)
+        return body
+
+    def parse_value(self):
+        kind, value = self.take()
+        if kind == "string":
+            return json.loads(value)
+        if kind == "number":
+            return float(value) if "." in value else int(value)
+        if value == "[":
+            items = []
+            while self.peek()[1] != "]":
+                items.append(self.parse_value())
+                if self.peek()[1] == ",":
+                    self.take()
+            self.take("]")
+            return items
+        if value == "{":
+            return self.parse_body("}")
+        if value in ("true", "false"):
+            return value == "true"
+        if value == "null":
+            return None
+        if kind == "ident":
+            if self.peek()[1] == "(":
+                # Function call: keep the raw call text
+                depth = 0
+                parts = [value]
+                while True:
+                    token = self.take()[1]
+                    parts.append(token)
+                    depth += token == "("
+                    depth -= token == ")"
+                    if depth == 0:
+                        break
+                return "".join(parts)
+            return value
+        raise ValueError(f"Unexpected token {value!r}")
+
+
+def resolve_segment(reference, segments_by_resource):
+    """Map a segment reference or literal name to a segment name"""
+    match = re.match(rf"^{SEGMENT_RESOURCE}\.([A-Za-z0-9_\-]+)(?:\.\w+)?$", str(reference))
+    if match:
+        resource_name = match.group(1)
+        if resource_name not in segments_by_resource:
+            raise ValueError(f"Reference to undefined segment {reference}")
+        return segments_by_resource[resource_name]
+    return str(reference)
+
+
+def parse_message_id(value):
+    """Parse a message ID given as hex string, decimal string or integer"""
+    if isinstance(value, int):
+        return value
+    return int(str(value).strip(), 0)
+
+
+class FirewallPolicy:
+    """Compiled segment-pair x protocol firewall policy"""
+
+    def __init__(self, segments, protocols, rules, default_action="DENY", intra_segment_action="ALLOW"):
+        """Compile rule dicts (source, target, action, protocol, allowed_message_ids, name)"""
+        self.segments = list(segments)
+        self.segment_index = {name: i for i, name in enumerate(self.segments)}
+        self.protocols = list(protocols)
+        self.protocol_index = {name: i for i, name in enumerate(self.protocols)}
+        self.rule_names = {}
+
+        n_segments = len(self.segments)
+        n_cells = n_segments * n_segments * len(self.protocols)
+        default_allow = default_action.upper() == "ALLOW"
+
+        # Per cell: allow every ID, or allow only the IDs in allowed_keys
+        self.allow_all = np.full(n_cells, default_allow, dtype=bool)
+        for i in range(n_segments):
+            for p in range(len(self.protocols)):
+                self.allow_all[self.cell(i, i, p)] = intra_segment_action.upper() == "ALLOW"
+
+        allowed_ids = collections.defaultdict(set)
+        denied_cells = set()
+        for rule in rules:
+            source = self.segment_index[rule["source"]]
+            target = self.segment_index[rule["target"]]
+            protocol = rule.get("protocol", "ALL").upper()
+            protocols = range(len(self.protocols)) if protocol == "ALL" else [self.protocol_index[protocol]]
+            for p in protocols:
+                cell = self.cell(source, target, p)
+                self.rule_names.setdefault(cell, []).append(rule.get("name"))
+                if rule.get("action", "DENY").upper() == "DENY":
+                    denied_cells.add(cell)
+                elif rule.get("allowed_message_ids"):
+                    self.allow_all[cell] = False
+                    allowed_ids[cell].update(parse_message_id(m) for m in rule["allowed_message_ids"])
+                else:
+                    self.allow_all[cell] = True
+
+        # Explicit DENY rules take precedence over any ALLOW for the same cell
+        for cell in denied_cells:
+            self.allow_all[cell] = False
+            allowed_ids.pop(cell, None)
+
+        # One sorted uint64 array of (cell << 32 | message_id) keys
+        keys = [(cell << 32) | message_id for cell, ids in allowed_ids.items() for message_id in ids]
+        self.allowed_keys = np.array(sorted(keys), dtype=np.uint64)
+
+    def cell(self, source, target, protocol):
+        """Flat index of a table cell"""
+        return (source * len(self.segments) + target) * len(self.protocols) + protocol
+
+    def frame_cells(self, frames):
+        """Return (cells, known): each frame's table cell, and whether its segments and protocol are known"""
+        known = (frames["source"] >= 0) & (frames["target"] >= 0) & (frames["protocol"] >= 0)
+        n_segments = len(self.segments)
+        cells = ((frames["source"].astype(np.int64) * n_segments + frames["target"]) * len(self.protocols)
+                 + frames["protocol"])
+        return np.where(known, cells, 0), known
+
+    def evaluate(self, frames, cells=None, known=None):
+        """Return a boolean array: True where the policy permits the frame
+
+        Frames referencing unknown segments or protocols (index -1) are denied.
+        """
+        if cells is None:
+            cells, known = self.frame_cells(frames)
+
+        permitted = self.allow_all[cells]
+        if len(self.allowed_keys):
+            keys = (cells.astype(np.uint64) << np.uint64(32)) | frames["message_id"].astype(np.uint64)
+            positions = np.searchsorted(self.allowed_keys, keys)
+            positions = np.minimum(positions, len(self.allowed_keys) - 1)
+            permitted |= self.allowed_keys[positions] == keys
+        return permitted & known
+
+    def cell_path(self, cell):
+        """(source, target, protocol) names of a table cell"""
+        pair, protocol = divmod(cell, len(self.protocols))
+        source, target = divmod(pair, len(self.segments))
+        return self.segments[source], self.segments[target], self.protocols[protocol]
+
+    def describe(self):
+        """Summary of the compiled table"""
+        return {
+            "segments": self.segments,
+            "protocols": self.protocols,
+            "cells": int(len(self.allow_all)),
+            "allow_all_cells": int(self.allow_all.sum()),
+            "allowed_message_ids": int(len(self.allowed_keys)),
+        }
+
+
+def load_policy(rules_file, default_action="DENY"):
+    """Parse the Terraform rules file and compile it into a FirewallPolicy"""
+    with open(rules_file, 'r') as f:
+        blocks = HCLParser(f.read()).parse_file()
+
+    segments_by_resource = {}
+    raw_rules = []
+    for block_type, labels, body in blocks:
+        if block_type != "resource" or len(labels) != 2:
+            continue
+        resource_type, resource_name = labels
+        if resource_type == SEGMENT_RESOURCE:
+            segments_by_resource[resource_name] = body.get("name", resource_name)
+        elif resource_type == RULE_RESOURCE:
+            raw_rules.append(dict(body, name=body.get("name", resource_name)))
+
+    rules = []
+    protocols = list(BASE_PROTOCOLS)
+    for rule in raw_rules:
+        rule["source"] = resolve_segment(rule.get("source_segment"), segments_by_resource)
+        rule["target"] = resolve_segment(rule.get("target_segment"), segments_by_resource)
+        protocol = str(rule.get("protocol", "ALL")).upper()
+        if protocol != "ALL" and protocol not in protocols:
+            protocols.append(protocol)
+        rules.append(rule)
+
+    policy = FirewallPolicy(segments_by_resource.values(), protocols, rules, default_action)
+    logger.info(f"Compiled {len(rules)} firewall rules over {len(policy.segments)} segments "
+                f"and {len(policy.protocols)} protocols")
+    return policy
+
+
+def read_capture(path, policy, chunk_rows=CSV_CHUNK_ROWS):
+    """Yield structured frame arrays from a CSV or .npy capture, chunk by chunk"""
+    if path.endswith('.npy'):
+        frames = np.load(path, mmap_mode='r')
+        for start in range(0, len(frames), chunk_rows):
+            yield np.asarray(frames[start:start + chunk_rows])
+        return
+
+    segment_index = policy.segment_index
+    protocol_index = policy.protocol_index
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header and header[0].strip().lower() != "timestamp":
+            # No header row; treat the first row as data
+            reader = _prepend(header, reader)
+        while True:
+            rows = [row for _, row in zip(range(chunk_rows), reader)]
+            if not rows:
+                return
+            chunk = np.empty(len(rows), dtype=FRAME_DTYPE)
+            chunk["timestamp"] = np.fromiter((float(r[0]) for r in rows), dtype="f8", count=len(rows))
+            chunk["source"] = np.fromiter((segment_index.get(r[1], -1) for r in rows), dtype="i4", count=len(rows))
+            chunk["target"] = np.fromiter((segment_index.get(r[2], -1) for r in rows), dtype="i4", count=len(rows))
+            chunk["protocol"] = np.fromiter((protocol_index.get(r[3].upper(), -1) for r in rows),
+                                            dtype="i4", count=len(rows))
+            chunk["message_id"] = np.fromiter((int(r[4], 16) for r in rows), dtype="u4", count=len(rows))
+            yield chunk
+
+
+def _prepend(first, iterator):
+    yield first
+    yield from iterator
+
+
+def replay(policy, chunks, max_examples=20):
+    """Evaluate every frame and summarise the frames the policy denies"""
+    total = 0
+    denied_total = 0
+    unknown = 0
+    denied_by_cell = collections.Counter()
+    denied_ids = collections.Counter()
+    examples = []
+    start = time.perf_counter()
+
+    n_cells = len(policy.allow_all)
+    for frames in chunks:
+        cells, known = policy.frame_cells(frames)
+        # Frames with unknown segments or protocols are counted apart from policy denials
+        violating = ~policy.evaluate(frames, cells, known) & known
+        total += len(frames)
+        denied_total += int(violating.sum())
+        unknown += int((~known).sum())
+
+        # Aggregate per table cell and per message ID without Python loops over frames
+        if not violating.any():
+            continue
+        for cell, count in enumerate(np.bincount(cells[violating], minlength=n_cells).tolist()):
+            if count:
+                denied_by_cell[policy.cell_path(cell)] += count
+        ids, id_counts = np.unique(frames["message_id"][violating], return_counts=True)
+        denied_ids.update(dict(zip(ids.tolist(), id_counts.tolist())))
+
+        for index in np.flatnonzero(violating)[:max(0, max_examples - len(examples))].tolist():
+            source, target, protocol = policy.cell_path(int(cells[index]))
+            examples.append({
+                "timestamp": float(frames["timestamp"][index]),
+                "source": source,
+                "target": target,
+                "protocol": protocol,
+                "message_id": hex(int(frames["message_id"][index])),
+            })
+
+    elapsed = time.perf_counter() - start
+    return {
+        "frames_evaluated": total,
+        "frames_permitted": total - denied_total - unknown,
+        "frames_denied": denied_total,
+        "frames_unknown_segment_or_protocol": unknown,
+        "elapsed_seconds": round(elapsed, 3),
+        "frames_per_second": round(total / elapsed) if elapsed > 0 else None,
+        "denied_by_path": [
+            {"source": s, "target": t, "protocol": p, "frames": c}
+            for (s, t, p), c in denied_by_cell.most_common()
+        ],
+        "top_denied_message_ids": [{"message_id": hex(m), "frames": c} for m, c in denied_ids.most_common(20)],
+        "examples": examples,
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Replay captured in-vehicle traffic against the firewall rules')
+
+    parser.add_argument('--rules', default='vehicle_firewall_rules.tf', help='Terraform firewall rules file')
+    parser.add_argument('--capture', nargs='+', help='Capture files (.csv or .npy)')
+    parser.add_argument('--default-action', choices=['ALLOW', 'DENY'], default='DENY',
+                        help='Action for segment pairs without a rule (default: DENY)')
+    parser.add_argument('--capture-point', choices=['pre-firewall', 'post-firewall'], default='post-firewall',
+                        help='Where traffic was captured; behind the firewall every denied frame is a violation')
+    parser.add_argument('--output', help='Write the JSON summary (usable as 7.2.2.4 evidence) to this path')
+    parser.add_argument('--show-policy', action='store_true', help='Print the compiled policy and exit')
+
+    args = parser.parse_args()
+
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        policy = load_policy(args.rules, args.default_action)
+    except Exception as e:
+        logger.error(f"Error compiling firewall rules: {str(e)}")
+        sys.exit(1)
+
+    if args.show_policy or not args.capture:
+        print(json.dumps(policy.describe(), indent=2))
+        return
+
+    summaries = []
+    for capture in args.capture:
+        try:
+            summary = replay(policy, read_capture(capture, policy))
+        except Exception as e:
+            logger.error(f"Error replaying {capture}: {str(e)}")
+            sys.exit(1)
+        summary["capture"] = capture
+        summaries.append(summary)
+        logger.info(f"{capture}: {summary['frames_evaluated']} frames, {summary['frames_denied']} denied "
+                    f"({summary['frames_per_second']} frames/s)")
+        if summary["frames_unknown_segment_or_protocol"]:
+            logger.warning(f"{capture}: {summary['frames_unknown_segment_or_protocol']} frames name segments "
+                           f"or protocols not defined in {args.rules}; they were not evaluated")
+
+    violations = sum(s["frames_denied"] for s in summaries) if args.capture_point == 'post-firewall' else 0
+    report = {
+        "rules_file": os.path.abspath(args.rules),
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "capture_point": args.capture_point,
+        "default_action": args.default_action,
+        "policy": policy.describe(),
+        "violations": violations,
+        "frames_unknown_segment_or_protocol": sum(s["frames_unknown_segment_or_protocol"] for s in summaries),
+        "captures": summaries,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Replay summary written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if violations:
+        logger.warning(f"{violations} frames observed behind the firewall that the rules should have blocked")
+
+
+if __name__ == '__main__':
+    main()
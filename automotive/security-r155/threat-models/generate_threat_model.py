@@ -4,45 +4,208 @@ Automotive Threat Model Generator
 
 This script generates YAML-based threat models for automotive systems
 based on component definitions and attack surface analysis.
+
+Vehicle variants can be described as overlays on a base component file
+(see apply_overlay). The generator then builds the base model once and
+derives each variant's model from it. Model elements whose inputs a variant
+does not change are shared with the base instead of being rebuilt.
+
+Usage:
+    python generate_threat_model.py --components components_infotainment.yaml --output model.yaml
+    python generate_threat_model.py --variants variants_infotainment.yaml --output-dir generated
 """
 
 import argparse
-import json
-import yaml
 import os
 import sys
 import datetime
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from r155_common import artifacts, tracing, validation
+
 logger = logging.getLogger(__name__)
 
+def apply_overlay(base, variant):
+    """Component definitions of a variant: base with the variant's changes applied
+    
+    A variant removes, then overrides, then adds components (matched by id)
+    and connections (matched by source and target). Overrides are merged
+    into the base entry field by field. Removing a component also removes
+    its connections. Everything the variant does not touch is the base's own
+    object, so variants share it with the base. Raises ValueError if the
+    variant references unknown entries or adds duplicates.
+    """
+    components = {c["id"]: c for c in base.get("components", [])}
+    connections = {(c["source"], c["target"]): c for c in base.get("connections", [])}
+    
+    def key(connection):
+        return connection["source"], connection["target"]
+    
+    removed = variant.get("remove_components", [])
+    overrides = variant.get("override_components", [])
+    unknown = [c for c in removed + [o["id"] for o in overrides] if c not in components]
+    if unknown:
+        raise ValueError(f"unknown component(s): {', '.join(unknown)}")
+    for component_id in removed:
+        del components[component_id]
+    connections = {k: c for k, c in connections.items() if k[0] in components and k[1] in components}
+    for override in overrides:
+        if override["id"] not in components:
+            raise ValueError(f"component {override['id']} is both removed and overridden")
+        components[override["id"]] = {**components[override["id"]], **override}
+    for component in variant.get("add_components", []):
+        if component["id"] in components:
+            raise ValueError(f"component {component['id']} already exists")
+        components[component["id"]] = component
+    
+    for connection in variant.get("remove_connections", []):
+        if connections.pop(key(connection), None) is None:
+            raise ValueError(f"unknown connection {connection['source']} -> {connection['target']}")
+    for override in variant.get("override_connections", []):
+        if key(override) not in connections:
+            raise ValueError(f"unknown connection {override['source']} -> {override['target']}")
+        connections[key(override)] = {**connections[key(override)], **override}
+    for connection in variant.get("add_connections", []):
+        if key(connection) in connections:
+            raise ValueError(f"connection {connection['source']} -> {connection['target']} already exists")
+        connections[key(connection)] = connection
+    
+    return dict(base, components=list(components.values()), connections=list(connections.values()))
+
+def load_variants(variants_file):
+    """Load and validate a variants file; returns (base components path, variants document)
+    
+    The base path in the file is relative to the variants file. Exits on
+    invalid input, like the rest of the generator.
+    """
+    try:
+        document = artifacts.load_artifact(variants_file, 'yaml')
+    except Exception as e:
+        logger.error(f"Error loading variants: {str(e)}")
+        sys.exit(1)
+    if validation.validate_document(document, "variants", variants_file):
+        _, issues = validation.validate_file(variants_file, "variants")
+        validation.log_issues(issues)
+        logger.error(f"Invalid variant definitions in {variants_file}")
+        sys.exit(1)
+    base_file = os.path.join(os.path.dirname(variants_file), document["base"])
+    return base_file, document
+
 class ThreatModelGenerator:
     """Generate threat models for automotive systems"""
     
-    def __init__(self, components_file):
-        """Initialize with component definitions"""
+    # Map of threat types to generic security controls
+    CONTROL_MAPPINGS = {
+        "spoofing": [
+            {
+                "name": "Strong Authentication",
+                "description": "Implement strong authentication mechanisms",
+                "type": "preventive"
+            },
+            {
+                "name": "Message Authentication",
+                "description": "Implement message authentication codes (MACs)",
+                "type": "preventive"
+            }
+        ],
+        "tampering": [
+            {
+                "name": "Integrity Protection",
+                "description": "Implement integrity protection mechanisms",
+                "type": "preventive"
+            },
+            {
+                "name": "Secure Boot",
+                "description": "Implement secure boot process",
+                "type": "preventive"
+            }
+        ],
+        "information_disclosure": [
+            {
+                "name": "Encryption",
+                "description": "Encrypt sensitive data in transit and at rest",
+                "type": "preventive"
+            },
+            {
+                "name": "Access Control",
+                "description": "Implement strict access controls",
+                "type": "preventive"
+            }
+        ],
+        "denial_of_service": [
+            {
+                "name": "Rate Limiting",
+                "description": "Implement rate limiting mechanisms",
+                "type": "preventive"
+            },
+            {
+                "name": "Redundancy",
+                "description": "Implement redundant systems or components",
+                "type": "mitigative"
+            }
+        ],
+        "elevation_of_privilege": [
+            {
+                "name": "Privilege Separation",
+                "description": "Implement privilege separation mechanisms",
+                "type": "preventive"
+            },
+            {
+                "name": "Least Privilege",
+                "description": "Apply principle of least privilege",
+                "type": "preventive"
+            }
+        ]
+    }
+    
+    def __init__(self, components_file, suggestions=0, search_store=None):
+        """Initialize with component definitions
+        
+        For components of a type no library threat lists, the suggestions
+        best-matching library threats are logged (default 0: off, as building
+        the search index costs more than the rest of a run), using a search
+        index saved in search_store if given.
+        """
+        # (kind, id(source), *key) -> (source, model element); see derive()
+        self._derived = {}
+        self.suggestions = suggestions
+        self.search_store = search_store
+        self._search_index = None
+        self._suggested = set()
         self.load_components(components_file)
         self.load_threat_library("threat_library.yaml")
         
     def load_components(self, components_file):
         """Load component definitions from YAML file"""
         try:
-            with open(components_file, 'r') as f:
-                self.components = yaml.safe_load(f)
-                logger.info(f"Loaded {len(self.components.get('components', []))} components from {components_file}")
+            self.components = artifacts.load_artifact(components_file, 'yaml')
         except Exception as e:
             logger.error(f"Error loading components: {str(e)}")
             sys.exit(1)
+            
+        issues = validation.validate_document(self.components, "components", components_file)
+        if issues:
+            # Re-validate from the file so the errors carry line numbers
+            _, issues = validation.validate_file(components_file, "components")
+            validation.log_issues(issues)
+            logger.error(f"Invalid component definitions in {components_file}")
+            sys.exit(1)
+        logger.info(f"Loaded {len(self.components.get('components', []))} components from {components_file}")
     
     def load_threat_library(self, library_file):
         """Load threat library from YAML file"""
+        self.library_file = library_file
         try:
             if os.path.exists(library_file):
-                with open(library_file, 'r') as f:
-                    self.threat_library = yaml.safe_load(f)
-                    logger.info(f"Loaded {len(self.threat_library.get('threats', []))} threats from library")
+                self.threat_library = artifacts.load_artifact(library_file, 'yaml')
+                issues = validation.validate_document(self.threat_library, "threat_library", library_file)
+                if issues:
+                    _, issues = validation.validate_file(library_file, "threat_library")
+                    validation.log_issues(issues)
+                    logger.error(f"Invalid threat library {library_file}")
+                    sys.exit(1)
+                logger.info(f"Loaded {len(self.threat_library.get('threats', []))} threats from library")
             else:
                 logger.warning(f"Threat library file {library_file} not found, using default threats")
                 self.threat_library = {"threats": []}
@@ -50,6 +213,20 @@ class ThreatModelGenerator:
             logger.error(f"Error loading threat library: {str(e)}")
             self.threat_library = {"threats": []}
     
+    def derive(self, kind, source, build, *key):
+        """Return the model element built from source by an earlier model, or build it now
+        
+        Elements are memoized on the identity of their source object (plus
+        key), so models generated from variants of the same base share every
+        element whose inputs are unchanged. Shared elements must not be
+        modified. The memo keeps the source alive, so its id() is never reused.
+        """
+        memo_key = (kind, id(source)) + key
+        entry = self._derived.get(memo_key)
+        if entry is None:
+            entry = self._derived[memo_key] = (source, build())
+        return entry[1]
+    
     def generate_system_model(self, system_name, description):
         """Generate base system model structure"""
         return {
@@ -69,13 +246,13 @@ class ThreatModelGenerator:
     def add_components_to_model(self, model):
         """Add components to the system model"""
         for component in self.components.get("components", []):
-            model["components"].append({
+            model["components"].append(self.derive("component", component, lambda: {
                 "id": component.get("id"),
                 "name": component.get("name"),
                 "type": component.get("type"),
                 "description": component.get("description"),
                 "criticality": component.get("criticality", "Low")
-            })
+            }))
             
         logger.info(f"Added {len(model['components'])} components to model")
     
@@ -83,7 +260,7 @@ class ThreatModelGenerator:
         """Generate interfaces between components"""
         for connection in self.components.get("connections", []):
             interface_id = f"IF-{connection.get('source')}-{connection.get('target')}"
-            model["interfaces"].append({
+            model["interfaces"].append(self.derive("interface", connection, lambda: {
                 "id": interface_id,
                 "name": connection.get("name", f"Interface {interface_id}"),
                 "source_component": connection.get("source"),
@@ -91,7 +268,7 @@ class ThreatModelGenerator:
                 "type": connection.get("type", "data"),
                 "protocol": connection.get("protocol", "Unknown"),
                 "description": connection.get("description", "Component interface")
-            })
+            }))
             
         logger.info(f"Generated {len(model['interfaces'])} interfaces")
     
@@ -103,40 +280,40 @@ class ThreatModelGenerator:
         # Add attack vectors for each external component
         av_id = 1
         for component in external_components:
-            model["attack_vectors"].append({
+            model["attack_vectors"].append(self.derive("external-vector", component, lambda: {
                 "id": f"AV-{av_id}",
                 "name": f"Attack via {component['name']}",
                 "description": f"External attack through {component['name']} interface",
                 "entry_point": component["id"],
                 "affected_components": [component["id"]],
                 "threat_types": ["spoofing", "tampering"]
-            })
+            }, av_id))
             av_id += 1
             
         # Add attack vectors for wireless interfaces
         wireless_interfaces = [i for i in model["interfaces"] if "wireless" in i.get("protocol", "").lower()]
         for interface in wireless_interfaces:
-            model["attack_vectors"].append({
+            model["attack_vectors"].append(self.derive("wireless-vector", interface, lambda: {
                 "id": f"AV-{av_id}",
                 "name": f"Wireless attack via {interface['name']}",
                 "description": f"Attack through wireless interface {interface['name']}",
                 "entry_point": interface["source_component"],
                 "affected_components": [interface["source_component"], interface["target_component"]],
                 "threat_types": ["spoofing", "denial_of_service"]
-            })
+            }, av_id))
             av_id += 1
             
         # Add attack vectors for physical access
         physical_components = [c for c in model["components"] if "physical" in c.get("type", "").lower()]
         for component in physical_components:
-            model["attack_vectors"].append({
+            model["attack_vectors"].append(self.derive("physical-vector", component, lambda: {
                 "id": f"AV-{av_id}",
                 "name": f"Physical access to {component['name']}",
                 "description": f"Attack through physical access to {component['name']}",
                 "entry_point": component["id"],
                 "affected_components": [component["id"]],
                 "threat_types": ["tampering", "information_disclosure"]
-            })
+            }, av_id))
             av_id += 1
         
         logger.info(f"Identified {len(model['attack_vectors'])} attack vectors")
@@ -154,15 +331,15 @@ class ThreatModelGenerator:
                                     if c.get("type") in lib_threat["component_types"]]
                 
                 if matching_components:
-                    affected_components = [c["id"] for c in matching_components]
+                    affected_components = tuple(c["id"] for c in matching_components)
                     
                     # Create threat from library template
-                    model["threats"].append({
+                    model["threats"].append(self.derive("library-threat", lib_threat, lambda: {
                         "id": f"T-{threat_id}",
                         "name": lib_threat["name"],
                         "description": lib_threat["description"],
                         "threat_type": lib_threat.get("threat_type", "Unknown"),
-                        "affected_components": affected_components,
+                        "affected_components": list(affected_components),
                         "attack_vectors": lib_threat.get("attack_vectors", []),
                         "impact": lib_threat.get("impact", {
                             "safety": "Unknown",
@@ -172,136 +349,75 @@ class ThreatModelGenerator:
                         }),
                         "likelihood": lib_threat.get("likelihood", "Medium"),
                         "risk_level": lib_threat.get("risk_level", "Medium")
-                    })
+                    }, threat_id, affected_components))
                     threat_id += 1
         
+        def vector_threat(attack_vector, threat_type, threat_id):
+            """Threat of one type through one attack vector, from the library template if there is one"""
+            # Find matching threat templates in library
+            matching_templates = [t for t in self.threat_library.get("threats", []) 
+                               if t.get("threat_type") == threat_type]
+            
+            if matching_templates:
+                # Use template to create threat
+                template = matching_templates[0]
+                return {
+                    "id": f"T-{threat_id}",
+                    "name": f"{template['name']} via {attack_vector['name']}",
+                    "description": template["description"],
+                    "threat_type": threat_type,
+                    "affected_components": attack_vector["affected_components"],
+                    "attack_vectors": [attack_vector["id"]],
+                    "impact": template.get("impact", {
+                        "safety": "Unknown",
+                        "privacy": "Unknown",
+                        "operational": "Unknown",
+                        "financial": "Unknown"
+                    }),
+                    "likelihood": template.get("likelihood", "Medium"),
+                    "risk_level": template.get("risk_level", "Medium")
+                }
+            # Create generic threat
+            return {
+                "id": f"T-{threat_id}",
+                "name": f"{threat_type.title()} via {attack_vector['name']}",
+                "description": f"Generic {threat_type} threat through {attack_vector['description']}",
+                "threat_type": threat_type,
+                "affected_components": attack_vector["affected_components"],
+                "attack_vectors": [attack_vector["id"]],
+                "impact": {
+                    "safety": "Medium" if threat_type in ["tampering", "spoofing"] else "Low",
+                    "privacy": "High" if threat_type in ["information_disclosure"] else "Low",
+                    "operational": "High" if threat_type in ["denial_of_service"] else "Medium",
+                    "financial": "Medium"
+                },
+                "likelihood": "Medium",
+                "risk_level": "Medium"
+            }
+        
         # Generate threats based on attack vectors
         for attack_vector in model["attack_vectors"]:
             # For each threat type in the attack vector
             for threat_type in attack_vector.get("threat_types", []):
-                # Find matching threat templates in library
-                matching_templates = [t for t in self.threat_library.get("threats", []) 
-                                   if t.get("threat_type") == threat_type]
-                
-                if matching_templates:
-                    # Use template to create threat
-                    template = matching_templates[0]
-                    model["threats"].append({
-                        "id": f"T-{threat_id}",
-                        "name": f"{template['name']} via {attack_vector['name']}",
-                        "description": template["description"],
-                        "threat_type": threat_type,
-                        "affected_components": attack_vector["affected_components"],
-                        "attack_vectors": [attack_vector["id"]],
-                        "impact": template.get("impact", {
-                            "safety": "Unknown",
-                            "privacy": "Unknown",
-                            "operational": "Unknown",
-                            "financial": "Unknown"
-                        }),
-                        "likelihood": template.get("likelihood", "Medium"),
-                        "risk_level": template.get("risk_level", "Medium")
-                    })
-                else:
-                    # Create generic threat
-                    model["threats"].append({
-                        "id": f"T-{threat_id}",
-                        "name": f"{threat_type.title()} via {attack_vector['name']}",
-                        "description": f"Generic {threat_type} threat through {attack_vector['description']}",
-                        "threat_type": threat_type,
-                        "affected_components": attack_vector["affected_components"],
-                        "attack_vectors": [attack_vector["id"]],
-                        "impact": {
-                            "safety": "Medium" if threat_type in ["tampering", "spoofing"] else "Low",
-                            "privacy": "High" if threat_type in ["information_disclosure"] else "Low",
-                            "operational": "High" if threat_type in ["denial_of_service"] else "Medium",
-                            "financial": "Medium"
-                        },
-                        "likelihood": "Medium",
-                        "risk_level": "Medium"
-                    })
+                model["threats"].append(self.derive(
+                    "vector-threat", attack_vector,
+                    lambda: vector_threat(attack_vector, threat_type, threat_id), threat_type, threat_id))
                 threat_id += 1
         
         logger.info(f"Mapped {len(model['threats'])} threats to components")
     
     def suggest_security_controls(self, model):
         """Suggest security controls based on identified threats"""
-        # Map of threat types to generic security controls
-        control_mappings = {
-            "spoofing": [
-                {
-                    "name": "Strong Authentication",
-                    "description": "Implement strong authentication mechanisms",
-                    "type": "preventive"
-                },
-                {
-                    "name": "Message Authentication",
-                    "description": "Implement message authentication codes (MACs)",
-                    "type": "preventive"
-                }
-            ],
-            "tampering": [
-                {
-                    "name": "Integrity Protection",
-                    "description": "Implement integrity protection mechanisms",
-                    "type": "preventive"
-                },
-                {
-                    "name": "Secure Boot",
-                    "description": "Implement secure boot process",
-                    "type": "preventive"
-                }
-            ],
-            "information_disclosure": [
-                {
-                    "name": "Encryption",
-                    "description": "Encrypt sensitive data in transit and at rest",
-                    "type": "preventive"
-                },
-                {
-                    "name": "Access Control",
-                    "description": "Implement strict access controls",
-                    "type": "preventive"
-                }
-            ],
-            "denial_of_service": [
-                {
-                    "name": "Rate Limiting",
-                    "description": "Implement rate limiting mechanisms",
-                    "type": "preventive"
-                },
-                {
-                    "name": "Redundancy",
-                    "description": "Implement redundant systems or components",
-                    "type": "mitigative"
-                }
-            ],
-            "elevation_of_privilege": [
-                {
-                    "name": "Privilege Separation",
-                    "description": "Implement privilege separation mechanisms",
-                    "type": "preventive"
-                },
-                {
-                    "name": "Least Privilege",
-                    "description": "Apply principle of least privilege",
-                    "type": "preventive"
-                }
-            ]
-        }
-        
-        # Collect unique threat types
-        threat_types = set()
-        for threat in model["threats"]:
-            threat_types.add(threat.get("threat_type", "Unknown"))
+        # Collect unique threat types in first-seen order, so output is reproducible
+        threat_types = dict.fromkeys(threat.get("threat_type", "Unknown") for threat in model["threats"])
         
         # Add controls for each threat type
         control_id = 1
         added_controls = set()
         
         for threat_type in threat_types:
-            if threat_type in control_mappings:
-                for control_template in control_mappings[threat_type]:
+            if threat_type in self.CONTROL_MAPPINGS:
+                for control_template in self.CONTROL_MAPPINGS[threat_type]:
                     control_name = control_template["name"]
                     
                     # Skip if already added
@@ -311,58 +427,193 @@ class ThreatModelGenerator:
                     added_controls.add(control_name)
                     
                     # Find threats mitigated by this control
-                    mitigated_threats = [t["id"] for t in model["threats"]
-                                      if t.get("threat_type") == threat_type]
+                    mitigated_threats = tuple(t["id"] for t in model["threats"]
+                                              if t.get("threat_type") == threat_type)
                     
                     # Add control
-                    model["security_controls"].append({
+                    model["security_controls"].append(self.derive("control", control_template, lambda: {
                         "id": f"SC-{control_id}",
                         "name": control_name,
                         "description": control_template["description"],
                         "type": control_template["type"],
-                        "mitigated_threats": mitigated_threats,
+                        "mitigated_threats": list(mitigated_threats),
                         "implementation_status": "Recommended"
-                    })
+                    }, control_id, mitigated_threats))
                     control_id += 1
         
         logger.info(f"Suggested {len(model['security_controls'])} security controls")
     
-    def generate_model(self, system_name, description, output_file):
-        """Generate complete threat model"""
+    def build_model(self, system_name, description):
+        """Build the threat model for the current component definitions"""
         model = self.generate_system_model(system_name, description)
         
         # Build the model
-        self.add_components_to_model(model)
-        self.generate_interfaces(model)
-        self.identify_attack_vectors(model)
-        self.map_threats_to_components(model)
-        self.suggest_security_controls(model)
+        for build_stage in (self.add_components_to_model, self.generate_interfaces, self.identify_attack_vectors,
+                            self.map_threats_to_components, self.suggest_security_controls):
+            with tracing.stage(build_stage.__name__):
+                build_stage(model)
+        with tracing.stage('suggest_library_threats'):
+            self.suggest_library_threats(model)
+        return model
+    
+    def suggest_library_threats(self, model):
+        """Log the library threats best matching each component of a type no library threat lists
         
-        # Write to file
+        Such components only get generic attack-vector threats, so the
+        suggestions point analysts at templates to extend component_types
+        with. Each distinct component is reported once per run.
+        """
+        threats = self.threat_library.get("threats", [])
+        if not self.suggestions or not threats:
+            return
+        known_types = {t for threat in threats for t in threat.get("component_types", [])}
+        for component in model["components"]:
+            key = tuple(component.get(field) for field in ("id", "name", "type", "description"))
+            if component.get("type") in known_types or key in self._suggested:
+                continue
+            self._suggested.add(key)
+            
+            if self._search_index is None:
+                from r155_common import threat_search
+                if self.search_store and os.path.exists(self.library_file):
+                    self._search_index = threat_search.load_search_index(self.library_file, self.search_store)
+                else:
+                    self._search_index = threat_search.ThreatSearchIndex.from_threats(threats)
+                self._component_query = threat_search.component_query
+            
+            results = self._search_index.search(self._component_query(component), self.suggestions)
+            if results:
+                candidates = ", ".join(f"{r['name']} ({r['score']:.2f})" for r in results)
+                logger.info(f"No library threats for component type '{component.get('type')}' "
+                            f"({component['id']}); closest library threats: {candidates}")
+    
+    def write_model(self, model, output_file):
+        """Write a threat model to a YAML file; returns False on failure"""
         try:
-            with open(output_file, 'w') as f:
-                yaml.dump(model, f, default_flow_style=False, sort_keys=False)
+            with tracing.stage('yaml_dump'), open(output_file, 'w') as f:
+                import yaml
+                yaml.dump(model, f, Dumper=artifacts.yaml_dumper(), default_flow_style=False, sort_keys=False)
+            # Downstream tools can now load the model without re-parsing it
+            with tracing.stage('store_artifact'):
+                artifacts.store_artifact(output_file, model, 'yaml')
             logger.info(f"Threat model written to {output_file}")
         except Exception as e:
             logger.error(f"Error writing threat model: {str(e)}")
-            return None
-            
+            return False
+        return True
+    
+    def generate_model(self, system_name, description, output_file):
+        """Generate complete threat model"""
+        with tracing.stage('generate_model'):
+            model = self.build_model(system_name, description)
+            if not self.write_model(model, output_file):
+                return None
         return model
+    
+    def generate_variants(self, variants, description, output_dir):
+        """Generate a threat model per variant into output_dir as <variant id>-threat-model.yaml
+        
+        The generator must have been created with the variants' base
+        component file. Returns {variant id: model}; variants that fail are
+        logged and left out.
+        """
+        base = self.components
+        models = {}
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            for variant in variants:
+                try:
+                    self.components = apply_overlay(base, variant)
+                except ValueError as e:
+                    logger.error(f"Invalid variant {variant['id']}: {str(e)}")
+                    continue
+                errors = []
+                validation.check_component_references(self.components, errors)
+                if errors:
+                    for path, message in errors:
+                        logger.error(f"Invalid variant {variant['id']}: {validation.format_path(path)}: {message}")
+                    continue
+                
+                with tracing.stage(f"variant:{variant['id']}"):
+                    model = self.build_model(variant.get("system_name", variant["id"]),
+                                             variant.get("description", description))
+                    output_file = os.path.join(output_dir, f"{variant['id']}-threat-model.yaml")
+                    if self.write_model(model, output_file):
+                        models[variant["id"]] = model
+        finally:
+            self.components = base
+        
+        logger.info(f"Generated {len(models)} of {len(variants)} variant threat models "
+                    f"({len(self._derived)} distinct model elements)")
+        return models
         
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description='Automotive Threat Model Generator')
     
-    parser.add_argument('--components', required=True, help='Path to components definition file')
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument('--components', help='Path to components definition file')
+    inputs.add_argument('--variants', help='Path to a vehicle variants file (base components plus overlays)')
     parser.add_argument('--system-name', default='Automotive System', help='Name of the system')
     parser.add_argument('--description', default='Automotive system threat model', help='System description')
     parser.add_argument('--output', default='automotive_threat_model.yaml', help='Output file path')
+    parser.add_argument('--output-dir', default='generated',
+                        help='Output directory for variant threat models (with --variants)')
+    parser.add_argument('--validate-only', action='store_true',
+                        help='Validate the components file and threat library, then exit')
+    parser.add_argument('--suggest-threats', type=int, default=0, metavar='N',
+                        help='Log the N library threats best matching components of unknown types '
+                             '(default: 0, off)')
+    parser.add_argument('--search-index', metavar='DIR', default=None,
+                        help='Threat library search index directory to reuse (rebuilt when the library changes)')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='Trace time, memory peak and object counts per stage into FILE '
+                             '(.json: Chrome trace events, otherwise folded stacks for flame graphs)')
     
     args = parser.parse_args()
     
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    components_file = args.components
+    if args.variants:
+        components_file, variants = load_variants(args.variants)
+    
+    if args.validate_only:
+        results = validation.validate_paths([components_file], "components")
+        if os.path.exists("threat_library.yaml"):
+            results.update(validation.validate_paths(["threat_library.yaml"], "threat_library"))
+        issues = [issue for _, file_issues in results.values() for issue in file_issues]
+        if args.variants and not issues:
+            base = artifacts.load_artifact(components_file, 'yaml')
+            for variant in variants["variants"]:
+                errors = []
+                try:
+                    validation.check_component_references(apply_overlay(base, variant), errors)
+                except ValueError as e:
+                    errors.append(((), str(e)))
+                for path, message in errors:
+                    issues.append(validation.ValidationIssue(
+                        args.variants, 0, 0, f"variant {variant['id']}: {validation.format_path(path)}", message))
+        validation.log_issues(issues)
+        sys.exit(1 if issues else 0)
+    
+    if args.trace:
+        tracing.enable()
+    
     # Generate threat model
-    generator = ThreatModelGenerator(args.components)
-    generator.generate_model(args.system_name, args.description, args.output)
+    try:
+        with tracing.stage('load_inputs'):
+            generator = ThreatModelGenerator(components_file, args.suggest_threats, args.search_index)
+        if args.variants:
+            models = generator.generate_variants(variants["variants"], args.description, args.output_dir)
+            succeeded = len(models) == len(variants["variants"])
+        else:
+            succeeded = generator.generate_model(args.system_name, args.description, args.output) is not None
+    finally:
+        tracing.finish(args.trace)
+    if args.variants and not succeeded:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()